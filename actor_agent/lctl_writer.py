@@ -0,0 +1,116 @@
+import glob
+import logging
+import os
+import threading
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+# lctl looks up parameters in sysfs first, then procfs and debugfs
+LUSTRE_PARAM_ROOTS = ["/sys/fs/lustre", "/proc/fs/lustre", "/sys/kernel/debug/lustre"]
+
+
+class NativeWriteError(Exception):
+    """
+    the parameter can't be written by file I/O, it needs to be set by lctl
+    """
+
+
+class LctlParamWriter:
+    """
+    write lctl parameters directly to their files under /sys/fs/lustre and /proc/fs/lustre instead of spawning lctl.
+    The glob expansion of a parameter, e.g., osc.*.max_dirty_mb, is resolved once and cached.
+    """
+
+    def __init__(self, roots: List[str] = None):
+        self.roots = roots or LUSTRE_PARAM_ROOTS
+        self._paths: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def to_relative_path(param: str) -> str:
+        """
+        convert lctl parameter name to the relative file path, e.g., osc.*.max_dirty_mb -> osc/*/max_dirty_mb
+        :param param:
+        :return:
+        """
+        return param.replace(".", "/")
+
+    def resolve(self, param: str) -> List[str]:
+        """
+        resolve the files of the parameter
+        :param param: lctl parameter name
+        :return: files of all matched instances, empty if the parameter is not found
+        """
+        with self._lock:
+            paths = self._paths.get(param)
+        if paths is not None:
+            return paths
+        relative_path = self.to_relative_path(param)
+        paths = []
+        for root in self.roots:
+            paths = sorted(glob.glob(os.path.join(root, relative_path)))
+            if len(paths) > 0:
+                break
+        # parameters without match are not cached since devices may be mounted later
+        if len(paths) > 0:
+            with self._lock:
+                self._paths[param] = paths
+        return paths
+
+    def invalidate(self, param: str = None):
+        """
+        drop cached paths of the parameter, or of all parameters if param is None
+        :param param:
+        :return:
+        """
+        with self._lock:
+            if param is None:
+                self._paths.clear()
+            else:
+                self._paths.pop(param, None)
+
+    def write(self, param: str, value) -> List[str]:
+        """
+        write the value to all instances of the parameter
+        :param param: lctl parameter name
+        :param value:
+        :return: written files
+        :raise NativeWriteError: if the parameter can't be written natively
+        """
+        for _ in range(2):
+            paths = self.resolve(param)
+            if len(paths) == 0:
+                raise NativeWriteError(f"parameter {param} is not found in {self.roots}")
+            try:
+                for path in paths:
+                    with open(path, "w") as f:
+                        f.write(f"{value}\n")
+                return paths
+            except FileNotFoundError:
+                # device instances changed, e.g., OSC reconnection, resolve again
+                self.invalidate(param)
+            except OSError as e:
+                raise NativeWriteError(f"failed to write {param}={value}: {e}")
+        raise NativeWriteError(f"parameter {param} disappeared while writing")
+
+    def read(self, param: str) -> Dict[str, str]:
+        """
+        read values of all instances of the parameter
+        :param param: lctl parameter name
+        :return: {instance parameter name: value}, e.g., {"osc.lustre-OST0000-osc-ffff.max_dirty_mb": "10"}
+        :raise NativeWriteError: if the parameter can't be read natively
+        """
+        paths = self.resolve(param)
+        if len(paths) == 0:
+            raise NativeWriteError(f"parameter {param} is not found in {self.roots}")
+        values = {}
+        try:
+            for path in paths:
+                root = next(root for root in self.roots if path.startswith(root + os.sep))
+                instance = os.path.relpath(path, root).replace(os.sep, ".")
+                with open(path, "r") as f:
+                    values[instance] = f.read().strip()
+        except OSError as e:
+            self.invalidate(param)
+            raise NativeWriteError(f"failed to read {param}: {e}")
+        return values
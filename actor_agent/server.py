@@ -1,38 +1,262 @@
+import argparse
+import asyncio
 import logging
-import subprocess
-import sys
+import re
+import shutil
+import time
+from typing import List, Tuple, Optional, Dict
 
-from flask import Flask, request
+from aiohttp import web
+
+from lctl_writer import LctlParamWriter, NativeWriteError
 
 logger = logging.getLogger(__name__)
-app = Flask(__name__)
-@app.route('/')
-def index():
-    return 'Server Works!'
+# lctl parameter and value patterns accepted by the batch endpoint, commands are executed without shell
+PARAM_PATTERN = re.compile(r"^[\w.*\-]+$")
+VALUE_PATTERN = re.compile(r"^[\w.\-]+$")
+
+
+class SubprocessPool:
+    """
+    bounded pool of subprocesses, requests wait in a queue if all workers are busy
+    """
+
+    def __init__(self, max_workers: int, timeout: Optional[float] = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
 
-def exec_cmd(cmd):
+    async def run(self, args: List[str]) -> Tuple[int, str]:
+        """
+        run a command in the pool
+        :param args: program and its arguments
+        :return: return code and output (stdout and stderr)
+        """
+        enqueue_time = time.time()
+        self.queued += 1
+        try:
+            # the request may be cancelled while it waits, e.g., when the client disconnects
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        start = time.time()
+        wait_time = start - enqueue_time
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.running += 1
+        proc = None
+        try:
+            proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.STDOUT)
+            try:
+                output, _ = await asyncio.wait_for(proc.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                self.failed += 1
+                return -1, f"timeout after {self.timeout}s"
+            if proc.returncode != 0:
+                self.failed += 1
+            return proc.returncode, output.decode("utf8")
+        except OSError as e:
+            self.failed += 1
+            return -1, str(e)
+        except asyncio.CancelledError:
+            # the command doesn't outlive its request, the child watcher reaps the process
+            if proc is not None and proc.returncode is None:
+                proc.kill()
+            self.failed += 1
+            raise
+        finally:
+            self._semaphore.release()
+            self.running -= 1
+            self.completed += 1
+            self.total_run_time += time.time() - start
+
+    def metrics(self):
+        return {"max_workers": self.max_workers, "queued": self.queued, "running": self.running,
+                "completed": self.completed, "failed": self.failed,
+                "avg_wait_time": self.total_wait_time / self.completed if self.completed else 0,
+                "max_wait_time": self.max_wait_time,
+                "avg_run_time": self.total_run_time / self.completed if self.completed else 0}
+
+
+async def index(request: web.Request):
+    return web.Response(text='Server Works!')
+
+
+async def execution(request: web.Request):
     """
-    execute command
-    :param cmd: str|list
-    :param get_all_result:
-    :param raise_error:
-    :return: standard output if return code is 0, otherwise raise RuntimeError
+    execute a shell command, responses status 500 with the output if the command fails
     """
-    try:
-        result = subprocess.check_output(["/bin/sh", "-c", cmd], stderr=subprocess.STDOUT).decode("utf8")
+    cmd = request.query["cmd"]
+    return_code, output = await request.app["pool"].run(["/bin/sh", "-c", cmd])
+    if return_code != 0:
+        logger.error(f"Execution failed: {cmd}, {output}")
+        return web.Response(text=output, status=500)
+    return web.Response(text=output)
+
+
+async def set_param(app: web.Application, operation):
+    """
+    set one lctl parameter
+    :param app:
+    :param operation: {"param": "osc.*.max_dirty_mb", "value": 10}
+    :return: status of the operation
+    """
+    start = time.time()
+    param, value = str(operation.get("param", "")), str(operation.get("value", ""))
+    result = {"param": param, "value": value}
+    if not PARAM_PATTERN.match(param) or not VALUE_PATTERN.match(value):
+        result.update(status="error", output="invalid parameter or value", elapsed=0)
         return result
-    except OSError as e:
-        print("Execution failed:", e, file=sys.stderr)
-    except Exception as ge:
-        print("Execution failed:", ge, file=sys.stderr)
-    return 0
+    native_writer = app["native_writer"]
+    if native_writer is not None:
+        try:
+            paths = await asyncio.get_running_loop().run_in_executor(None, native_writer.write, param, value)
+            result.update(status="ok", output=f"{len(paths)} instances written", mode="native",
+                          elapsed=time.time() - start)
+            return result
+        except NativeWriteError as e:
+            logger.debug(f"fall back to lctl, {e}")
+    result["mode"] = "lctl"
+    return_code, output = await app["pool"].run(["sudo", "lctl", "set_param", f"{param}={value}"])
+    result.update(status="ok" if return_code == 0 else "error", output=output, elapsed=time.time() - start)
+    return result
+
+
+async def batch(request: web.Request):
+    """
+    apply a list of lctl set_param operations in one request
+    request body: {"operations": [{"param": "osc.*.max_dirty_mb", "value": 10}, ...], "parallel": false}
+    :return: per-parameter status and timings
+    """
+    start = time.time()
+    body = await request.json()
+    operations = body.get("operations", [])
+    if body.get("parallel", False):
+        results = await asyncio.gather(*[set_param(request.app, operation) for operation in operations])
+    else:
+        results = [await set_param(request.app, operation) for operation in operations]
+    return web.json_response({"results": list(results), "elapsed": time.time() - start})
+
+
+def parse_get_param_output(output: str) -> Dict[str, str]:
+    """
+    parse output of lctl get_param, multi-line values are joined with newline
+    :param output: e.g., osc.lustre-OST0000-osc-ffff.max_dirty_mb=10
+    :return: {instance parameter name: value}
+    """
+    values = {}
+    name = None
+    for line in output.splitlines():
+        key, sep, value = line.partition("=")
+        if sep and PARAM_PATTERN.match(key):
+            name = key
+            values[name] = value.strip()
+        elif name is not None:
+            values[name] = (values[name] + "\n" + line).strip()
+    return values
+
+
+async def get_param(app: web.Application, param: str):
+    """
+    read all instances of one lctl parameter
+    :param app:
+    :param param: e.g., osc.*.max_dirty_mb
+    :return: {instance parameter name: value} or error message
+    """
+    if not PARAM_PATTERN.match(param):
+        return None, "invalid parameter"
+    native_writer = app["native_writer"]
+    if native_writer is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, native_writer.read, param), None
+        except NativeWriteError as e:
+            logger.debug(f"fall back to lctl, {e}")
+    return_code, output = await app["pool"].run(["sudo", "lctl", "get_param", param])
+    if return_code != 0:
+        return None, output
+    return parse_get_param_output(output), None
+
+
+async def params(request: web.Request):
+    """
+    read current values of lctl parameters
+    request: /params?name=osc.*.max_dirty_mb&name=osc.*.max_rpcs_in_flight
+    :return: {"params": {name: {instance parameter name: value}}, "errors": {name: error message}}
+    """
+    names = request.query.getall("name", [])
+    results = await asyncio.gather(*[get_param(request.app, name) for name in names])
+    body = {"params": {}, "errors": {}}
+    for name, (values, error) in zip(names, results):
+        if error is None:
+            body["params"][name] = values
+        else:
+            body["errors"][name] = error
+    return web.json_response(body)
+
+
+async def health(request: web.Request):
+    """
+    liveness probe
+    """
+    return web.json_response({"status": "ok"})
+
+
+async def ready(request: web.Request):
+    """
+    readiness probe, the agent is ready if lctl is available and requests are not piling up
+    """
+    pool: SubprocessPool = request.app["pool"]
+    lctl_available = shutil.which("lctl") is not None
+    saturated = pool.queued >= pool.max_workers
+    body = {"lctl": lctl_available, "saturated": saturated, **pool.metrics()}
+    return web.json_response(body, status=200 if lctl_available and not saturated else 503)
+
+
+async def metrics(request: web.Request):
+    """
+    request queuing metrics of the subprocess pool
+    """
+    return web.json_response(request.app["pool"].metrics())
+
+
+def create_app(max_workers: int, cmd_timeout: Optional[float], native: bool) -> web.Application:
+    app = web.Application()
+    app["native_writer"] = LctlParamWriter() if native else None
 
-@app.route('/execute', methods=["get", "post"])
-def execution():
-    cmd = request.args["cmd"]
-    res = exec_cmd(cmd)
-    return str(res)
+    async def start_pool(app: web.Application):
+        # the semaphore needs to be created in the running event loop
+        app["pool"] = SubprocessPool(max_workers, cmd_timeout)
 
+    app.on_startup.append(start_pool)
+    app.router.add_get("/", index)
+    app.router.add_route("GET", "/execute", execution)
+    app.router.add_route("POST", "/execute", execution)
+    app.router.add_post("/batch", batch)
+    app.router.add_get("/params", params)
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/metrics", metrics)
+    return app
 
-app.run(host="0.0.0.0")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Magpie actor agent")
+    parser.add_argument("--native", action="store_true",
+                        help="write lctl parameters directly to /sys/fs/lustre and /proc/fs/lustre, "
+                             "fall back to lctl if it fails. The agent needs to run as root.")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--max-workers", type=int, default=16, help="maximum number of concurrent subprocesses")
+    parser.add_argument("--cmd-timeout", type=float, default=600, help="timeout in second of each command")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(args.max_workers, args.cmd_timeout, args.native), host="0.0.0.0", port=args.port)
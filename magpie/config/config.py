@@ -5,6 +5,8 @@ from pydantic import BaseSettings
 
 from magpie.environment.lustre.lustre_knobs import LustreKnobs
 from magpie.environment.lustre.lustre_performance_indicators import LustrePerformanceIndicators as LPI
+from magpie.types.clean_strategy import CleanStrategy
+from magpie.types.flux_query_mode import FluxQueryMode
 from magpie.types.knob import Knob
 from magpie.types.performance_indicator import FloatPerformanceIndicator
 from magpie.types.workload import Workload
@@ -23,6 +25,10 @@ class AppSettings(BaseSettings):
 class WorkloadSettings(AppSettings):
     ssh_user: str
     ssh_node: str
+    # how the files of the previous workload run are removed
+    clean_strategy: CleanStrategy = CleanStrategy.SERIAL
+    # number of concurrent rm processes on each client with the parallel clean strategy
+    clean_parallelism: int = 8
 
 class FioSettings(WorkloadSettings):
     # the fio script path on the server
@@ -39,6 +45,104 @@ class InfluxdbSettings(AppSettings):
 
 
 
+class StreamingCollectorSettings(AppSettings):
+    """
+    Configure the streaming collector which receives metrics from the socket_writer output of Telegraf
+    """
+    streaming_host: str = "0.0.0.0"
+    streaming_port: int = 8094
+    # samples older than the retention in second are dropped
+    streaming_retention: int = 900
+    # time in second to wait for samples of the window after it closes, it should cover the flush interval of Telegraf
+    streaming_flush_delay: float = 2
+
+
+class MetricsCacheSettings(AppSettings):
+    """
+    Configure the cache of metrics observed for each configuration
+    """
+    # maximum number of cached configurations, least recently used ones are evicted
+    metrics_cache_size: int = 256
+    # number of measurements of a configuration before its mean metrics are reused
+    metrics_cache_min_samples: int = 1
+    # measure a configuration again after this number of reuses, 0 means never
+    metrics_cache_remeasure_interval: int = 0
+    # use the mean of all measurements of a configuration instead of the latest one
+    metrics_cache_blend: bool = True
+
+
+class EarlyStoppingSettings(AppSettings):
+    """
+    Configure early stopping of workload runs whose throughput can't reach the best throughput
+    """
+    # a run is stopped if the upper confidence bound of its throughput is below this ratio of the best throughput
+    early_stopping_ratio: float = 0.8
+    # interval in second of the interim throughput samples
+    early_stopping_interval: float = 5
+    # number of interim samples before a run may be stopped
+    early_stopping_min_samples: int = 3
+    # width of the confidence bound in standard errors
+    early_stopping_z: float = 1.96
+
+
+class AdaptiveWindowSettings(AppSettings):
+    """
+    Configure the observation window which ends once the throughput is stable
+    """
+    # the window ends once the confidence interval of the mean throughput is within this ratio of the mean
+    adaptive_window_tolerance: float = 0.05
+    adaptive_window_confidence: float = 0.95
+    # interval in second of the throughput samples
+    adaptive_window_interval: float = 1
+    # bounds of the window relative to the requested observation time
+    adaptive_window_min_ratio: float = 0.34
+    adaptive_window_max_ratio: float = 3
+
+
+class EvaluationSettings(AppSettings):
+    """
+    Configure the evaluation of the top configurations, candidates run in parallel on the environments
+    """
+    # measurements of each candidate, they are ranked by the lower bound of the confidence interval of the mean.
+    # Each repeat is a workload run, with fewer parallel environments than repeats the evaluation takes longer
+    evaluation_repeats: int = 1
+    evaluation_confidence: float = 0.95
+    # number of stripe sandboxes, subdirectories of the tuning folder with their own layout and filebench run.
+    # Candidates which only differ in stripe knobs are measured side by side, 0 disables the sandboxes
+    evaluation_stripe_sandboxes: int = 0
+
+
+class SurrogateSettings(AppSettings):
+    """
+    Configure the surrogate environment which simulates Lustre with a model fitted on saved transitions
+    """
+    # folder of transitions saved by train.py with --transition-store-dir
+    surrogate_transition_store_dir: Optional[str]
+    # the most recent samples are used, fitting the Gaussian processes takes cubic time in it
+    surrogate_max_samples: int = 1000
+    # sample performance indicators from the predictive distribution instead of returning the mean
+    surrogate_sample_noise: bool = True
+    # seed of the sampling, parallel environments use seed + environment number
+    surrogate_seed: Optional[int] = None
+
+
+class ActorAgentSettings(AppSettings):
+    """
+    Configure the client of actor agents running on DFS nodes
+    """
+    agent_port: int = 5000
+    # timeout in second to establish a connection
+    agent_connect_timeout: float = 3
+    # default timeout in second to wait for the response
+    agent_read_timeout: float = 60
+    # number of retries on connection errors and 5xx responses
+    agent_max_retries: int = 3
+    # backoff factor between retries, sleeps {backoff factor} * (2 ** ({number of retries} - 1)) seconds
+    agent_backoff_factor: float = 0.2
+    # maximum number of keep-alive connections to each node
+    agent_pool_maxsize: int = 4
+
+
 class LustreSettings(AppSettings):
     # osc hosts
     osc_nodes: List[str]
@@ -48,6 +152,37 @@ class LustreSettings(AppSettings):
     mds_nodes: List[str]
     # ssh user
     ssh_user: str = "houkun.zhu"
+    # timeout in second to apply parameters on one node
+    apply_timeout: float = 10
+    # maximum number of nodes to which parameters are applied concurrently
+    max_apply_workers: int = 32
+    # apply all lctl parameters of a node in one request to the batch endpoint of the actor agent
+    batch_apply: bool = True
+    # apply the batched parameters in parallel on the node, keep it off if parameters depend on each other,
+    # e.g., max_read_ahead_whole_mb can't be bigger than max_read_ahead_mb
+    parallel_batch: bool = False
+    # cache live parameter values on each node and skip writes which don't change the value
+    cache_params: bool = True
+    # disjoint groups of osc nodes used by parallel environments, osc nodes are split evenly if it is None
+    client_groups: Optional[List[List[str]]] = None
+
+    def get_client_groups(self, num_groups: int) -> List[List[str]]:
+        """
+        get client groups of parallel environments
+        :param num_groups: number of parallel environments
+        :return: osc nodes of each group
+        """
+        if num_groups == 1:
+            return [self.osc_nodes]
+        if self.client_groups is not None:
+            groups = self.client_groups
+        else:
+            groups = [self.osc_nodes[i::num_groups] for i in range(num_groups)]
+        nodes = [node for group in groups for node in group]
+        if len(groups) < num_groups or any(len(group) == 0 for group in groups[:num_groups]) or \
+                len(nodes) != len(set(nodes)):
+            raise ValueError(f"{num_groups} disjoint client groups are required, client groups: {groups}")
+        return groups[:num_groups]
 
 
 class LustrePIsSettings(AppSettings):
@@ -67,6 +202,9 @@ class LustrePIsSettings(AppSettings):
     ram: List[FloatPerformanceIndicator] = [LPI.RAM_USED_PERCENT.value]
 
     query_file: str = APP_ROOT + "/config/lustre_influxdb.flux"
+    # joined: query_file joined by InfluxDB, split: sub-queries sent concurrently and joined by the collector,
+    # single_scan: one scan of all fields aggregated by the collector
+    query_mode: FluxQueryMode = FluxQueryMode.JOINED
 
 
 class LustreKnobsSettings(AppSettings):
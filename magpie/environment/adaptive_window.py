@@ -0,0 +1,51 @@
+import logging
+import time
+from typing import Callable
+
+from magpie.config.config import AdaptiveWindowSettings
+from magpie.utils.stats_utils import RunningStats
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveWindow:
+    """
+    observation window which ends once the confidence interval of the mean of a metric is tight enough.
+    The metric is sampled in consecutive intervals, the window is bounded relative to the requested observation time.
+    """
+
+    def __init__(self, settings: AdaptiveWindowSettings):
+        self.settings = settings
+
+    def is_stable(self, stats: RunningStats) -> bool:
+        if stats.count < 2:
+            return False
+        half_width = stats.confidence_half_width(self.settings.adaptive_window_confidence)
+        return half_width <= self.settings.adaptive_window_tolerance * abs(stats.mean)
+
+    def wait(self, observation_time: float, sample: Callable[[float, float], float]) -> float:
+        """
+        wait until the metric is stable
+        :param observation_time: requested observation time in second
+        :param sample: get the metric between a start time and an end time
+        :return: length of the window in second
+        """
+        start_time = time.time()
+        min_time = observation_time * self.settings.adaptive_window_min_ratio
+        max_time = observation_time * self.settings.adaptive_window_max_ratio
+        interval = self.settings.adaptive_window_interval
+        stats = RunningStats()
+        sample_start = start_time
+        while True:
+            time.sleep(max(0.0, min(sample_start + interval, start_time + max_time) - time.time()))
+            sample_end = time.time()
+            elapsed = sample_end - start_time
+            if elapsed >= max_time:
+                break
+            stats.add(sample(sample_start, sample_end))
+            sample_start = sample_end
+            if elapsed >= min_time and self.is_stable(stats):
+                break
+        logger.info(f"observation window of {elapsed:.1f}s, requested {observation_time}s, {stats.count} samples, "
+                    f"mean {stats.mean}, std {stats.std}")
+        return elapsed
@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from magpie.config.config import AdaptiveWindowSettings
+from magpie.environment.adaptive_window import AdaptiveWindow
+
+
+class TestAdaptiveWindow(TestCase):
+    def settings(self):
+        return AdaptiveWindowSettings(adaptive_window_tolerance=0.05, adaptive_window_interval=0.01,
+                                      adaptive_window_min_ratio=0.2, adaptive_window_max_ratio=2)
+
+    def test_stable_metric_ends_early(self):
+        window = AdaptiveWindow(self.settings())
+        elapsed = window.wait(0.5, lambda start, end: 100.0)
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertLess(elapsed, 0.5)
+
+    def test_noisy_metric_until_max(self):
+        values = iter([10.0, 200.0] * 1000)
+        window = AdaptiveWindow(self.settings())
+        elapsed = window.wait(0.1, lambda start, end: next(values))
+        self.assertGreaterEqual(elapsed, 0.2)
@@ -1,16 +1,24 @@
 import datetime
 import logging
+import socketserver
+import threading
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable
 
 import numpy as np
-import pandas as pd
 
-from magpie.config.config import InfluxdbSettings, LustrePIsSettings
+from magpie.config.config import InfluxdbSettings, LustrePIsSettings, StreamingCollectorSettings
+from magpie.environment.adaptive_window import AdaptiveWindow
+from magpie.environment.flux_query_plan import FluxQueryPlan
 from magpie.environment.lustre.lustre_performance_indicators import LustrePerformanceIndicators as LPI
+from magpie.environment.metrics_window import MetricsWindow
 from magpie.types.external_metrics import ExternalMetrics, LustreExternalMetrics
+from magpie.types.flux_query_mode import FluxQueryMode
 from magpie.types.performance_indicator import FloatPerformanceIndicator
+from magpie.utils.flux_csv import fill_columns, iter_columns, parse_rfc3339
 from magpie.utils.influxdb_api import InfluxDBAPI
+from magpie.utils.line_protocol import parse_line
 
 
 class Collector:
@@ -18,6 +26,19 @@ class Collector:
     performance indicator collector
     """
     logger = logging.Logger(__name__)
+    # the observation window ends once the metric is stable if it is set, see set_adaptive_window
+    adaptive_window: AdaptiveWindow = None
+    adaptive_window_metric: Callable[[ExternalMetrics], float] = None
+
+    def set_adaptive_window(self, adaptive_window: AdaptiveWindow, get_metric: Callable[[ExternalMetrics], float]):
+        """
+        end observation windows once the metric is stable instead of waiting for the observation time
+        :param adaptive_window:
+        :param get_metric: metric of the external metrics, e.g., LustreExternalMetrics.get_throughput
+        :return:
+        """
+        self.adaptive_window = adaptive_window
+        self.adaptive_window_metric = get_metric
 
     def get_pis(self, observation_time: int = None, start_time:float = None, end_time:float = None,wait_for_observation=True) -> (np.array, ExternalMetrics):
         """
@@ -31,7 +52,12 @@ class Collector:
             raise AttributeError(f"It's illegal to set observation time and start time or end time at the same time.")
         if observation_time is not None and wait_for_observation:
             self.logger.debug(f"pis observation time {observation_time}")
-            time.sleep(observation_time)
+            if self.adaptive_window is not None:
+                # samples of the last second may be incomplete
+                observation_time = self.adaptive_window.wait(observation_time, lambda start, end: (
+                    self.adaptive_window_metric(self._get_pis(None, start - 1, end - 1)[1])))
+            else:
+                time.sleep(observation_time)
         pis = self._get_pis(observation_time, start_time, end_time)
         return pis
 
@@ -42,22 +68,39 @@ class Collector:
 
 class InfluxDBCollector(Collector):
     logger = logging.Logger(__name__)
+    # columns of external metrics
+    EXTERNAL_COLUMNS = [LPI.READ_BYTES_RATE.get_alias_or_name(), LPI.WRITE_BYTES_RATE.get_alias_or_name(),
+                        LPI.READ_IOPS_RATE.get_alias_or_name(), LPI.WRITE_IOPS_RATE.get_alias_or_name()]
 
-    def __init__(self, influxdb_setting: InfluxdbSettings, internal_pis: List[FloatPerformanceIndicator]):
+    def __init__(self, influxdb_setting: InfluxdbSettings, internal_pis: List[FloatPerformanceIndicator],
+                 query_mode: FluxQueryMode = None, hosts: List[str] = None):
+        """
+        :param influxdb_setting:
+        :param internal_pis:
+        :param query_mode: how performance indicators are queried, the mode in LustrePIsSettings is used if it is None
+        :param hosts: only collect metrics of these hosts, all hosts if it is None
+        """
         self.internal_pis = internal_pis
         self.influxdb_api = InfluxDBAPI(influxdb_setting)
         self.internal_columns = [pi_format.alias or pi_format.name for pi_format in self.internal_pis]
-        with open(LustrePIsSettings().query_file, "r") as f:
-            self.pis_flux_query = f.read()
+        lustre_pis_settings = LustrePIsSettings()
+        self.query_plan = FluxQueryPlan(self.internal_columns, query_mode or lustre_pis_settings.query_mode,
+                                        lustre_pis_settings.query_file, hosts=hosts)
+        self.pis_flux_query = self.query_plan.queries[0]
+        self._executor = ThreadPoolExecutor(max_workers=len(self.query_plan.queries),
+                                            thread_name_prefix="influxdb-collector")
+        # position of each column in the metrics array, internal metrics come first
+        self.column_index = {column: i for i, column in enumerate(self.internal_columns + self.EXTERNAL_COLUMNS)}
+        self._metrics = np.empty(len(self.column_index), dtype=np.float64)
 
-    def get_throughput(self, metrics_df: pd.DataFrame) -> np.float:
-        write_rates = metrics_df[LPI.WRITE_BYTES_RATE.get_alias_or_name()].item() or 0
-        read_rates = metrics_df[LPI.READ_BYTES_RATE.get_alias_or_name()].item() or 0
+    def get_throughput(self, metrics: np.ndarray) -> float:
+        read_rates, write_rates = np.nan_to_num(metrics[[self.column_index[column] for column in
+                                                         self.EXTERNAL_COLUMNS[:2]]])
         return read_rates + write_rates
 
-    def get_iops(self, metrics_df: pd.DataFrame):
-        write_iops_rates = metrics_df[LPI.WRITE_IOPS_RATE.get_alias_or_name()].item()
-        read_iops_rates = metrics_df[LPI.READ_IOPS_RATE.get_alias_or_name()].item()
+    def get_iops(self, metrics: np.ndarray) -> float:
+        read_iops_rates, write_iops_rates = np.nan_to_num(metrics[[self.column_index[column] for column in
+                                                                   self.EXTERNAL_COLUMNS[2:]]])
         return read_iops_rates + write_iops_rates
 
     def _get_pis(self, observation_time: int = None, start_time: float = None, end_time: float = None) -> (
@@ -71,7 +114,112 @@ class InfluxDBCollector(Collector):
             start_delta = int(start_time - now)
             start_time = datetime.timedelta(seconds=start_delta)
             end_time = datetime.timedelta(seconds=end_delta)
-        dataframe = self.influxdb_api.query_data_frame(self.pis_flux_query, start_time, end_time)
-        internal_metrics = dataframe[self.internal_columns].to_numpy(dtype=np.float32).flatten()
-        external_metrics = LustreExternalMetrics(self.get_throughput(dataframe), self.get_iops(dataframe))
+        metrics = self._metrics
+        metrics.fill(np.nan)
+        if self.query_plan.mode is FluxQueryMode.SINGLE_SCAN:
+            for column, value in self._query_single_scan(start_time, end_time).items():
+                if column in self.column_index:
+                    metrics[self.column_index[column]] = value
+        else:
+            # sub-queries fill disjoint columns of the metrics array
+            futures = [self._executor.submit(self._fill_metrics, query, start_time, end_time, metrics) for query in
+                       self.query_plan.queries]
+            for future in futures:
+                future.result()
+        internal_metrics = metrics[:len(self.internal_columns)].astype(np.float32)
+        external_metrics = LustreExternalMetrics(self.get_throughput(metrics), self.get_iops(metrics))
+        return internal_metrics, external_metrics
+
+    def _fill_metrics(self, query: str, start_time: datetime.timedelta, end_time: datetime.timedelta,
+                      metrics: np.ndarray):
+        rows = self.influxdb_api.query_csv(query, start_time, end_time)
+        fill_columns(rows, self.column_index, metrics)
+
+    def _query_single_scan(self, start_time: datetime.timedelta, end_time: datetime.timedelta) -> Dict[str, float]:
+        """
+        scan all fields once, each table is one series downsampled to one sample per second
+        :return: {field: value}
+        """
+        window = MetricsWindow(retention_sec=float("inf"))
+        rows = self.influxdb_api.query_csv(self.pis_flux_query, start_time, end_time)
+        for series_no, field, value, timestamp in iter_columns(rows, ["table", "_field", "_value", "_time"]):
+            if value:
+                window.add(series_no, {field: float(value)}, parse_rfc3339(timestamp))
+        return window.aggregate(float("-inf"), float("inf"))
+
+
+class _LineProtocolHandler(socketserver.StreamRequestHandler):
+    """
+    read line protocol sent by the socket_writer output of Telegraf
+    """
+
+    def handle(self):
+        collector: StreamingCollector = self.server.collector
+        for line in self.rfile:
+            try:
+                collector.ingest(line.decode("utf8"))
+            except Exception as e:
+                collector.logger.warning(f"Failed to parse line {line}: {e}")
+
+
+class StreamingCollector(Collector):
+    """
+    collect performance indicators from samples streamed by Telegraf, the aggregates are maintained while samples
+    arrive, so no query is issued after the observation window closes.
+    """
+    logger = logging.getLogger(__name__)
+    # measurements used in lustre_influxdb.flux
+    MEASUREMENTS = ("lustre", "cpu", "mem")
+
+    def __init__(self, settings: StreamingCollectorSettings, internal_pis: List[FloatPerformanceIndicator]):
+        self.settings = settings
+        self.internal_pis = internal_pis
+        self.internal_columns = [pi_format.alias or pi_format.name for pi_format in self.internal_pis]
+        self.window = MetricsWindow(settings.streaming_retention)
+        self.server = socketserver.ThreadingTCPServer((settings.streaming_host, settings.streaming_port),
+                                                      _LineProtocolHandler)
+        self.server.daemon_threads = True
+        self.server.collector = self
+        self._listener = threading.Thread(target=self.server.serve_forever, name="streaming-collector", daemon=True)
+        self._listener.start()
+        self.logger.info(f"listening on {settings.streaming_host}:{settings.streaming_port} for Telegraf metrics")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def ingest(self, line: str):
+        """
+        add one line of line protocol to the window
+        :param line:
+        :return:
+        """
+        parsed = parse_line(line)
+        if parsed is None:
+            return
+        measurement, series_key, fields, timestamp = parsed
+        if measurement in self.MEASUREMENTS:
+            self.window.add(series_key, fields, timestamp)
+
+    def get_throughput(self, aggregates: Dict[str, float]) -> float:
+        return aggregates.get(LPI.READ_BYTES_RATE.get_alias_or_name(), 0) + \
+               aggregates.get(LPI.WRITE_BYTES_RATE.get_alias_or_name(), 0)
+
+    def get_iops(self, aggregates: Dict[str, float]) -> float:
+        return aggregates.get(LPI.READ_IOPS_RATE.get_alias_or_name(), 0) + \
+               aggregates.get(LPI.WRITE_IOPS_RATE.get_alias_or_name(), 0)
+
+    def _get_pis(self, observation_time: int = None, start_time: float = None, end_time: float = None) -> (
+            np.array, LustreExternalMetrics):
+        if observation_time is not None:
+            end_time = time.time()
+            start_time = end_time - observation_time
+        # Telegraf flushes samples periodically, wait until the samples of the window have arrived
+        time.sleep(max(0.0, end_time + self.settings.streaming_flush_delay - time.time()))
+        aggregates = self.window.aggregate(start_time, end_time)
+        missing = [column for column in self.internal_columns if column not in aggregates]
+        if len(missing) > 0:
+            self.logger.warning(f"no samples of {missing} in [{start_time}, {end_time})")
+        internal_metrics = np.array([aggregates.get(column, 0) for column in self.internal_columns], dtype=np.float32)
+        external_metrics = LustreExternalMetrics(self.get_throughput(aggregates), self.get_iops(aggregates))
         return internal_metrics, external_metrics
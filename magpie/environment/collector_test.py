@@ -1,7 +1,13 @@
+import csv
+import io
 from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
 
 from magpie.config.config import InfluxdbSettings, LustrePIsSettings
 from magpie.environment.collector import InfluxDBCollector
+from magpie.types.flux_query_mode import FluxQueryMode
 from magpie.environment.toy.toy_dfs_collector import ToyDFSCollector
 from magpie.utils import magpie_logging
 
@@ -19,8 +25,8 @@ class TestInfluxDBCollector(TestCase):
         self.assertIsNotNone(external)
 
     def test_get_throughput(self):
-        pis = self.db_collector.get_pis(3)
-        throughput = self.db_collector.get_throughput(pis)
+        _, external = self.db_collector.get_pis(3)
+        throughput = external.throughput
         print(throughput)
         self.assertIsNotNone(throughput)
 
@@ -28,6 +34,40 @@ class TestInfluxDBCollector(TestCase):
         dataframe = self.db_collector._get_all_dataframe(2)
 
 
+JOINED_CSV = """,result,table,_stop,cache_hit_ratio,read_bytes,read_calls,write_bytes,write_calls,cur_dirty_bytes
+,_result,0,2021-08-30T10:00:15Z,0.5,10,1,20,,7
+"""
+SINGLE_SCAN_CSV = """,result,table,_start,_stop,_time,_value,_field,_measurement,osd_id
+,_result,0,2021-08-30T10:00:00Z,2021-08-30T10:00:03Z,2021-08-30T10:00:01Z,100,write_bytes,lustre,OST0000
+,_result,0,2021-08-30T10:00:00Z,2021-08-30T10:00:03Z,2021-08-30T10:00:02Z,150,write_bytes,lustre,OST0000
+,_result,0,2021-08-30T10:00:00Z,2021-08-30T10:00:03Z,2021-08-30T10:00:03Z,250,write_bytes,lustre,OST0000
+,_result,1,2021-08-30T10:00:00Z,2021-08-30T10:00:03Z,2021-08-30T10:00:01Z,7,cur_dirty_bytes,lustre,OST0000
+,_result,1,2021-08-30T10:00:00Z,2021-08-30T10:00:03Z,2021-08-30T10:00:02Z,9,cur_dirty_bytes,lustre,OST0000
+"""
+
+
+class TestInfluxDBCollectorParsing(TestCase):
+    def _collector(self, mode, response):
+        with patch("magpie.environment.collector.InfluxDBAPI") as influxdb_api:
+            influxdb_api.return_value.query_csv.side_effect = lambda *args: csv.reader(io.StringIO(response))
+            pis = [LustrePIsSettings().file_system[0], LustrePIsSettings().file_system[-1]]
+            return InfluxDBCollector(InfluxdbSettings(url="http://localhost:8086", token=""), pis, mode)
+
+    def test_joined(self):
+        collector = self._collector(FluxQueryMode.JOINED, JOINED_CSV)
+        internal, external = collector.get_pis(start_time=0, end_time=1)
+        np.testing.assert_array_equal(internal, np.array([7, 0.5], dtype=np.float32))
+        self.assertEqual(external.throughput, 30)
+        self.assertEqual(external.iops, 1)
+
+    def test_single_scan(self):
+        collector = self._collector(FluxQueryMode.SINGLE_SCAN, SINGLE_SCAN_CSV)
+        internal, external = collector.get_pis(start_time=0, end_time=1)
+        self.assertEqual(internal[0], 8)
+        self.assertTrue(np.isnan(internal[1]))
+        self.assertEqual(external.throughput, 75)
+
+
 class TestToyDFSCollector(TestCase):
     def setUp(self) -> None:
         magpie_logging.init()
@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional, Type, Tuple
+
+import numpy as np
+
+from magpie.types.dfs_configuration import DFSConfiguration, ConfigurationScorePair
+from magpie.types.external_metrics import ExternalMetrics
+from magpie.types.knob import Knob
+from magpie.types.knob_codec import KnobCodec, EncodedDFSConfiguration
+
+logger = logging.getLogger(__name__)
+
+
+class _GrowableArray:
+    """
+    2d array which doubles its capacity when it is full, the filled rows are a view
+    """
+
+    def __init__(self, width: int, dtype):
+        self._data = np.zeros((16, width), dtype=dtype)
+        self.size = 0
+
+    def append(self, row) -> int:
+        if self.size == len(self._data):
+            self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+        self._data[self.size] = row
+        self.size += 1
+        return self.size - 1
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._data[:self.size]
+
+
+class ConfigurationHistory:
+    """
+    history of all evaluated configurations and their external metrics, optionally persisted in SQLite.
+    The records are mirrored in NumPy arrays, measurements of the same configuration and workload are aggregated,
+    so queries are vectorized over the distinct configurations. Queries return the mean metrics of a configuration.
+    The history is shared by parallel environments, records are added under a lock.
+    """
+
+    def __init__(self, knobs: List[Knob], external_metrics_cls: Type[ExternalMetrics], path: str = None,
+                 rank_metric: str = None):
+        """
+        :param knobs: knobs of the recorded configurations
+        :param external_metrics_cls: class of the returned external metrics, it's created from the metric means
+        :param path: SQLite database file, records of earlier runs with the same knobs are loaded.
+        The history is kept in memory only if it is None.
+        :param rank_metric: metric ranked by top_k, the first recorded metric if it is None,
+        i.e., throughput of Lustre like LustreExternalMetrics.__lt__
+        """
+        self.codec = KnobCodec(knobs)
+        self.knob_names = [f"{knob.scope}.{knob.name}" for knob in knobs]
+        self.external_metrics_cls = external_metrics_cls
+        self.path = path
+        self.rank_metric = rank_metric
+        self.metric_names: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        # records
+        self.timestamps: List[float] = []
+        self._record_groups: List[int] = []
+        # distinct (workload, configuration) groups
+        self._group_index: Dict[Tuple[Optional[str], bytes], int] = {}
+        self._workloads: List[Optional[str]] = []
+        self._group_workloads = np.empty(0, dtype=np.int32)
+        self._configurations = _GrowableArray(len(knobs), self.codec.dtype)
+        self._metric_sums: Optional[_GrowableArray] = None
+        self._counts = np.empty(0, dtype=np.int64)
+        self._connection = None
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS evaluations (id INTEGER PRIMARY KEY, "
+                                     "timestamp REAL, workload TEXT, configuration TEXT, metrics TEXT)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS evaluations_workload ON evaluations (workload)")
+        meta = dict(self._connection.execute("SELECT key, value FROM meta").fetchall())
+        if "knob_names" in meta and json.loads(meta["knob_names"]) != self.knob_names:
+            raise ValueError(f"knob names {self.knob_names} don't match the history {path}: {meta['knob_names']}")
+        if "metric_names" in meta:
+            self._set_metric_names(json.loads(meta["metric_names"]))
+        rows = self._connection.execute(
+            "SELECT timestamp, workload, configuration, metrics FROM evaluations ORDER BY id").fetchall()
+        for timestamp, workload, configuration, metrics in rows:
+            self._add(timestamp, workload, np.array(json.loads(configuration), dtype=self.codec.dtype),
+                      json.loads(metrics))
+        if len(rows) > 0:
+            logger.info(f"loaded {len(rows)} evaluations of {self.num_configurations} configurations from {path}")
+
+    def _set_metric_names(self, metric_names: List[str]):
+        self.metric_names = list(metric_names)
+        self._metric_sums = _GrowableArray(len(metric_names), np.float64)
+        self.rank_metric = self.rank_metric or self.metric_names[0]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def num_configurations(self) -> int:
+        return len(self._counts)
+
+    def values(self, configuration: DFSConfiguration) -> np.ndarray:
+        """
+        knob values of a configuration in the order of the knobs, missing knobs have their default value
+        """
+        if isinstance(configuration, EncodedDFSConfiguration) and \
+                configuration.codec.knob_key == self.codec.knob_key:
+            return configuration.values
+        parameters = configuration.get_parameters()
+        return np.array([parameters.get(knob, knob.default) for knob in self.codec.knobs], dtype=self.codec.dtype)
+
+    def _add(self, timestamp: float, workload: Optional[str], values: np.ndarray, metrics: List[float]):
+        key = (workload, values.tobytes())
+        group = self._group_index.get(key)
+        if group is None:
+            if workload not in self._workloads:
+                self._workloads.append(workload)
+            group = self._configurations.append(values)
+            self._metric_sums.append(np.zeros(len(self.metric_names)))
+            self._group_workloads = np.append(self._group_workloads, self._workloads.index(workload))
+            self._counts = np.append(self._counts, 0)
+            self._group_index[key] = group
+        self._metric_sums.rows[group] += metrics
+        self._counts[group] += 1
+        self.timestamps.append(timestamp)
+        self._record_groups.append(group)
+
+    def add(self, configuration: DFSConfiguration, metrics: ExternalMetrics, workload: str = None):
+        """
+        record an evaluation
+        :param configuration:
+        :param metrics: external metrics observed for the configuration
+        :param workload: name of the workload, queries are limited to one workload
+        :return:
+        """
+        values = self.values(configuration)
+        all_metrics = metrics.get_all_metrics()
+        timestamp = time.time()
+        with self._lock:
+            if self.metric_names is None:
+                self._set_metric_names(list(all_metrics.keys()))
+                if self._connection is not None:
+                    with self._connection:
+                        self._connection.executemany(
+                            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            [("knob_names", json.dumps(self.knob_names)),
+                             ("metric_names", json.dumps(self.metric_names))])
+            metric_values = [float(all_metrics.get(name, np.nan)) for name in self.metric_names]
+            self._add(timestamp, workload, values, metric_values)
+            if self._connection is not None:
+                try:
+                    with self._connection:
+                        self._connection.execute(
+                            "INSERT INTO evaluations (timestamp, workload, configuration, metrics) VALUES (?, ?, ?, ?)",
+                            (timestamp, workload, json.dumps(values.tolist()), json.dumps(metric_values)))
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist the evaluation of {values.tolist()}: {e}")
+
+    def _groups(self, workload: Optional[str]) -> np.ndarray:
+        if workload not in self._workloads:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self._group_workloads == self._workloads.index(workload))
+
+    def _means(self, groups: np.ndarray) -> np.ndarray:
+        return self._metric_sums.rows[groups] / self._counts[groups, None]
+
+    def _pair(self, group: int, means: np.ndarray) -> ConfigurationScorePair:
+        configuration = self.codec.to_configuration(self._configurations.rows[group].copy())
+        return ConfigurationScorePair(configuration,
+                                      self.external_metrics_cls(**dict(zip(self.metric_names, means.tolist()))))
+
+    def top_k(self, k: int, workload: str = None, metric: str = None) -> List[ConfigurationScorePair]:
+        """
+        configurations with the highest mean of a metric
+        :param k:
+        :param workload:
+        :param metric: rank metric of the history if it is None
+        :return: at most k configurations ordered from the best
+        """
+        with self._lock:
+            groups = self._groups(workload)
+            if len(groups) == 0 or k <= 0:
+                return []
+            means = self._means(groups)
+            scores = means[:, self.metric_names.index(metric or self.rank_metric)]
+            scores = np.where(np.isnan(scores), -np.inf, scores)
+            if len(groups) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(groups))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [self._pair(groups[i], means[i]) for i in top]
+
+    def pareto_front(self, workload: str = None, metrics: List[str] = None) -> List[ConfigurationScorePair]:
+        """
+        configurations whose mean metrics are not dominated by another configuration, all metrics are maximized
+        :param workload:
+        :param metrics: compared metrics, all recorded metrics if it is None
+        :return: configurations of the front ordered by the first compared metric from the best
+        """
+        with self._lock:
+            groups = self._groups(workload)
+            if len(groups) == 0:
+                return []
+            means = self._means(groups)
+            columns = [self.metric_names.index(name) for name in (metrics or self.metric_names)]
+            points = np.nan_to_num(means[:, columns], nan=-np.inf)
+            # i is dominated by j if j is at least as good in all metrics and better in one
+            at_least = (points[None, :, :] >= points[:, None, :]).all(axis=2)
+            better = (points[None, :, :] > points[:, None, :]).any(axis=2)
+            front = np.flatnonzero(~(at_least & better).any(axis=1))
+            front = front[np.argsort(-points[front, 0], kind="stable")]
+            return [self._pair(groups[i], means[i]) for i in front]
+
+    def nearest(self, configuration: DFSConfiguration, k: int = 1,
+                workload: str = None) -> List[ConfigurationScorePair]:
+        """
+        evaluated configurations closest to a configuration, knob values are scaled by the knob range
+        :param configuration:
+        :param k:
+        :param workload:
+        :return: at most k configurations ordered from the nearest
+        """
+        values = self.values(configuration)
+        with self._lock:
+            groups = self._groups(workload)
+            if len(groups) == 0 or k <= 0:
+                return []
+            scale = np.where(self.codec.scale == 0, 1, self.codec.scale)
+            distances = np.sum(((self._configurations.rows[groups] - values) / scale) ** 2, axis=1)
+            nearest = np.argsort(distances, kind="stable")[:k]
+            means = self._means(groups[nearest])
+            return [self._pair(groups[i], mean) for i, mean in zip(nearest, means)]
+
+    def lookup(self, configuration: DFSConfiguration, workload: str = None) -> Optional[ConfigurationScorePair]:
+        """
+        :return: mean metrics of all evaluations of the configuration, None if it isn't evaluated
+        """
+        with self._lock:
+            group = self._group_index.get((workload, self.values(configuration).tobytes()))
+            if group is None:
+                return None
+            return self._pair(group, self._means(np.array([group]))[0])
+
+    def count(self, configuration: DFSConfiguration, workload: str = None) -> int:
+        """
+        :return: number of evaluations of the configuration
+        """
+        with self._lock:
+            group = self._group_index.get((workload, self.values(configuration).tobytes()))
+            return 0 if group is None else int(self._counts[group])
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
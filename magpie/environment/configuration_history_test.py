@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from magpie.environment.configuration_history import ConfigurationHistory
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.types.dfs_configuration import DFSConfiguration, ScopedTuneParameters, TuneParameter
+from magpie.types.external_metrics import LustreExternalMetrics
+
+KNOBS = [LustreKnobs.STRIPE_COUNT.knob, LustreKnobs.STRIPE_SIZE.knob]
+
+
+def stripe_configuration(count, size):
+    return DFSConfiguration([ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, count),
+                                                             TuneParameter(LustreKnobs.STRIPE_SIZE.knob, size)])])
+
+
+def values(pairs):
+    return [[value for value in pair.configuration.get_parameters().values()] for pair in pairs]
+
+
+class TestConfigurationHistory(TestCase):
+    def setUp(self) -> None:
+        self.history = ConfigurationHistory(KNOBS, LustreExternalMetrics)
+        self.history.add(stripe_configuration(1, 16), LustreExternalMetrics(100, 30), "fileserver.f")
+        self.history.add(stripe_configuration(2, 16), LustreExternalMetrics(300, 10), "fileserver.f")
+        self.history.add(stripe_configuration(2, 16), LustreExternalMetrics(100, 10), "fileserver.f")
+        self.history.add(stripe_configuration(4, 32), LustreExternalMetrics(150, 5), "fileserver.f")
+        self.history.add(stripe_configuration(4, 64), LustreExternalMetrics(500, 50), "videoserver.f")
+
+    def test_top_k(self):
+        top = self.history.top_k(2, "fileserver.f")
+        self.assertEqual(values(top), [[2, 16], [4, 32]])
+        self.assertEqual(top[0].score.throughput, 200)
+        self.assertEqual(values(self.history.top_k(1, "fileserver.f", metric="iops")), [[1, 16]])
+        self.assertEqual(len(self.history.top_k(10, "fileserver.f")), 3)
+        self.assertEqual(self.history.top_k(3, "webserver.f"), [])
+
+    def test_pareto_front(self):
+        front = self.history.pareto_front("fileserver.f")
+        self.assertEqual(values(front), [[2, 16], [1, 16]])
+
+    def test_nearest_and_lookup(self):
+        self.assertEqual(values(self.history.nearest(stripe_configuration(3, 30), 1, "fileserver.f")), [[4, 32]])
+        self.assertEqual(self.history.lookup(stripe_configuration(2, 16), "fileserver.f").score.iops, 10)
+        self.assertIsNone(self.history.lookup(stripe_configuration(2, 16), "videoserver.f"))
+        self.assertEqual(self.history.count(stripe_configuration(2, 16), "fileserver.f"), 2)
+        self.assertEqual(len(self.history), 5)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.db")
+            history = ConfigurationHistory(KNOBS, LustreExternalMetrics, path)
+            history.add(stripe_configuration(2, 16), LustreExternalMetrics(300, 10), "fileserver.f")
+            history.add(stripe_configuration(2, 16), LustreExternalMetrics(100, 10), "fileserver.f")
+            history.close()
+            history = ConfigurationHistory(KNOBS, LustreExternalMetrics, path)
+            self.assertEqual(history.count(stripe_configuration(2, 16), "fileserver.f"), 2)
+            self.assertEqual(history.top_k(1, "fileserver.f")[0].score.throughput, 200)
+            history.close()
+            with self.assertRaises(ValueError):
+                ConfigurationHistory(KNOBS[:1], LustreExternalMetrics, path)
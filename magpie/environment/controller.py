@@ -1,8 +1,9 @@
 import logging
 from collections import defaultdict
-from typing import List, Union
+from typing import List, Union, Set, Dict, Optional
 
-from magpie.types.dfs_configuration import ScopedTuneParameters, TuneParameter
+from magpie.types.apply_result import ApplyResult
+from magpie.types.dfs_configuration import ScopedTuneParameters, TuneParameter, DFSConfiguration
 from magpie.types.knob import Knob
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,8 @@ class CentralDFSController:
     """
     Controller for DFS with a central parameter management system. e.g., CephFS.
     """
+    # scopes whose parameters can be only applied together
+    atomic_scopes: Set[str] = set()
 
     def set_params(self, scoped_parameters: ScopedTuneParameters, **kwargs):
         """
@@ -22,11 +25,23 @@ class CentralDFSController:
         """
         raise NotImplementedError
 
+    def set_configuration(self, configuration: DFSConfiguration) -> ApplyResult:
+        """
+        set all scoped parameters of a configuration
+        :param configuration:
+        :return:
+        """
+        for scoped_parameters in configuration:
+            self.set_params(scoped_parameters)
+        return ApplyResult()
+
 
 class DistributedDFSController:
     """
     Controller for DFS in which configuration can be only set in each daemon. e.g., Lustre.
     """
+    # scopes whose parameters can be only applied together
+    atomic_scopes: Set[str] = set()
 
     def set_params(self, parameters: Union[ScopedTuneParameters, List[TuneParameter]], **kwargs):
         """
@@ -42,6 +57,16 @@ class DistributedDFSController:
         else:
             self._set_scope_params(parameters)
 
+    def set_configuration(self, configuration: DFSConfiguration) -> ApplyResult:
+        """
+        set all scoped parameters of a configuration. Subclasses may apply the scopes concurrently.
+        :param configuration:
+        :return: result of each node
+        """
+        for scoped_parameters in configuration:
+            self._set_scope_params(scoped_parameters)
+        return ApplyResult()
+
     def _set_scope_params(self, parameters: ScopedTuneParameters):
         raise NotImplementedError
 
@@ -56,6 +81,14 @@ class DistributedDFSController:
             res[parameter.name.scope].append(parameter)
         return [ScopedTuneParameters(scope, scope_param) for scope, scope_param in res.items()]
 
+    def get_params(self, knobs: List[Knob]) -> Dict[str, Dict[Knob, Optional[Union[int, float]]]]:
+        """
+        get current values of knobs on each node
+        :param knobs:
+        :return: {node: {knob: value}}, value is None if it is unknown
+        """
+        raise NotImplementedError
+
     def reset_params(self, tuned_params: List[Knob]):
         """
         reset DFS tuned parameters to default value
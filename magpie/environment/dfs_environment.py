@@ -1,7 +1,7 @@
+import contextlib
 import heapq
 import logging
 import time
-from collections import defaultdict
 from typing import Any, List, Union, Type, Callable
 
 import numpy as np
@@ -11,16 +11,22 @@ from tf_agents.specs import array_spec
 from tf_agents.trajectories import time_step as ts
 from tf_agents.typing import types
 
-from magpie.config.config import WorkloadSettings
+from magpie.config.config import WorkloadSettings, EarlyStoppingSettings
 from magpie.environment.collector import Collector
+from magpie.environment.configuration_history import ConfigurationHistory
 from magpie.environment.controller import DistributedDFSController, CentralDFSController
+from magpie.environment.metrics_cache import ConfigurationMetricsCache
 from magpie.environment.reward import Reward
-from magpie.types.dfs_configuration import TuneParameter, ScopedTuneParameters, ConfigurationScorePair, DFSConfiguration
+from magpie.types.dfs_configuration import ConfigurationScorePair, DFSConfiguration
 from magpie.types.external_metrics import ExternalMetrics
 from magpie.types.knob import Knob
+from magpie.types.knob_codec import KnobCodec, EncodedDFSConfiguration
 from magpie.types.performance_indicator import FloatPerformanceIndicator
 from magpie.types.reward_type import RewardInput
 from magpie.utils.dd_utils import DDUtils
+from magpie.utils.readiness import wait_until
+from magpie.utils.stats_utils import ConfidenceBoundStopper
+from magpie.utils.transition_store import TransitionStore
 
 
 class Normalizer:
@@ -49,15 +55,27 @@ class DFSEnvironment(py_environment.PyEnvironment):
                  step_observers: Callable[[DFSConfiguration, Any, ExternalMetrics, float], None] = None,
                  summary_step_observer: bool = True,
                  dd_workload: bool = False,
+                 diff_apply: bool = True,
+                 dd_util: DDUtils = None,
+                 transition_store: TransitionStore = None,
+                 metrics_cache: ConfigurationMetricsCache = None,
+                 workload_name: str = None,
+                 early_stopping: EarlyStoppingSettings = None,
+                 configuration_history: ConfigurationHistory = None,
                  **kwargs):
         super().__init__()
         self.dd_workload = dd_workload
         if self.dd_workload:
-            self.dd_util = DDUtils(WorkloadSettings())
+            self.dd_util = dd_util or DDUtils(WorkloadSettings())
         self.external_metrics_cls = external_metrics_cls
         self.knobs = knobs
+        self.knob_codec = KnobCodec(knobs)
         self.enable_observation_normalizer = enable_observation_normalizer
         self._step_observers = step_observers or []
+        # the default summary writer and step of TF are thread local, they are unset in the threads of a batched
+        # environment, see set_summary_writer
+        self.summary_writer = None
+        self.summary_step = None
         if summary_step_observer:
             self._step_observers += [self.summary_step_observer]
         self._action_spec = array_spec.BoundedArraySpec(shape=(len(knobs),), dtype=np.float32, minimum=0, maximum=1,
@@ -81,9 +99,24 @@ class DFSEnvironment(py_environment.PyEnvironment):
         if self.debug:
             self.logger.warning("Execute DFS environment in debug mode!")
         self.observation_time = observation_time
+        # deadline in second of the metrics to flow after initialization, 0 disables the readiness probe
         self.delay_after_initialization = 10 if not self.dd_workload else 0
         self.observation_normalizer = Normalizer(internal_pis) if enable_observation_normalizer else None
         self.best_metrics: ExternalMetrics = None
+        # only apply parameters which differ from the last applied configuration
+        self.diff_apply = diff_apply
+        self.applied_configuration: DFSConfiguration = None
+        # transitions are saved for offline training if the store is set
+        self.transition_store = transition_store
+        self._last_state = None
+        self._first_step = True
+        # metrics of revisited configurations are reused if the cache is set, the key includes the workload name
+        self.metrics_cache = metrics_cache
+        self.workload_name = workload_name
+        # filebench runs which can't reach the best metrics are stopped early if it is set
+        self.early_stopping = early_stopping
+        # all measured configurations are recorded if it is set, it's kept across resets
+        self.configuration_history = configuration_history
 
     def set_state(self, state: Any) -> None:
         pass
@@ -106,6 +139,17 @@ class DFSEnvironment(py_environment.PyEnvironment):
             return normalized_internal_metrics, external_metrics
         return internal_metrics, external_metrics
 
+    def is_metrics_flowing(self, window: float = 3) -> bool:
+        """
+        readiness probe of the workload
+        :param window: length in second of the checked window
+        :return: True if the reward metric of the last seconds is positive
+        """
+        # samples of the last second may be incomplete
+        end_time = time.time() - 1
+        _, external_metrics = self.collector.get_pis(None, end_time - window, end_time)
+        return self.reward_model.get_metric_a(external_metrics) > 0
+
     def _initialization(self):
         raise NotImplementedError
 
@@ -113,9 +157,11 @@ class DFSEnvironment(py_environment.PyEnvironment):
         # initialization
         self.logger.info("Start to reset environment.")
         initialization = self._initialization()
-        if not self.debug and not self.dd_workload:
-            self.logger.info(f"Sleep {self.delay_after_initialization} seconds after initialization.")
-            time.sleep(self.delay_after_initialization)
+        # parameters may be reset during initialization
+        self.applied_configuration = None
+        if not self.debug and not self.dd_workload and self.delay_after_initialization > 0:
+            self.logger.info(f"Wait at most {self.delay_after_initialization} seconds for metrics after initialization.")
+            wait_until(self.is_metrics_flowing, self.delay_after_initialization, description="metrics are flowing")
         if self.dd_workload:
             if self.dd_util.type == "fio":
                 start_time = initialization + 32
@@ -132,18 +178,30 @@ class DFSEnvironment(py_environment.PyEnvironment):
         self.best_metrics = self.previous_metrics
         self.good_configurations = []
         self.best_configuration_size = 5
+        self._last_state = np.array(state, dtype=np.float32)
+        self._first_step = True
         self.logger.info("Finish to reset environment.")
         return ts.restart(np.array(state, dtype=np.float32))
 
-    @staticmethod
-    def summary_step_observer(new_parameters: DFSConfiguration, current_state,
+    def set_summary_writer(self, writer, step):
+        """
+        write the step summaries with the writer instead of the default one of the stepping thread
+        :param writer: summary writer
+        :param step: step of the summaries, e.g., the global step variable
+        :return:
+        """
+        self.summary_writer = writer
+        self.summary_step = step
+
+    def summary_step_observer(self, new_parameters: DFSConfiguration, current_state,
                               current_external_metrics: ExternalMetrics,
                               reward):
         log_str = ""
-        for name, value in current_external_metrics.get_all_metrics().items():
-            log_str += f" {name} metrics={value}"
-            tf.summary.scalar(f"metric_{name}", value)
-            tf.summary.scalar('training/reward', reward)
+        with self.summary_writer.as_default() if self.summary_writer is not None else contextlib.nullcontext():
+            for name, value in current_external_metrics.get_all_metrics().items():
+                log_str += f" {name} metrics={value}"
+                tf.summary.scalar(f"metric_{name}", value, step=self.summary_step)
+            tf.summary.scalar('training/reward', reward, step=self.summary_step)
         DFSEnvironment.logger.info(log_str)
 
     def step_observe(self, new_parameters: DFSConfiguration, current_state,
@@ -167,32 +225,22 @@ class DFSEnvironment(py_environment.PyEnvironment):
     def generate_knobs(self, action: np.array) -> DFSConfiguration:
         """
         generate knobs for given actions
-        :param knobs:
         :param action:
-        :return: {knob_scope, [Knob, Knob_value]}
+        :return: configuration backed by the knob values, scoped parameters are created when they are accessed
         """
-        new_config = defaultdict(list)
-        for knob, action_value in zip(self.knobs, action):
-            assert 0 <= action_value <= 1, f"invalid action {action_value}, action value needs to be between 0 and 1"
-            if knob.type is np.int or knob.type is np.float:
-                new_value = knob.min + (knob.max - knob.min) * action_value
-                new_value = int(new_value)
-            else:
-                raise NotImplementedError(f"knob type {knob.type} is not implemented.")
-            tune_parameter = TuneParameter(knob, new_value)
-            new_config[knob.scope].append(tune_parameter)
-        result = DFSConfiguration(
-            [ScopedTuneParameters(scope=scope, parameters=params) for scope, params in new_config.items()])
-        return result
+        return self.knob_codec.to_configuration(self.knob_codec.decode(action)[0])
 
     def update_best_configuration(self, dfs_configuration: DFSConfiguration,
-                                  new_metric: ExternalMetrics) -> bool:
+                                  new_metric: ExternalMetrics, record: bool = True) -> bool:
         """
         compare new metrics, if it's better, set it to best metrics
         :param dfs_configuration:
         :param new_metric:
+        :param record: add the metrics to the configuration history, False for reused metrics
         :return:
         """
+        if record and self.configuration_history is not None:
+            self.configuration_history.add(dfs_configuration, new_metric, self.workload_name)
         new_is_better = self.best_metrics < new_metric
         if new_is_better:
             self.best_metrics = new_metric
@@ -205,43 +253,148 @@ class DFSEnvironment(py_environment.PyEnvironment):
         # self.logger.debug(f"best configuration queue: {self.good_configurations}")
         return new_is_better
 
+    def top_configurations(self, k: int) -> List[ConfigurationScorePair]:
+        """
+        best configurations by their mean metrics in the configuration history, otherwise the good configurations
+        since the last reset
+        :param k:
+        :return: at most k configurations ordered from the best
+        """
+        if self.configuration_history is not None:
+            return self.configuration_history.top_k(k, self.workload_name)
+        return heapq.nlargest(k, self.good_configurations)
+
     def get_info(self) -> ExternalMetrics:
         return self.previous_metrics
 
     def _step(self, action: types.NestedArray) -> ts.TimeStep:
         # self.logger.debug(f"agent's new action = {pformat(action)}")
         new_configuration = self.generate_knobs(action)
-        self.apply_configuration(new_configuration)
-        if self.dd_workload:
-            start_time, end_time = self._start_offline_workload(self.dd_util)
-            current_state, current_external_metrics = self.get_metrics(None, start_time, end_time)
+        cached = None
+        if self.metrics_cache is not None:
+            cached = self.metrics_cache.reuse(new_configuration, self.workload_name)
+        if cached is not None:
+            # the configuration is not applied, the next applied configuration is compared with the current one
+            current_state, current_external_metrics = cached
+            self.logger.info(f"reuse cached metrics of {new_configuration.__repr__()}")
         else:
-            current_state, current_external_metrics = self.get_metrics()
+            self.apply_configuration(new_configuration)
+            stopped = False
+            if self.dd_workload:
+                if self.early_stopping is not None and self.dd_util.type == "filebench":
+                    start_time, end_time, stopped = self._run_offline_workload_with_early_stopping()
+                else:
+                    start_time, end_time = self._start_offline_workload(self.dd_util)
+                current_state, current_external_metrics = self.get_metrics(None, start_time, end_time)
+            else:
+                current_state, current_external_metrics = self.get_metrics()
+            # the metrics of a stopped run only cover its truncated window, they are not reused
+            if self.metrics_cache is not None and not stopped:
+                current_state, current_external_metrics = self.metrics_cache.record(
+                    new_configuration, self.workload_name, current_state, current_external_metrics)
         reward = self.get_reward(current_external_metrics)
+        self.store_transition(action, new_configuration, current_state, current_external_metrics, reward)
         self.step_observe(new_configuration, current_state, current_external_metrics, reward)
-        self.update_best_configuration(new_configuration, current_external_metrics)
+        self.update_best_configuration(new_configuration, current_external_metrics, record=cached is None)
         self.previous_metrics = current_external_metrics
         return ts.transition(current_state, reward=reward, discount=self.discount_factor)
 
+    def store_transition(self, action, configuration: DFSConfiguration, current_state,
+                         current_external_metrics: ExternalMetrics, reward: float):
+        if self.transition_store is None:
+            return
+        parameters = configuration.get_parameters()
+        try:
+            self.transition_store.append(self._last_state, action, [parameters.get(knob) for knob in self.knobs],
+                                         reward, current_external_metrics.get_all_metrics(), first=self._first_step)
+        except OSError as e:
+            self.logger.warning(f"Failed to store transition: {e}")
+        self._last_state = np.array(current_state, dtype=np.float32)
+        self._first_step = False
+
     def apply_configuration(self, new_configuration: DFSConfiguration):
         if self.debug:
             self.logger.warning(f"Doesn't apply new configuration in debug mode!")
             return
-        for scope_parameters in new_configuration:
-            self.controller.set_params(scope_parameters)
-        self.logger.info(f"apply new configuration, {new_configuration.__repr__()}")
+        if self.diff_apply:
+            changed_configuration = new_configuration.difference(self.applied_configuration,
+                                                                 self.controller.atomic_scopes)
+            if len(changed_configuration) == 0:
+                self.logger.info(f"configuration is not changed, {new_configuration.__repr__()}")
+                return
+        else:
+            changed_configuration = new_configuration
+        result = self.controller.set_configuration(changed_configuration)
+        if not result.succeeded:
+            self.logger.warning(f"new configuration is partially applied, {result}")
+        # scopes failed on any node are applied again next time
+        failed_scopes = result.failed_scopes()
+        if len(failed_scopes) == 0 and self._covers_applied_configuration(new_configuration):
+            # no knob of the applied configuration is left, the configuration of the step stays array backed
+            self.applied_configuration = new_configuration
+        else:
+            applied_configuration = DFSConfiguration(
+                [scoped_parameters for scoped_parameters in changed_configuration if
+                 scoped_parameters.scope not in failed_scopes])
+            if self.applied_configuration is None:
+                self.applied_configuration = applied_configuration
+            else:
+                self.applied_configuration = self.applied_configuration.update(applied_configuration)
+        self.logger.info(f"apply new configuration, {new_configuration.__repr__()}, changed: {changed_configuration}")
+
+    def _covers_applied_configuration(self, configuration: DFSConfiguration) -> bool:
+        """
+        :return: whether the configuration has all knobs of the applied configuration
+        """
+        applied = self.applied_configuration
+        if applied is None:
+            return True
+        if isinstance(configuration, EncodedDFSConfiguration) and isinstance(applied, EncodedDFSConfiguration):
+            return configuration.codec.knob_key == applied.codec.knob_key
+        return configuration.get_parameters().keys() >= applied.get_parameters().keys()
 
     @staticmethod
     def _start_offline_workload(dd_util, clean_wait_sec: int = 20, start_ramp_sec: int = 12, end_ramp_sec: int = 11, eval=False):
         dd_util.clean()
-        DFSEnvironment.logger.info(f"sleep {clean_wait_sec} seconds")
-        time.sleep(clean_wait_sec)
+        DFSEnvironment.logger.info(f"wait at most {clean_wait_sec} seconds for the cleanup")
+        dd_util.wait_space_reclaimed(clean_wait_sec)
         DFSEnvironment.logger.info(f"start workload")
         start_time = time.time() + start_ramp_sec
         dd_util.start_workload(eval=eval)
         end_time = time.time() - end_ramp_sec
         return start_time, end_time
 
+    def _run_offline_workload_with_early_stopping(self, clean_wait_sec: int = 20, start_ramp_sec: int = 12,
+                                                  end_ramp_sec: int = 11):
+        """
+        run the workload and sample the metric of the reward model every early_stopping_interval seconds.
+        The workload is stopped once the upper confidence bound of the samples is below early_stopping_ratio of the
+        best metric, the metrics until then are the result of the step.
+        :return: start time and end time of the observation, whether the workload is stopped early
+        """
+        settings = self.early_stopping
+        get_metric = self.reward_model.get_metric_a
+        stopper = ConfidenceBoundStopper(get_metric(self.best_metrics) * settings.early_stopping_ratio,
+                                         z=settings.early_stopping_z, min_samples=settings.early_stopping_min_samples)
+        self.dd_util.clean()
+        self.logger.info(f"wait at most {clean_wait_sec} seconds for the cleanup")
+        self.dd_util.wait_space_reclaimed(clean_wait_sec)
+        start_time = time.time() + start_ramp_sec
+        self.dd_util.start_workload_async()
+        sample_start = start_time
+        while self.dd_util.wait_workload(timeout=max(0.0, sample_start + settings.early_stopping_interval -
+                                                      time.time())) is None:
+            # InfluxDB only has complete samples of the last second
+            sample_end = time.time() - 1
+            _, metrics = self.collector.get_pis(None, sample_start, sample_end)
+            sample_start = sample_end
+            if stopper.add(get_metric(metrics)):
+                self.logger.info(f"stop workload early, upper confidence bound {stopper.upper_bound:.2f} < "
+                                 f"threshold {stopper.threshold:.2f} after {stopper.stats.count} samples")
+                self.dd_util.stop_workload()
+                return start_time, sample_end, True
+        return start_time, time.time() - end_ramp_sec, False
+
     def evaluate_configuration(self, configuration: DFSConfiguration,
                                observation_time: int = None) -> ConfigurationScorePair:
         """
@@ -258,4 +411,6 @@ class DFSEnvironment(py_environment.PyEnvironment):
             _, external_metrics = self.collector.get_pis(None, start_time, end_time)
         else:
             _, external_metrics = self.collector.get_pis(observation_time)
+        if self.configuration_history is not None:
+            self.configuration_history.add(configuration, external_metrics, self.workload_name)
         return ConfigurationScorePair(configuration, external_metrics)
@@ -0,0 +1,91 @@
+from typing import List
+
+from magpie.environment.metrics_window import RATE_FIELDS, RATIO_FIELDS
+from magpie.types.flux_query_mode import FluxQueryMode
+
+# measurements used by performance indicators
+MEASUREMENTS = ("lustre", "cpu", "mem")
+
+
+def _any_of(column: str, values) -> str:
+    return " or ".join([f'r["{column}"] == "{value}"' for value in values])
+
+
+class FluxQueryPlan:
+    """
+    Flux queries of performance indicators, built once and sent with the time range as parameters.
+    Queries of all modes aggregate like lustre_influxdb.flux:
+    gauges are averaged, counters are converted to rates per series and summed, ratios are calculated from
+    per-second sums.
+    """
+
+    def __init__(self, internal_columns: List[str], mode: FluxQueryMode, query_file: str, bucket: str = "lustre",
+                 hosts: List[str] = None):
+        """
+        :param internal_columns: fields of internal performance indicators
+        :param mode:
+        :param query_file: query used in JOINED mode
+        :param bucket:
+        :param hosts: only query metrics of these hosts, all hosts if it is None. It's not supported in JOINED mode.
+        """
+        if hosts is not None and mode is FluxQueryMode.JOINED:
+            raise ValueError("host filter is not supported by the joined query")
+        self.mode = mode
+        self.bucket = bucket
+        self.hosts = hosts
+        self.ratio_fields = {field: components for field, components in RATIO_FIELDS.items() if
+                             field in internal_columns}
+        self.gauge_fields = [column for column in internal_columns if
+                             column not in RATE_FIELDS and column not in RATIO_FIELDS]
+        self.rate_fields = list(RATE_FIELDS)
+        self.output_fields = set(self.gauge_fields + self.rate_fields + list(self.ratio_fields))
+        if mode is FluxQueryMode.JOINED:
+            with open(query_file, "r") as f:
+                self.queries = [f.read()]
+        elif mode is FluxQueryMode.SPLIT:
+            self.queries = [self._rates_query(), self._gauges_query()] + \
+                           [self._ratio_query(field, *components) for field, components in self.ratio_fields.items()]
+        elif mode is FluxQueryMode.SINGLE_SCAN:
+            self.queries = [self._single_scan_query()]
+        else:
+            raise NotImplementedError(mode)
+
+    def _source(self, measurements, fields) -> str:
+        source = f'from(bucket: "{self.bucket}")\n' \
+                 f'  |> range(start: _start, stop: _end)\n' \
+                 f'  |> filter(fn: (r) => {_any_of("_measurement", measurements)})\n' \
+                 f'  |> filter(fn: (r) => {_any_of("_field", fields)})\n'
+        if self.hosts is not None:
+            source += f'  |> filter(fn: (r) => {_any_of("host", self.hosts)})\n'
+        return source
+
+    def _ratio_query(self, field: str, numerator: str, denominator: str) -> str:
+        return self._source(["lustre"], [numerator, denominator]) + \
+               '  |> keep(columns: ["_field", "_value", "_time"])\n' \
+               '  |> aggregateWindow(every: 1s, fn: sum, createEmpty: true)\n' \
+               '  |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")\n' \
+               f'  |> map(fn: (r) => ({{r with {field}: float(v: r.{numerator}) / float(v: r.{denominator})}}))\n' \
+               f'  |> mean(column: "{field}")\n' \
+               f'  |> keep(columns: ["{field}"])'
+
+    def _gauges_query(self) -> str:
+        return self._source(MEASUREMENTS, self.gauge_fields) + \
+               '  |> keep(columns: ["_field", "_value", "_time"])\n' \
+               '  |> aggregateWindow(every: 1s, fn: mean, createEmpty: false)\n' \
+               '  |> mean()\n' \
+               '  |> pivot(rowKey:["_stop"], columnKey: ["_field"], valueColumn: "_value")'
+
+    def _rates_query(self) -> str:
+        return self._source(["lustre"], self.rate_fields) + \
+               '  |> derivative(unit: 1s, nonNegative: false)\n' \
+               '  |> keep(columns: ["_field", "_value", "_time"])\n' \
+               '  |> aggregateWindow(every: 1s, fn: sum, createEmpty: true)\n' \
+               '  |> mean()\n' \
+               '  |> pivot(rowKey:["_stop"], columnKey: ["_field"], valueColumn: "_value")'
+
+    def _single_scan_query(self) -> str:
+        # one sample per series and second, the series stay separated for the derivative of counters
+        fields = self.gauge_fields + self.rate_fields + \
+                 [component for components in self.ratio_fields.values() for component in components]
+        return self._source(MEASUREMENTS, fields) + \
+               '  |> aggregateWindow(every: 1s, fn: last, createEmpty: false)'
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from magpie.config.config import LustrePIsSettings
+from magpie.environment.flux_query_plan import FluxQueryPlan
+from magpie.types.flux_query_mode import FluxQueryMode
+
+COLUMNS = ["cur_dirty_bytes", "cache_hit_ratio", "usage_idle"]
+
+
+class TestFluxQueryPlan(TestCase):
+    def test_split(self):
+        plan = FluxQueryPlan(COLUMNS, FluxQueryMode.SPLIT, LustrePIsSettings().query_file)
+        self.assertEqual(len(plan.queries), 3)
+        self.assertIn('r["_field"] == "cur_dirty_bytes" or r["_field"] == "usage_idle"', plan.queries[1])
+        self.assertIn("cache_hit_ratio", plan.queries[2])
+        self.assertEqual(plan.output_fields, {"cur_dirty_bytes", "usage_idle", "cache_hit_ratio", "read_bytes",
+                                              "write_bytes", "read_calls", "write_calls"})
+
+    def test_single_scan(self):
+        plan = FluxQueryPlan(COLUMNS, FluxQueryMode.SINGLE_SCAN, LustrePIsSettings().query_file)
+        self.assertEqual(len(plan.queries), 1)
+        self.assertEqual(plan.queries[0].count("from(bucket"), 1)
+        for field in ["cur_dirty_bytes", "usage_idle", "cache_hit", "cache_access", "write_bytes"]:
+            self.assertIn(f'r["_field"] == "{field}"', plan.queries[0])
+
+    def test_joined(self):
+        plan = FluxQueryPlan(COLUMNS, FluxQueryMode.JOINED, LustrePIsSettings().query_file)
+        self.assertEqual(plan.queries[0].count("from(bucket"), 3)
+
+    def test_hosts(self):
+        plan = FluxQueryPlan(COLUMNS, FluxQueryMode.SPLIT, LustrePIsSettings().query_file, hosts=["c1", "c2"])
+        for query in plan.queries:
+            self.assertIn('r["host"] == "c1" or r["host"] == "c2"', query)
+        with self.assertRaises(ValueError):
+            FluxQueryPlan(COLUMNS, FluxQueryMode.JOINED, LustrePIsSettings().query_file, hosts=["c1"])
@@ -1,75 +1,296 @@
+import time
 from collections import defaultdict
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple, Dict, Optional, Union, Callable
 
-from magpie.config.config import LustreSettings, STRIPE_TUNING_FOLDER
+from magpie.config.config import LustreSettings, STRIPE_TUNING_FOLDER, ActorAgentSettings
 from magpie.environment.controller import DistributedDFSController, logger
 from magpie.environment.lustre.lustre_knobs import LustreKnobs
-from magpie.types.dfs_configuration import TuneParameter, ScopedTuneParameters
+from magpie.environment.parameter_cache import ParameterStateCache
+from magpie.types.apply_result import NodeApplyResult, ApplyResult
+from magpie.types.dfs_configuration import TuneParameter, ScopedTuneParameters, DFSConfiguration
 from magpie.types.knob import Knob
-from magpie.utils.cmd_utils import exec_cmd_by_rest
+from magpie.utils.actor_agent_client import ActorAgentClient
 
 
 class LustreController(DistributedDFSController):
     """
     Lustre Controller
     """
+    # lfs setstripe resets unspecified layout attributes, stripe count and size are always set together
+    atomic_scopes = {"stripe"}
 
-    def __init__(self, lustre_settings: LustreSettings):
+    def __init__(self, lustre_settings: LustreSettings, agent_settings: ActorAgentSettings = None,
+                 stripe_folder: str = STRIPE_TUNING_FOLDER):
+        """
+        :param lustre_settings:
+        :param agent_settings:
+        :param stripe_folder: folder whose layout is tuned by stripe knobs, it is created if it doesn't exist
+        """
         self.lustre_settings = lustre_settings
+        self.stripe_folder = stripe_folder
         self.ssh_user = lustre_settings.ssh_user
+        self.agent_client = ActorAgentClient(agent_settings or ActorAgentSettings())
+        self.apply_timeout = lustre_settings.apply_timeout
+        self._executor = ThreadPoolExecutor(max_workers=lustre_settings.max_apply_workers,
+                                            thread_name_prefix="lustre-apply")
+        self.param_cache = ParameterStateCache() if lustre_settings.cache_params else None
 
-    def _set_scope_params(self, scoped_parameters: ScopedTuneParameters):
-        cmds = []
-        if "osc" in scoped_parameters.scope:
+    def _scope_nodes(self, scope: str) -> List[str]:
+        if "osc" in scope or scope == "stripe":
             nodes = self.lustre_settings.osc_nodes
-            svc = scoped_parameters.scope.split(".")[-1]
-            for tune_param in scoped_parameters.parameters:
-                cmds.append(f"sudo lctl set_param {svc}.*.{tune_param.name.name} {tune_param.value}")
-            cmd = " && ".join(cmds)
-        elif scoped_parameters.scope == "osd" or scoped_parameters.scope == "osc" or scoped_parameters.scope == "oss":
+        elif scope == "osd" or scope == "oss":
             nodes = self.lustre_settings.osd_nodes
-            for tune_param in scoped_parameters.parameters:
-                if tune_param.name.alias is not None:
-                    cmds.append(f"sudo lctl set_param {tune_param.name.alias} {tune_param.value}")
-                else:
-                    cmds.append(f"sudo lctl set_param osd.*.{tune_param.name.name} {tune_param.value}")
-            cmd = " && ".join(cmds)
-        elif scoped_parameters.scope == "mds":
+        elif scope == "mds":
             nodes = self.lustre_settings.mds_nodes
-            for tune_param in scoped_parameters.parameters:
-                if "threads_max" in tune_param.name.get_parameter_name():
-                    cmds.append(f"sudo lctl set_param {tune_param.name.get_parameter_name()} {tune_param.value}")
-                else:
-                    raise NotImplementedError
-            cmd = " && ".join(cmds)
-        elif scoped_parameters.scope == "stripe":
-            cmd = "sudo lfs setstripe --stripe-index 0"
-            nodes = [self.lustre_settings.osc_nodes[0]]
-            for tune_param in scoped_parameters.parameters:
-                if tune_param.name == LustreKnobs.STRIPE_COUNT.knob:
-                    cmd += f" -c {tune_param.value}"
-                elif tune_param.name == LustreKnobs.STRIPE_SIZE.knob:
-                    multiple_of_64 = tune_param.value
-                    value = multiple_of_64 * 64
-                    cmd += f" -S {value}K"
-                else:
-                    raise NotImplementedError(f"Unrecognized param {tune_param}")
-            cmd += f" {STRIPE_TUNING_FOLDER}"
         else:
-            raise NotImplementedError(scoped_parameters.scope)
+            raise NotImplementedError(scope)
         if nodes is None or len(nodes) == 0:
-            logger.warning(f"no nodes is setting for {scoped_parameters.scope}!")
-        for node in nodes:
-            # exec_remote_cmd(self.ssh_user, node, cmd)
-            res = exec_cmd_by_rest(node, cmd)
+            logger.warning(f"no nodes is setting for {scope}!")
+            return []
+        return nodes
+
+    @staticmethod
+    def _lctl_param(knob: Knob) -> str:
+        """
+        lctl parameter name of the knob
+        :param knob:
+        :return: e.g., osc.*.max_dirty_mb
+        """
+        if "osc" in knob.scope:
+            svc = knob.scope.split(".")[-1]
+            return f"{svc}.*.{knob.name}"
+        elif knob.scope == "osd" or knob.scope == "oss":
+            if knob.alias is not None:
+                return knob.alias
+            return f"osd.*.{knob.name}"
+        elif knob.scope == "mds":
+            if "threads_max" in knob.get_parameter_name():
+                return knob.get_parameter_name()
+            raise NotImplementedError
+        raise NotImplementedError(knob.scope)
+
+    def _stripe_command(self, scoped_parameters: ScopedTuneParameters, folder: str = None) -> str:
+        folder = folder or self.stripe_folder
+        cmd = f"sudo mkdir -p {folder} && sudo lfs setstripe --stripe-index 0"
+        for tune_param in scoped_parameters.parameters:
+            if tune_param.name == LustreKnobs.STRIPE_COUNT.knob:
+                cmd += f" -c {tune_param.value}"
+            elif tune_param.name == LustreKnobs.STRIPE_SIZE.knob:
+                multiple_of_64 = tune_param.value
+                value = multiple_of_64 * 64
+                cmd += f" -S {value}K"
+            else:
+                raise NotImplementedError(f"Unrecognized param {tune_param}")
+        cmd += f" {folder}"
+        return cmd
+
+    def set_stripe(self, scoped_parameters: ScopedTuneParameters, folder: str) -> ApplyResult:
+        """
+        set the layout of a folder other than the stripe folder, e.g., of a stripe sandbox
+        :param scoped_parameters: stripe scoped parameters
+        :param folder: it is created if it doesn't exist
+        :return:
+        """
+        if scoped_parameters.scope != "stripe":
+            raise ValueError(f"{scoped_parameters.scope} parameters are not stripe parameters")
+        cmd = self._stripe_command(scoped_parameters, folder)
+        result = ApplyResult()
+        for node in self._scope_nodes(scoped_parameters.scope)[:1]:
+            result.node_results.extend(self._exec_on_node(node, scoped_parameters.scope, cmd))
+        if not result.succeeded:
+            logger.error(f"Failed to set the stripe of {folder}: {result}")
+        return result
+
+    def _exec_on_node(self, node: str, scope: str, cmd: str) -> List[NodeApplyResult]:
+        start = time.time()
+        try:
+            res = self.agent_client.execute(node, cmd, timeout=self.apply_timeout, raise_error=True)
             logger.debug(f"node:{node}, cmd: {cmd}, res:{res}")
+            return [NodeApplyResult(node, scope, cmd, output=res, elapsed=time.time() - start)]
+        except Exception as e:
+            return [NodeApplyResult(node, scope, cmd, error=str(e), elapsed=time.time() - start)]
+
+    def _batch_on_node(self, node: str, scoped_operations: List[Tuple[str, str, int]]) -> List[NodeApplyResult]:
+        """
+        apply operations of all scopes on the node in one request
+        :param node:
+        :param scoped_operations: list of (scope, lctl parameter, value)
+        :return: result of each scope
+        """
+        start = time.time()
+        scopes = list(dict.fromkeys([scope for scope, _, _ in scoped_operations]))
+        try:
+            results = self.agent_client.batch_set_params(node, [(param, value) for _, param, value in scoped_operations],
+                                                         parallel=self.lustre_settings.parallel_batch,
+                                                         timeout=self.apply_timeout)
+        except Exception as e:
+            return [NodeApplyResult(node, scope, "batch", error=str(e), elapsed=time.time() - start)
+                    for scope in scopes]
+        elapsed = time.time() - start
+        logger.debug(f"node:{node}, batch results:{results}")
+        node_results = []
+        for scope in scopes:
+            scope_results = [result for (op_scope, _, _), result in zip(scoped_operations, results) if
+                             op_scope == scope]
+            errors = [f"{result['param']}: {result['output']}" for result in scope_results if result["status"] != "ok"]
+            cmd = ",".join([f"{result['param']}={result['value']}" for result in scope_results])
+            node_results.append(NodeApplyResult(node, scope, cmd, output=str(scope_results),
+                                                error="; ".join(errors) if errors else None, elapsed=elapsed))
+        return node_results
+
+    def _run_tasks(self, tasks: List[Tuple[Callable[..., List[NodeApplyResult]], tuple, list]],
+                   deadline: float) -> List[Optional[List[NodeApplyResult]]]:
+        """
+        run tasks in the apply executor, the deadline of a task is measured from its start, tasks queued behind
+        max_apply_workers running ones are not timed out before they send their request
+        :param tasks: (function, arguments, _) of each task
+        :param deadline: time in second a started task may take, its worst case time including retries
+        :return: results of each task, None if it didn't end within its deadline
+        """
+        started: Dict[int, float] = {}
+
+        def run(index, function, args):
+            started[index] = time.time()
+            return function(*args)
+
+        futures = {self._executor.submit(run, index, function, args): index for index, (function, args, _) in
+                   enumerate(tasks)}
+        pending = set(futures)
+        timed_out = set()
+        while pending:
+            now = time.time()
+            expired = {future for future in pending if not future.done() and futures[future] in started and
+                       now - started[futures[future]] >= deadline}
+            # a request which is still running after its worst case time is reported as failed
+            timed_out |= expired
+            pending -= expired
+            running_deadlines = [started[futures[future]] + deadline for future in pending if
+                                 futures[future] in started]
+            timeout = max(min(running_deadlines) - now, 0) if running_deadlines else deadline
+            _, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        return [None if future in timed_out else future.result() for future in futures]
+
+    def _fan_out(self, scoped_parameters_lst: List[ScopedTuneParameters]) -> ApplyResult:
+        """
+        apply all scoped parameters on all their nodes concurrently, lctl parameters of a node are sent in one batch.
+        Parameters whose cached value on a node equals the new value are skipped.
+        :param scoped_parameters_lst:
+        :return: result of each node
+        """
+        # (function, arguments, [(node, scope)] of its results) of each request
+        tasks: List[Tuple[Callable[..., List[NodeApplyResult]], tuple, List[Tuple[str, str]]]] = []
+        # (node, scope) -> tune parameters sent to the node
+        submitted: Dict[Tuple[str, str], List[TuneParameter]] = defaultdict(list)
+        for scoped_parameters in scoped_parameters_lst:
+            if scoped_parameters.scope == "stripe":
+                cmd = self._stripe_command(scoped_parameters)
+                for node in self._scope_nodes(scoped_parameters.scope)[:1]:
+                    tasks.append((self._exec_on_node, (node, scoped_parameters.scope, cmd),
+                                  [(node, scoped_parameters.scope)]))
+                continue
+            for node in self._scope_nodes(scoped_parameters.scope):
+                for tune_param in scoped_parameters.parameters:
+                    if self.param_cache is not None and self.param_cache.get(node, tune_param.name) == tune_param.value:
+                        continue
+                    submitted[(node, scoped_parameters.scope)].append(tune_param)
+        node_operations = defaultdict(list)
+        for (node, scope), tune_params in submitted.items():
+            node_operations[node] += [(scope, self._lctl_param(param.name), param.value) for param in tune_params]
+        for node, scoped_operations in node_operations.items():
+            node_scopes = [(node, scope) for scope in dict.fromkeys([op[0] for op in scoped_operations])]
+            if self.lustre_settings.batch_apply:
+                tasks.append((self._batch_on_node, (node, scoped_operations), node_scopes))
+            else:
+                for _, scope in node_scopes:
+                    cmd = " && ".join([f"sudo lctl set_param {param} {value}" for op_scope, param, value in
+                                       scoped_operations if op_scope == scope])
+                    tasks.append((self._exec_on_node, (node, scope, cmd), [(node, scope)]))
+        deadline = self.agent_client.max_request_time(self.apply_timeout)
+        result = ApplyResult()
+        for (_, _, node_scopes), node_results in zip(tasks, self._run_tasks(tasks, deadline)):
+            if node_results is None:
+                result.node_results.extend([NodeApplyResult(node, scope, "", error=f"timeout after {deadline:.1f}s")
+                                            for node, scope in node_scopes])
+            else:
+                result.node_results.extend(node_results)
+        if self.param_cache is not None:
+            for node_result in result.node_results:
+                for tune_param in submitted.get((node_result.node, node_result.scope), []):
+                    value = tune_param.value if node_result.succeeded else None
+                    self.param_cache.set(node_result.node, tune_param.name, value)
+        if not result.succeeded:
+            logger.error(f"Failed to apply parameters on some nodes: {result}")
+        return result
+
+    def _set_scope_params(self, scoped_parameters: ScopedTuneParameters):
+        self._fan_out([scoped_parameters])
+
+    def set_configuration(self, configuration: DFSConfiguration) -> ApplyResult:
+        return self._fan_out(list(configuration))
+
+    @staticmethod
+    def _parse_value(instance_values: Dict[str, str]) -> Optional[int]:
+        """
+        reduce values of all instances to one value
+        :param instance_values: {instance parameter name: value}
+        :return: the value if all instances have the same integer value, otherwise None
+        """
+        values = set(instance_values.values())
+        if len(values) != 1:
+            return None
+        try:
+            return int(values.pop())
+        except ValueError:
+            return None
+
+    def _read_node_params(self, node: str, knobs: List[Knob]) -> Dict[Knob, Optional[int]]:
+        params = {self._lctl_param(knob): knob for knob in knobs}
+        try:
+            values = self.agent_client.get_params(node, list(params.keys()), timeout=self.apply_timeout)
+        except Exception as e:
+            logger.warning(f"Failed to read parameters on node {node}: {e}")
+            return {knob: None for knob in knobs}
+        return {knob: self._parse_value(values[param]) if param in values else None for param, knob in
+                params.items()}
+
+    def get_params(self, knobs: List[Knob], use_cache=True) -> Dict[str, Dict[Knob, Optional[Union[int, float]]]]:
+        """
+        get current values of lctl knobs on each node, stripe knobs are not supported and omitted
+        :param knobs:
+        :param use_cache: serve values from the cache if they are cached
+        :return: {node: {knob: value}}, value is None if it is unknown
+        """
+        result = defaultdict(dict)
+        uncached = defaultdict(list)
+        for knob in knobs:
+            if knob.scope == "stripe":
+                continue
+            for node in self._scope_nodes(knob.scope):
+                value = self.param_cache.get(node, knob) if use_cache and self.param_cache is not None else None
+                if value is None:
+                    uncached[node].append(knob)
+                else:
+                    result[node][knob] = value
+        futures = {self._executor.submit(self._read_node_params, node, node_knobs): node for node, node_knobs in
+                   uncached.items()}
+        for future, node in futures.items():
+            for knob, value in future.result().items():
+                result[node][knob] = value
+                if self.param_cache is not None:
+                    self.param_cache.set(node, knob, value)
+        return dict(result)
 
     def reset_params(self, tuned_params: List[Knob]):
+        if self.param_cache is not None:
+            # read the live values, the cache is stale after a restart or remount of a node.
+            # Writes of parameters which are already default are skipped
+            self.get_params(tuned_params, use_cache=False)
         new_config = defaultdict(list)
         for knob in tuned_params:
             tune_parameter = TuneParameter(knob, knob.default)
             new_config[knob.scope].append(tune_parameter)
         scope_param_lst = [ScopedTuneParameters(scope=scope, parameters=params) for scope, params in new_config.items()]
-        for scope_param in scope_param_lst:
-            self.set_params(scope_param)
-        logger.info("Successfully reset parameters.")
+        result = self.set_configuration(DFSConfiguration(scope_param_lst))
+        if result.succeeded:
+            logger.info("Successfully reset parameters.")
@@ -1,10 +1,13 @@
+import time
 from unittest import TestCase
+from unittest.mock import patch
 
-from magpie.config.config import LustreSettings, LustreKnobsSettings
+from magpie.config.config import LustreSettings, LustreKnobsSettings, STRIPE_TUNING_FOLDER
 from magpie.environment.lustre.lustre_controller import LustreController
 from magpie.environment.lustre.lustre_knobs import LustreKnobs
-from magpie.types.dfs_configuration import TuneParameter
+from magpie.types.dfs_configuration import TuneParameter, ScopedTuneParameters, DFSConfiguration
 from magpie.utils import magpie_logging
+from magpie.utils.actor_agent_client import ActorAgentClient
 
 
 class TestLustreController(TestCase):
@@ -32,4 +35,150 @@ class TestLustreController(TestCase):
             TuneParameter(LustreKnobs.STRIPE_SIZE.knob, 2),
             TuneParameter(LustreKnobs.STRIPE_COUNT.knob, 2),
         ]
-        LustreController(LustreSettings()).set_params(params)
\ No newline at end of file
+        LustreController(LustreSettings()).set_params(params)
+
+class TestLustreControllerFanOut(TestCase):
+    def setUp(self) -> None:
+        self.settings = LustreSettings(osc_nodes=["c1", "c2"], osd_nodes=["s1", "s2", "s3"], mds_nodes=["m1"],
+                                       apply_timeout=1)
+
+    @staticmethod
+    def batch_ok(node, operations, **kwargs):
+        return [{"param": param, "value": value, "status": "ok", "output": "", "elapsed": 0}
+                for param, value in operations]
+
+    def test_set_configuration_concurrently(self):
+        def slow_batch(node, operations, **kwargs):
+            time.sleep(0.2)
+            return self.batch_ok(node, operations)
+
+        configuration = DFSConfiguration([
+            ScopedTuneParameters("osc", [TuneParameter(LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, 16)]),
+            ScopedTuneParameters("osc.llite", [TuneParameter(LustreKnobs.MAX_CACHED_MB.knob, 4096)]),
+            ScopedTuneParameters("oss", [TuneParameter(LustreKnobs.MAX_OST_THREADS.knob, 200)]),
+        ])
+        with patch.object(ActorAgentClient, "batch_set_params", side_effect=slow_batch) as batch_set_params:
+            start = time.time()
+            result = LustreController(self.settings).set_configuration(configuration)
+            elapsed = time.time() - start
+        self.assertTrue(result.succeeded)
+        # one request per node
+        self.assertEqual(batch_set_params.call_count, 5)
+        self.assertEqual({(r.node, r.scope) for r in result.node_results},
+                         {("c1", "osc"), ("c1", "osc.llite"), ("c2", "osc"), ("c2", "osc.llite"),
+                          ("s1", "oss"), ("s2", "oss"), ("s3", "oss")})
+        self.assertLess(elapsed, 0.2 * 5)
+
+    def test_more_tasks_than_workers(self):
+        def slow_batch(node, operations, **kwargs):
+            time.sleep(0.3)
+            return self.batch_ok(node, operations)
+
+        configuration = DFSConfiguration([
+            ScopedTuneParameters("oss", [TuneParameter(LustreKnobs.MAX_OST_THREADS.knob, 200)]),
+        ])
+        controller = LustreController(self.settings.copy(update={"max_apply_workers": 1}))
+        # the 3 requests take 0.9s in total, each one ends within its deadline
+        with patch.object(ActorAgentClient, "batch_set_params", side_effect=slow_batch), \
+                patch.object(ActorAgentClient, "max_request_time", return_value=0.5):
+            result = controller.set_configuration(configuration)
+        self.assertTrue(result.succeeded)
+        self.assertEqual([r.node for r in result.node_results], ["s1", "s2", "s3"])
+
+    def test_timeout(self):
+        def hanging_batch(node, operations, **kwargs):
+            if node == "s2":
+                time.sleep(1)
+            return self.batch_ok(node, operations)
+
+        configuration = DFSConfiguration([
+            ScopedTuneParameters("oss", [TuneParameter(LustreKnobs.MAX_OST_THREADS.knob, 200)]),
+        ])
+        with patch.object(ActorAgentClient, "batch_set_params", side_effect=hanging_batch), \
+                patch.object(ActorAgentClient, "max_request_time", return_value=0.2):
+            start = time.time()
+            result = LustreController(self.settings).set_configuration(configuration)
+            elapsed = time.time() - start
+        self.assertEqual([r.node for r in result.failures], ["s2"])
+        self.assertIn("timeout", result.failures[0].error)
+        self.assertLess(elapsed, 1)
+
+    def test_partial_failure(self):
+        def failing_batch(node, operations, **kwargs):
+            if node == "s2":
+                raise RuntimeError("connection refused")
+            return self.batch_ok(node, operations)
+
+        configuration = DFSConfiguration([
+            ScopedTuneParameters("oss", [TuneParameter(LustreKnobs.MAX_OST_THREADS.knob, 200)]),
+        ])
+        with patch.object(ActorAgentClient, "batch_set_params", side_effect=failing_batch):
+            result = LustreController(self.settings).set_configuration(configuration)
+        self.assertFalse(result.succeeded)
+        self.assertEqual([r.node for r in result.failures], ["s2"])
+        self.assertEqual(result.failed_scopes(), {"oss"})
+
+    def test_stripe_command(self):
+        configuration = DFSConfiguration([
+            ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, 2),
+                                            TuneParameter(LustreKnobs.STRIPE_SIZE.knob, 2)]),
+        ])
+        with patch.object(ActorAgentClient, "execute", return_value="") as execute:
+            result = LustreController(self.settings).set_configuration(configuration)
+        self.assertTrue(result.succeeded)
+        execute.assert_called_once()
+        self.assertEqual(execute.call_args[0][:2], ("c1", f"sudo mkdir -p {STRIPE_TUNING_FOLDER} && "
+                                                       f"sudo lfs setstripe --stripe-index 0 -c 2 -S 128K {STRIPE_TUNING_FOLDER}"))
+
+    def test_set_stripe(self):
+        scoped_parameters = ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, 4),
+                                                            TuneParameter(LustreKnobs.STRIPE_SIZE.knob, 16)])
+        with patch.object(ActorAgentClient, "execute", return_value="") as execute:
+            result = LustreController(self.settings).set_stripe(scoped_parameters, "/mnt/lustrefs/sandbox1")
+        self.assertTrue(result.succeeded)
+        self.assertEqual(execute.call_args[0][:2], ("c1", "sudo mkdir -p /mnt/lustrefs/sandbox1 && sudo lfs setstripe "
+                                                          "--stripe-index 0 -c 4 -S 1024K /mnt/lustrefs/sandbox1"))
+
+    def test_skip_cached_parameters(self):
+        configuration = DFSConfiguration([
+            ScopedTuneParameters("osc", [TuneParameter(LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, 16)]),
+        ])
+        controller = LustreController(self.settings)
+        with patch.object(ActorAgentClient, "batch_set_params", side_effect=self.batch_ok) as batch_set_params:
+            controller.set_configuration(configuration)
+            controller.set_configuration(configuration)
+        self.assertEqual(batch_set_params.call_count, 2)
+        self.assertEqual(controller.get_params([LustreKnobs.MAX_RPCS_IN_FLIGHT.knob]),
+                         {"c1": {LustreKnobs.MAX_RPCS_IN_FLIGHT.knob: 16}, "c2": {LustreKnobs.MAX_RPCS_IN_FLIGHT.knob: 16}})
+
+    def test_reset_skips_default_parameters(self):
+        def get_params(node, names, **kwargs):
+            return {"osc.*.max_rpcs_in_flight": {"osc.lustre-OST0000-osc-ffff.max_rpcs_in_flight": "8",
+                                                 "osc.lustre-OST0001-osc-ffff.max_rpcs_in_flight": "8"},
+                    "osc.*.max_dirty_mb": {"osc.lustre-OST0000-osc-ffff.max_dirty_mb": "10",
+                                           "osc.lustre-OST0001-osc-ffff.max_dirty_mb": "20"}}
+
+        knobs = [LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, LustreKnobs.MAX_DIRTY_MB.knob]
+        with patch.object(ActorAgentClient, "get_params", side_effect=get_params), \
+                patch.object(ActorAgentClient, "batch_set_params", side_effect=self.batch_ok) as batch_set_params:
+            LustreController(self.settings).reset_params(knobs)
+        # max_rpcs_in_flight is already default, max_dirty_mb differs between instances
+        for call in batch_set_params.call_args_list:
+            self.assertEqual(call[0][1], [("osc.*.max_dirty_mb", 10)])
+
+    def test_reset_reads_live_values(self):
+        def get_params(node, names, **kwargs):
+            # max_dirty_mb is changed on the nodes, e.g., after a remount
+            return {"osc.*.max_dirty_mb": {"osc.lustre-OST0000-osc-ffff.max_dirty_mb": "20"}}
+
+        knob = LustreKnobs.MAX_DIRTY_MB.knob
+        controller = LustreController(self.settings)
+        with patch.object(ActorAgentClient, "batch_set_params", side_effect=self.batch_ok):
+            controller.set_configuration(DFSConfiguration([ScopedTuneParameters("osc", [
+                TuneParameter(knob, knob.default)])]))
+        with patch.object(ActorAgentClient, "get_params", side_effect=get_params), \
+                patch.object(ActorAgentClient, "batch_set_params", side_effect=self.batch_ok) as batch_set_params:
+            controller.reset_params([knob])
+        self.assertEqual(batch_set_params.call_count, 2)
+        for call in batch_set_params.call_args_list:
+            self.assertEqual(call[0][1], [("osc.*.max_dirty_mb", knob.default)])
@@ -4,7 +4,7 @@ from typing import List, Union, Callable, Any, Optional
 
 import tensorflow as tf
 
-from magpie.config.config import FioSettings, InfluxdbSettings, WorkloadSettings
+from magpie.config.config import FioSettings, InfluxdbSettings
 from magpie.environment.collector import Collector
 from magpie.environment.controller import DistributedDFSController, CentralDFSController
 from magpie.environment.dfs_environment import DFSEnvironment
@@ -14,9 +14,9 @@ from magpie.types.dfs_configuration import DFSConfiguration
 from magpie.types.external_metrics import ExternalMetrics, LustreExternalMetrics
 from magpie.types.knob import Knob
 from magpie.types.performance_indicator import FloatPerformanceIndicator
-from magpie.utils.dd_utils import DDUtils
 from magpie.utils.fio_utils import FioUtils
 from magpie.utils.influxdb_api import InfluxDBAPI
+from magpie.utils.readiness import wait_until
 
 
 class LustreEnvironment(DFSEnvironment):
@@ -31,7 +31,7 @@ class LustreEnvironment(DFSEnvironment):
                  fio_settings: Optional[FioSettings],
                  influxdb_settings: InfluxdbSettings,
                  delay_after_fio_startup=15,
-                 step_observers: List[Callable[[DFSConfiguration, Any, ExternalMetrics, float], None]] = [],
+                 step_observers: List[Callable[[DFSConfiguration, Any, ExternalMetrics, float], None]] = None,
                  debug=False,
                  dd_workload=False,
                  **kwargs):
@@ -45,13 +45,14 @@ class LustreEnvironment(DFSEnvironment):
         :param observation_time:
         :param fio_settings:
         :param influxdb_settings:
-        :param delay_after_fio_startup:
+        :param delay_after_fio_startup: deadline in second of fio and its metrics to be ready
         :param step_observers:
         :param debug:
         :param kwargs:
         """
         self.influxdb_api = InfluxDBAPI(influxdb_settings)
-        step_observers.append(self.action_observer)
+        # a new list for each environment, observers are not shared by parallel environments
+        step_observers = (step_observers or []) + [self.action_observer]
         super().__init__(internal_pis, LustreExternalMetrics, knobs, controller, collector, reward, observation_time,
                          step_observers=step_observers, debug=debug, dd_workload=dd_workload, **kwargs)
         if fio_settings is not None:
@@ -60,8 +61,6 @@ class LustreEnvironment(DFSEnvironment):
             else:
                 raise ValueError("Parameter error! dd workload and fio can't be together.")
         # delay time before fetching performance indicators from DFS
-        if dd_workload:
-            self.dd_util = DDUtils(WorkloadSettings())
         self.delay_after_fio_startup = delay_after_fio_startup
         if self.debug:
             self.observation_time = 5
@@ -91,7 +90,8 @@ class LustreEnvironment(DFSEnvironment):
             if hasattr(self, "fio_util"):
                 self.logger.info("Start Fio workload.")
                 self.fio_util.start_workload()
-                time.sleep(self.delay_after_fio_startup)
+                wait_until(lambda: self.fio_util.is_running() and self.is_metrics_flowing(),
+                           self.delay_after_fio_startup, description="fio is running and metrics are flowing")
             elif hasattr(self, "dd_util"):
                 self.logger.info("Start DD workload.")
                 start_time = time.time()
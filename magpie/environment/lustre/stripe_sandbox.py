@@ -0,0 +1,135 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Callable, Dict, Hashable
+
+from magpie.config.config import WorkloadSettings, STRIPE_TUNING_FOLDER
+from magpie.environment.lustre.lustre_controller import LustreController
+from magpie.types.dfs_configuration import DFSConfiguration, ScopedTuneParameters
+from magpie.types.external_metrics import LustreExternalMetrics, ExternalMetrics
+from magpie.utils.dd_utils import DDUtils
+from magpie.utils.evaluation_scheduler import CandidateEvaluation, EvaluationScheduler
+
+logger = logging.getLogger(__name__)
+# filebench reports the throughput in mb/s of 2 ** 20 bytes
+FILEBENCH_MB = 1024 * 1024
+
+
+def split_stripe(configuration: DFSConfiguration) -> Tuple[Optional[ScopedTuneParameters], DFSConfiguration]:
+    """
+    :return: stripe parameters of the configuration, None if it has none, and the parameters of the other scopes
+    """
+    stripe = None
+    shared = []
+    for scoped_parameters in configuration:
+        if scoped_parameters.scope == "stripe":
+            stripe = scoped_parameters
+        else:
+            shared.append(scoped_parameters)
+    return stripe, DFSConfiguration(shared)
+
+
+class StripeSandboxPool:
+    """
+    pool of subdirectories of the tuning folder, each one with its own stripe layout and its own filebench run.
+    The stripe layout is a directory attribute, so candidates which only differ in stripe knobs are measured side by
+    side in one workload window. The runs share the clients and OSTs, the metrics are comparable between the sandboxes
+    of the same window but not with metrics of runs alone.
+    The metrics are parsed from the IO summary of filebench, the throughput is converted to bytes/s like the
+    throughput collected from Telegraf.
+    """
+
+    def __init__(self, controller: LustreController, workload_settings: WorkloadSettings, size: int,
+                 root_folder: str = STRIPE_TUNING_FOLDER, hosts: List[str] = None, reclaim_timeout: float = 20):
+        """
+        :param controller: controller setting the layout of the sandboxes
+        :param workload_settings:
+        :param size: number of sandboxes, i.e., candidates measured in one workload window
+        :param root_folder: the sandboxes are its subdirectories sandbox0, sandbox1, ...
+        :param hosts: clients running the workloads of all sandboxes, the first client if it is None
+        :param reclaim_timeout: deadline in second to wait for the space of the cleaned filesets
+        """
+        if size < 1:
+            raise ValueError(f"size needs to be at least 1, got {size}")
+        self.controller = controller
+        self.size = size
+        self.folders = [os.path.join(root_folder, f"sandbox{i}") for i in range(size)]
+        self.dd_utils = [DDUtils(workload_settings, hosts=hosts, tuning_folder=folder) for folder in self.folders]
+        self.reclaim_timeout = reclaim_timeout
+
+    def _measure_batch(self, configurations: List[DFSConfiguration],
+                       eval: bool) -> List[Optional[LustreExternalMetrics]]:
+        stripes = [split_stripe(configuration)[0] for configuration in configurations]
+        folders = self.folders[:len(configurations)]
+        dd_utils = self.dd_utils[:len(configurations)]
+        with ThreadPoolExecutor(max_workers=len(configurations), thread_name_prefix="sandbox") as executor:
+            list(executor.map(lambda dd_util: dd_util.clean(), dd_utils))
+            dd_utils[0].wait_space_reclaimed(self.reclaim_timeout)
+            results = list(executor.map(self.controller.set_stripe, stripes, folders))
+        applied = [result.succeeded for result in results]
+        for folder, succeeded in zip(folders, applied):
+            if not succeeded:
+                logger.warning(f"the stripe of {folder} is not applied, it's not measured")
+        start = time.time()
+        for dd_util, succeeded in zip(dd_utils, applied):
+            if succeeded:
+                dd_util.start_workload_async(eval)
+        outputs = [dd_util.wait_workload() if succeeded else None for dd_util, succeeded in zip(dd_utils, applied)]
+        logger.info(f"measured {sum(applied)} stripe sandboxes in {time.time() - start:.1f}s")
+        metrics = []
+        for folder, output in zip(folders, outputs):
+            summary = DDUtils.parse_io_summary(output)
+            if output is not None and summary is None:
+                logger.warning(f"no IO summary in the workload output of {folder}")
+            if summary is None:
+                metrics.append(None)
+            else:
+                throughput, iops = summary
+                metrics.append(LustreExternalMetrics(throughput * FILEBENCH_MB, iops))
+        return metrics
+
+    def measure(self, configurations: List[DFSConfiguration], eval: bool = False) -> List[
+            Optional[LustreExternalMetrics]]:
+        """
+        measure the stripe parameters of configurations, the parameters of the other scopes need to be applied before
+        :param configurations: each one needs stripe parameters, batches of the pool size run concurrently
+        :param eval: run the evaluation workload
+        :return: metrics of each configuration, None if it failed
+        """
+        for configuration in configurations:
+            if split_stripe(configuration)[0] is None:
+                raise ValueError(f"configuration has no stripe parameters: {configuration.__repr__()}")
+        metrics = []
+        for start in range(0, len(configurations), self.size):
+            metrics += self._measure_batch(configurations[start:start + self.size], eval)
+        return metrics
+
+    def evaluate(self, configurations: List[DFSConfiguration], apply_shared: Callable[[DFSConfiguration], None],
+                 get_score: Callable[[ExternalMetrics], float], repeats: int = 1,
+                 confidence: float = 0.95) -> List[CandidateEvaluation]:
+        """
+        evaluate candidates repeatedly, candidates with the same parameters besides stripe ones are measured together
+        :param configurations: candidates
+        :param apply_shared: applies the parameters of the other scopes of a group of candidates
+        :param get_score: score of the metrics to maximize
+        :param repeats: measurements of each candidate
+        :param confidence: confidence level of the ranking, see EvaluationScheduler.rank
+        :return: evaluations ordered from the best candidate
+        """
+        evaluations = [CandidateEvaluation(configuration) for configuration in configurations]
+        groups: Dict[Hashable, List[int]] = {}
+        shared_configurations = {}
+        for index, configuration in enumerate(configurations):
+            shared = split_stripe(configuration)[1]
+            groups.setdefault(shared.key(), []).append(index)
+            shared_configurations.setdefault(shared.key(), shared)
+        for key, indices in groups.items():
+            apply_shared(shared_configurations[key])
+            for repeat in range(repeats):
+                metrics = self.measure([configurations[index] for index in indices], eval=True)
+                for index, candidate_metrics in zip(indices, metrics):
+                    if candidate_metrics is not None:
+                        evaluations[index].add(candidate_metrics, get_score(candidate_metrics))
+                logger.info(f"sandbox evaluation {repeat + 1}/{repeats} of candidates {indices}: {metrics}")
+        return EvaluationScheduler.rank(evaluations, confidence)
@@ -0,0 +1,74 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from magpie.config.config import WorkloadSettings
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.environment.lustre.stripe_sandbox import StripeSandboxPool, split_stripe, FILEBENCH_MB
+from magpie.types.apply_result import ApplyResult, NodeApplyResult
+from magpie.types.dfs_configuration import DFSConfiguration, ScopedTuneParameters, TuneParameter
+from magpie.types.external_metrics import LustreExternalMetrics
+from magpie.utils.dd_utils import DDUtils
+
+
+def configuration(count, size, rpcs=8):
+    return DFSConfiguration([
+        ScopedTuneParameters("osc", [TuneParameter(LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, rpcs)]),
+        ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, count),
+                                        TuneParameter(LustreKnobs.STRIPE_SIZE.knob, size)])])
+
+
+class FakeController:
+    def __init__(self):
+        self.stripes = {}
+
+    def set_stripe(self, scoped_parameters, folder):
+        self.stripes[folder] = scoped_parameters.parameters[0].value
+        return ApplyResult([NodeApplyResult("c1", "stripe", f"lfs setstripe {folder}")])
+
+
+class TestStripeSandboxPool(TestCase):
+    def setUp(self) -> None:
+        environ = patch.dict(os.environ, {"SSH_USER": "magpie", "SSH_NODE": "c1"})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.controller = FakeController()
+        self.pool = StripeSandboxPool(self.controller, WorkloadSettings(), size=2, root_folder="/mnt/lustrefs/tuning",
+                                      hosts=["c1", "c2"])
+        for method in ["clean", "wait_space_reclaimed", "start_workload_async"]:
+            patcher = patch.object(DDUtils, method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        def wait_workload(dd_util, timeout=None):
+            # the throughput is 10 MB/s times the stripe count of the sandbox
+            throughput = 10 * self.controller.stripes[dd_util.tuning_folder]
+            return f"IO Summary: 100 ops 50.0 ops/s 1/1 rd/wr {throughput}.0mb/s 1.0ms/op"
+
+        patcher = patch.object(DDUtils, "wait_workload", autospec=True, side_effect=wait_workload)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_split_stripe(self):
+        stripe, shared = split_stripe(configuration(2, 16))
+        self.assertEqual(stripe.scope, "stripe")
+        self.assertEqual([scoped.scope for scoped in shared], ["osc"])
+
+    def test_measure(self):
+        metrics = self.pool.measure([configuration(1, 16), configuration(4, 16), configuration(2, 16)])
+        self.assertEqual([m.throughput for m in metrics], [10 * FILEBENCH_MB, 40 * FILEBENCH_MB, 20 * FILEBENCH_MB])
+        self.assertEqual(self.pool.folders, ["/mnt/lustrefs/tuning/sandbox0", "/mnt/lustrefs/tuning/sandbox1"])
+        self.assertEqual(DDUtils.start_workload_async.call_count, 3)
+        with self.assertRaises(ValueError):
+            self.pool.measure([DFSConfiguration([])])
+
+    def test_evaluate(self):
+        applied = []
+        candidates = [configuration(1, 16), configuration(4, 16, rpcs=16), configuration(2, 16)]
+        evaluations = self.pool.evaluate(candidates, applied.append, LustreExternalMetrics.get_throughput, repeats=2)
+        self.assertEqual([evaluation.configuration for evaluation in evaluations],
+                         [candidates[1], candidates[2], candidates[0]])
+        self.assertEqual(evaluations[0].mean, 40 * FILEBENCH_MB)
+        self.assertEqual(evaluations[0].scores.count, 2)
+        # the candidates are grouped by their osc parameters
+        self.assertEqual(len(applied), 2)
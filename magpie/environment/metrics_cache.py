@@ -0,0 +1,112 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Type, Hashable
+
+import numpy as np
+
+from magpie.types.dfs_configuration import DFSConfiguration
+from magpie.types.external_metrics import ExternalMetrics
+from magpie.utils.stats_utils import RunningStats
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    def __init__(self):
+        self.state_stats = RunningStats()
+        self.metrics_stats = RunningStats()
+        self.metric_names = None
+        # number of reuses since the last measurement
+        self.reuses = 0
+
+
+class ConfigurationMetricsCache:
+    """
+    running statistics of the state and external metrics observed for each configuration and workload.
+    A configuration is measured until it has min_samples samples, after that the mean is reused.
+    It's measured again after remeasure_interval reuses. Least recently used entries are evicted.
+    """
+
+    def __init__(self, external_metrics_cls: Type[ExternalMetrics], max_entries: int = 256, min_samples: int = 1,
+                 remeasure_interval: int = 0, blend: bool = True):
+        """
+        :param external_metrics_cls: class of the cached external metrics, it's created from the metric means
+        :param max_entries: maximum number of cached configurations
+        :param min_samples: number of measurements before the mean is reused
+        :param remeasure_interval: measure again after this number of reuses, never if it is 0
+        :param blend: return the mean including the new measurement instead of the measurement itself
+        """
+        self.external_metrics_cls = external_metrics_cls
+        self.max_entries = max_entries
+        self.min_samples = min_samples
+        self.remeasure_interval = remeasure_interval
+        self.blend = blend
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(configuration: DFSConfiguration, workload: Optional[str]) -> Hashable:
+        """
+        cache key of the configuration, values are quantized to integers like the knob generation of DFSEnvironment
+        """
+        return workload, configuration.key()
+
+    def _means(self, entry: _CacheEntry) -> Tuple[np.ndarray, ExternalMetrics]:
+        state = entry.state_stats.mean.astype(np.float32)
+        metrics = self.external_metrics_cls(**dict(zip(entry.metric_names, entry.metrics_stats.mean.tolist())))
+        return state, metrics
+
+    def reuse(self, configuration: DFSConfiguration, workload: Optional[str]) -> Optional[
+            Tuple[np.ndarray, ExternalMetrics]]:
+        """
+        get the cached state and external metrics of the configuration if the policy allows to reuse them
+        :param configuration:
+        :param workload: workload name
+        :return: mean state and mean external metrics, None if the configuration needs to be measured
+        """
+        key = self.key(configuration, workload)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.state_stats.count < self.min_samples or \
+                    (self.remeasure_interval > 0 and entry.reuses >= self.remeasure_interval):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.reuses += 1
+            self.hits += 1
+            logger.debug(f"reuse {entry.state_stats.count} measurements of {key}, hits={self.hits}, "
+                         f"misses={self.misses}")
+            return self._means(entry)
+
+    def record(self, configuration: DFSConfiguration, workload: Optional[str], state: np.ndarray,
+               external_metrics: ExternalMetrics) -> Tuple[np.ndarray, ExternalMetrics]:
+        """
+        add a measurement of the configuration
+        :param configuration:
+        :param workload: workload name
+        :param state:
+        :param external_metrics:
+        :return: the blended state and external metrics if blend is enabled, otherwise the measurement
+        """
+        key = self.key(configuration, workload)
+        metrics = external_metrics.get_all_metrics()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+                entry.metric_names = list(metrics.keys())
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            entry.state_stats.add(state)
+            entry.metrics_stats.add([metrics[name] for name in entry.metric_names])
+            entry.reuses = 0
+            if self.blend:
+                return self._means(entry)
+        return state, external_metrics
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.environment.metrics_cache import ConfigurationMetricsCache
+from magpie.types.dfs_configuration import DFSConfiguration, ScopedTuneParameters, TuneParameter
+from magpie.types.external_metrics import LustreExternalMetrics
+
+
+def stripe_configuration(count, size):
+    return DFSConfiguration([ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, count),
+                                                             TuneParameter(LustreKnobs.STRIPE_SIZE.knob, size)])])
+
+
+class TestConfigurationMetricsCache(TestCase):
+    def test_reuse_after_min_samples(self):
+        cache = ConfigurationMetricsCache(LustreExternalMetrics, min_samples=2)
+        configuration = stripe_configuration(2, 16)
+        self.assertIsNone(cache.reuse(configuration, "videoserver.f"))
+        cache.record(configuration, "videoserver.f", np.array([1.0]), LustreExternalMetrics(100, 10))
+        self.assertIsNone(cache.reuse(configuration, "videoserver.f"))
+        state, metrics = cache.record(configuration, "videoserver.f", np.array([3.0]), LustreExternalMetrics(200, 20))
+        self.assertEqual(metrics.throughput, 150)
+        state, metrics = cache.reuse(stripe_configuration(2, 16), "videoserver.f")
+        np.testing.assert_array_equal(state, [2.0])
+        self.assertEqual((metrics.throughput, metrics.iops), (150, 15))
+        self.assertIsNone(cache.reuse(configuration, "fileserver.f"))
+
+    def test_remeasure_interval(self):
+        cache = ConfigurationMetricsCache(LustreExternalMetrics, remeasure_interval=2, blend=False)
+        configuration = stripe_configuration(1, 1)
+        _, metrics = cache.record(configuration, None, np.array([1.0]), LustreExternalMetrics(100, 10))
+        self.assertEqual(metrics.throughput, 100)
+        self.assertIsNotNone(cache.reuse(configuration, None))
+        self.assertIsNotNone(cache.reuse(configuration, None))
+        self.assertIsNone(cache.reuse(configuration, None))
+        cache.record(configuration, None, np.array([1.0]), LustreExternalMetrics(300, 10))
+        self.assertEqual(cache.reuse(configuration, None)[1].throughput, 200)
+
+    def test_eviction(self):
+        cache = ConfigurationMetricsCache(LustreExternalMetrics, max_entries=2)
+        for count in range(1, 4):
+            cache.record(stripe_configuration(count, 1), None, np.array([1.0]), LustreExternalMetrics(count, 1))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.reuse(stripe_configuration(1, 1), None))
+        self.assertIsNotNone(cache.reuse(stripe_configuration(3, 1), None))
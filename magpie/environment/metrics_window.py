@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+# counters whose per-second derivative is summed over all series, e.g., read_bytes -> read throughput
+RATE_FIELDS = ("read_bytes", "write_bytes", "read_calls", "write_calls")
+# ratios calculated from per-second sums over all series
+RATIO_FIELDS = {"cache_hit_ratio": ("cache_hit", "cache_access")}
+
+
+class MetricsWindow:
+    """
+    running per-second aggregates of metric samples, it mirrors the aggregation in lustre_influxdb.flux:
+    gauges are averaged, counters are converted to rates per series and summed, ratios are calculated from
+    per-second sums.
+    """
+
+    def __init__(self, retention_sec: int = 900):
+        self.retention_sec = retention_sec
+        # second -> {field: [sum, count]}
+        self._buckets: "OrderedDict[int, Dict[str, List[float]]]" = OrderedDict()
+        # (series key, counter field) -> (timestamp, value) of the last sample
+        self._last_counters: Dict[tuple, tuple] = {}
+        self._ratio_components = {component for components in RATIO_FIELDS.values() for component in components}
+        self._lock = threading.Lock()
+
+    def _add_to_bucket(self, second: int, field: str, value: float):
+        bucket = self._buckets.get(second)
+        if bucket is None:
+            out_of_order = len(self._buckets) > 0 and next(reversed(self._buckets)) > second
+            bucket = self._buckets[second] = {}
+            # samples arrive roughly in order, the buckets are kept sorted by second
+            if out_of_order:
+                self._buckets = OrderedDict(sorted(self._buckets.items()))
+        aggregate = bucket.setdefault(field, [0.0, 0])
+        aggregate[0] += value
+        aggregate[1] += 1
+
+    def add(self, series_key: str, fields: Dict[str, float], timestamp: float):
+        """
+        add a sample
+        :param series_key: measurement with tags, it identifies the series of counters
+        :param fields: field values
+        :param timestamp: timestamp in second
+        :return:
+        """
+        second = int(timestamp)
+        with self._lock:
+            for field, value in fields.items():
+                if field in RATE_FIELDS:
+                    last = self._last_counters.get((series_key, field))
+                    self._last_counters[(series_key, field)] = (timestamp, value)
+                    if last is None or timestamp <= last[0]:
+                        continue
+                    self._add_to_bucket(second, field, (value - last[1]) / (timestamp - last[0]))
+                else:
+                    self._add_to_bucket(second, field, value)
+            while len(self._buckets) > 0 and next(iter(self._buckets)) < second - self.retention_sec:
+                self._buckets.popitem(last=False)
+
+    def aggregate(self, start_time: float, end_time: float) -> Dict[str, float]:
+        """
+        aggregate samples in [start_time, end_time)
+        :param start_time: timestamp in second
+        :param end_time: timestamp in second
+        :return: {field: value}, fields without samples are omitted
+        """
+        sums: Dict[str, List[float]] = {}
+
+        def add(field, value):
+            aggregate = sums.setdefault(field, [0.0, 0])
+            aggregate[0] += value
+            aggregate[1] += 1
+
+        with self._lock:
+            buckets = [bucket for second, bucket in self._buckets.items() if start_time <= second < end_time]
+            for bucket in buckets:
+                for field, (total, count) in bucket.items():
+                    if field in RATE_FIELDS:
+                        add(field, total)
+                    elif field not in self._ratio_components:
+                        add(field, total / count)
+                for ratio_field, (numerator, denominator) in RATIO_FIELDS.items():
+                    if denominator in bucket and bucket[denominator][0] != 0:
+                        add(ratio_field, bucket.get(numerator, [0.0])[0] / bucket[denominator][0])
+        return {field: total / count for field, (total, count) in sums.items()}
+
+    def count(self, start_time: float, end_time: float) -> int:
+        """
+        number of seconds with samples in [start_time, end_time)
+        """
+        with self._lock:
+            return len([second for second in self._buckets if start_time <= second < end_time])
@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from magpie.environment.metrics_window import MetricsWindow
+
+
+class TestMetricsWindow(TestCase):
+    def setUp(self) -> None:
+        self.window = MetricsWindow(retention_sec=60)
+
+    def test_gauge_mean_of_seconds(self):
+        # two samples in second 100 are averaged before the mean over seconds
+        self.window.add("lustre,host=a", {"cur_dirty_bytes": 10}, 100.2)
+        self.window.add("lustre,host=b", {"cur_dirty_bytes": 30}, 100.7)
+        self.window.add("lustre,host=a", {"cur_dirty_bytes": 40}, 101.2)
+        self.assertAlmostEqual(self.window.aggregate(100, 102)["cur_dirty_bytes"], 30)
+
+    def test_counter_rates_summed_over_series(self):
+        for t in range(100, 104):
+            self.window.add("lustre,osd_id=OST0000", {"write_bytes": t * 10}, t)
+            self.window.add("lustre,osd_id=OST0001", {"write_bytes": t * 20}, t)
+        aggregates = self.window.aggregate(100, 104)
+        self.assertAlmostEqual(aggregates["write_bytes"], 30)
+        self.assertNotIn("read_bytes", aggregates)
+
+    def test_cache_hit_ratio(self):
+        self.window.add("lustre,host=a", {"cache_hit": 1, "cache_access": 4}, 100)
+        self.window.add("lustre,host=b", {"cache_hit": 3, "cache_access": 4}, 100)
+        self.window.add("lustre,host=a", {"cache_hit": 0, "cache_access": 0}, 101)
+        self.window.add("lustre,host=a", {"cache_hit": 1, "cache_access": 1}, 102)
+        self.assertAlmostEqual(self.window.aggregate(100, 103)["cache_hit_ratio"], 0.75)
+
+    def test_window_bounds_and_retention(self):
+        self.window.add("cpu,cpu=cpu-total", {"usage_idle": 10}, 100)
+        self.window.add("cpu,cpu=cpu-total", {"usage_idle": 50}, 105)
+        self.assertAlmostEqual(self.window.aggregate(101, 106)["usage_idle"], 50)
+        self.assertEqual(self.window.count(100, 106), 2)
+        self.window.add("cpu,cpu=cpu-total", {"usage_idle": 50}, 200)
+        self.assertEqual(self.window.count(0, 300), 1)
+
+    def test_out_of_order_samples(self):
+        self.window.add("mem,host=a", {"used_percent": 10}, 102)
+        self.window.add("mem,host=b", {"used_percent": 20}, 100)
+        self.window.add("mem,host=a", {"used_percent": 30}, 200)
+        self.assertEqual(self.window.count(0, 300), 1)
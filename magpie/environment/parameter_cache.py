@@ -0,0 +1,51 @@
+import threading
+from typing import Dict, Tuple, Optional, Union
+
+from magpie.types.knob import Knob
+
+
+class ParameterStateCache:
+    """
+    client-side cache of the live parameter values on each node. Entries are written through on successful
+    writes and invalidated if a write fails, since the value on the node is unknown afterwards.
+    """
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, Knob], Union[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, node: str, knob: Knob) -> Optional[Union[int, float]]:
+        """
+        get the cached value
+        :param node:
+        :param knob:
+        :return: cached value, None if unknown
+        """
+        with self._lock:
+            return self._values.get((node, knob))
+
+    def set(self, node: str, knob: Knob, value: Optional[Union[int, float]]):
+        """
+        set the value of the knob on the node, None invalidates the entry
+        :param node:
+        :param knob:
+        :param value:
+        :return:
+        """
+        with self._lock:
+            if value is None:
+                self._values.pop((node, knob), None)
+            else:
+                self._values[(node, knob)] = value
+
+    def invalidate(self, node: str = None, knob: Knob = None):
+        """
+        invalidate entries matching the node and the knob, None matches all
+        :param node:
+        :param knob:
+        :return:
+        """
+        with self._lock:
+            for key in [key for key in self._values if
+                        (node is None or key[0] == node) and (knob is None or key[1] == knob)]:
+                del self._values[key]
@@ -0,0 +1,117 @@
+import logging
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def squared_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    pairwise squared euclidean distances between the rows of a and b
+    """
+    distances = np.sum(a ** 2, axis=1)[:, None] + np.sum(b ** 2, axis=1)[None, :] - 2 * a @ b.T
+    return np.maximum(distances, 0)
+
+
+class GaussianProcessRegressor:
+    """
+    exact Gaussian process regression with a squared exponential kernel, vectorized in NumPy.
+    All outputs share the kernel, they are standardized so that the kernel has unit amplitude.
+    Inputs are expected to be scaled to [0, 1]. If the length scale or the noise is not given, it's selected from the
+    candidates by the log marginal likelihood summed over all outputs.
+    """
+    LENGTH_SCALES = (0.05, 0.1, 0.2, 0.35, 0.5, 1.0, 2.0)
+    NOISES = (1e-3, 1e-2, 1e-1, 0.3)
+
+    def __init__(self, length_scale: float = None, noise: float = None,
+                 length_scales: Sequence[float] = LENGTH_SCALES, noises: Sequence[float] = NOISES):
+        """
+        :param length_scale: kernel length scale, selected from length_scales if it is None
+        :param noise: variance of the observation noise relative to the output variance, selected from noises if it
+        is None
+        :param length_scales: candidates of the length scale
+        :param noises: candidates of the noise
+        """
+        self.length_scales = [length_scale] if length_scale is not None else list(length_scales)
+        self.noises = [noise] if noise is not None else list(noises)
+        self.length_scale = None
+        self.noise = None
+        self._x = None
+        self._y_mean = None
+        self._y_std = None
+        self._cholesky = None
+        self._alpha = None
+
+    def kernel(self, a: np.ndarray, b: np.ndarray, length_scale: float = None) -> np.ndarray:
+        length_scale = length_scale or self.length_scale
+        return np.exp(-0.5 * squared_distances(a, b) / length_scale ** 2)
+
+    @staticmethod
+    def _solve(cholesky: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, y))
+
+    def _log_marginal_likelihood(self, x: np.ndarray, y: np.ndarray, length_scale: float, noise: float) -> Tuple[
+            float, np.ndarray, np.ndarray]:
+        """
+        :return: log marginal likelihood summed over outputs, cholesky factor and weights of the training points
+        """
+        k = self.kernel(x, x, length_scale) + noise * np.eye(len(x))
+        try:
+            cholesky = np.linalg.cholesky(k)
+        except np.linalg.LinAlgError:
+            return -np.inf, None, None
+        alpha = self._solve(cholesky, y)
+        log_likelihood = -0.5 * np.sum(y * alpha) - y.shape[1] * (
+                np.sum(np.log(np.diag(cholesky))) + 0.5 * len(x) * np.log(2 * np.pi))
+        return log_likelihood, cholesky, alpha
+
+    def fit(self, x: np.ndarray, y: np.ndarray) -> "GaussianProcessRegressor":
+        """
+        :param x: inputs, shape (samples, features)
+        :param y: outputs, shape (samples,) or (samples, outputs)
+        :return: self
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if y.ndim == 1:
+            y = y[:, None]
+        if len(x) == 0:
+            raise ValueError("at least one sample is required to fit a Gaussian process")
+        self._y_mean = y.mean(axis=0)
+        self._y_std = y.std(axis=0)
+        self._y_std[self._y_std == 0] = 1
+        standardized = (y - self._y_mean) / self._y_std
+        best = None
+        for length_scale in self.length_scales:
+            for noise in self.noises:
+                log_likelihood, cholesky, alpha = self._log_marginal_likelihood(x, standardized, length_scale, noise)
+                if best is None or log_likelihood > best[0]:
+                    best = (log_likelihood, length_scale, noise, cholesky, alpha)
+        log_likelihood, self.length_scale, self.noise, self._cholesky, self._alpha = best
+        if self._cholesky is None:
+            raise np.linalg.LinAlgError("kernel matrix is not positive definite for any noise candidate")
+        self._x = x
+        logger.debug(f"fitted Gaussian process on {len(x)} samples, length_scale={self.length_scale}, "
+                     f"noise={self.noise}, log_marginal_likelihood={log_likelihood:.2f}")
+        return self
+
+    def predict(self, x: np.ndarray, return_std: bool = False, include_noise: bool = False) -> Union[
+            np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        :param x: inputs, shape (samples, features)
+        :param return_std: return the standard deviation of the prediction as well
+        :param include_noise: the standard deviation includes the observation noise
+        :return: mean of shape (samples, outputs), and the standard deviation of the same shape if return_std
+        """
+        x = np.asarray(x, dtype=np.float64)
+        k_star = self.kernel(x, self._x)
+        mean = k_star @ self._alpha * self._y_std + self._y_mean
+        if not return_std:
+            return mean
+        v = np.linalg.solve(self._cholesky, k_star.T)
+        variance = np.maximum(1 - np.sum(v ** 2, axis=0), 0)
+        if include_noise:
+            variance = variance + self.noise
+        std = np.sqrt(variance)[:, None] * self._y_std
+        return mean, std
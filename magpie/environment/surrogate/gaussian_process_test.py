@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.environment.surrogate.gaussian_process import GaussianProcessRegressor
+
+
+class TestGaussianProcessRegressor(TestCase):
+    def test_fit_smooth_function(self):
+        rng = np.random.RandomState(0)
+        x = rng.uniform(0, 1, (40, 2))
+        y = np.stack([np.sin(3 * x[:, 0]) + x[:, 1], 100 * x[:, 0]], axis=1)
+        gp = GaussianProcessRegressor().fit(x, y)
+        x_test = rng.uniform(0.1, 0.9, (20, 2))
+        expected = np.stack([np.sin(3 * x_test[:, 0]) + x_test[:, 1], 100 * x_test[:, 0]], axis=1)
+        mean = gp.predict(x_test)
+        self.assertEqual(mean.shape, (20, 2))
+        np.testing.assert_allclose(mean, expected, atol=0.05 * np.ptp(expected, axis=0).max())
+
+    def test_std_grows_away_from_samples(self):
+        x = np.array([[0.0], [0.1], [0.2]])
+        gp = GaussianProcessRegressor(length_scale=0.1, noise=1e-3).fit(x, np.array([1.0, 2.0, 3.0]))
+        _, std = gp.predict(np.array([[0.1], [0.9]]), return_std=True)
+        self.assertLess(std[0, 0], std[1, 0])
+        _, noisy_std = gp.predict(np.array([[0.1]]), return_std=True, include_noise=True)
+        self.assertGreater(noisy_std[0, 0], std[0, 0])
+
+    def test_constant_output(self):
+        gp = GaussianProcessRegressor().fit(np.array([[0.0], [1.0]]), np.array([5.0, 5.0]))
+        np.testing.assert_allclose(gp.predict(np.array([[0.5]])), [[5.0]])
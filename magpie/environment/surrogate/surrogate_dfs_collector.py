@@ -0,0 +1,38 @@
+import logging
+from typing import Type
+
+import numpy as np
+
+from magpie.environment.collector import Collector
+from magpie.environment.surrogate.surrogate_model import SurrogateModel
+from magpie.types.external_metrics import ExternalMetrics
+
+
+class SurrogateDFSCollector(Collector):
+    """
+    collector of the surrogate environment, it predicts performance indicators of the simulated configuration
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, model: SurrogateModel, knob_values: np.ndarray, external_metrics_cls: Type[ExternalMetrics],
+                 rng: np.random.RandomState = None):
+        """
+        :param model:
+        :param knob_values: simulated configuration shared with the controller
+        :param external_metrics_cls: class of the external metrics, it's created from the predicted metrics by name
+        :param rng: metrics are sampled from the predictive distribution if it is set, otherwise the mean is returned
+        """
+        self.model = model
+        self.knob_values = knob_values
+        self.external_metrics_cls = external_metrics_cls
+        self.rng = rng
+
+    def get_pis(self, observation_time: int = None, start_time: float = None, end_time: float = None,
+                wait_for_observation=True) -> (np.array, ExternalMetrics):
+        # predictions are available immediately, there is nothing to wait for
+        return super().get_pis(observation_time, start_time, end_time, wait_for_observation=False)
+
+    def _get_pis(self, observation_time, start_time, end_time) -> (np.array, ExternalMetrics):
+        states, metrics = self.model.predict(self.knob_values, self.rng)
+        external_metrics = self.external_metrics_cls(**dict(zip(self.model.metric_names, metrics[0].tolist())))
+        return states[0].astype(np.float32), external_metrics
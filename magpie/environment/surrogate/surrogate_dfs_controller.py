@@ -0,0 +1,34 @@
+import logging
+from typing import List
+
+import numpy as np
+
+from magpie.environment.controller import DistributedDFSController
+from magpie.types.dfs_configuration import ScopedTuneParameters
+from magpie.types.knob import Knob
+
+
+class SurrogateDFSController(DistributedDFSController):
+    """
+    controller of the surrogate environment, it writes knob values to the simulated configuration
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, knobs: List[Knob], knob_values: np.ndarray):
+        """
+        :param knobs:
+        :param knob_values: simulated configuration shared with the collector, in the same order as knobs
+        """
+        self.knob_index = {knob: i for i, knob in enumerate(knobs)}
+        self.knob_values = knob_values
+
+    def _set_scope_params(self, scoped_parameters: ScopedTuneParameters, **kwargs):
+        for tune_parameter in scoped_parameters.parameters:
+            if tune_parameter.name not in self.knob_index:
+                raise NotImplementedError(f"knob {tune_parameter.name} is not simulated")
+            self.knob_values[self.knob_index[tune_parameter.name]] = tune_parameter.value
+        self.logger.debug(f"After controller setting, current knobs {self.knob_values}")
+
+    def reset_params(self, tuned_params: List[Knob]):
+        for knob in tuned_params:
+            self.knob_values[self.knob_index[knob]] = knob.default
@@ -0,0 +1,49 @@
+import logging
+from typing import Type
+
+import numpy as np
+
+from magpie.environment.dfs_environment import DFSEnvironment
+from magpie.environment.reward import Reward
+from magpie.environment.surrogate.surrogate_dfs_collector import SurrogateDFSCollector
+from magpie.environment.surrogate.surrogate_dfs_controller import SurrogateDFSController
+from magpie.environment.surrogate.surrogate_model import SurrogateModel
+from magpie.types.external_metrics import ExternalMetrics, LustreExternalMetrics
+
+
+class SurrogateEnvironment(DFSEnvironment):
+    """
+    DFS environment simulated by a surrogate model fitted on saved transitions, a step takes milliseconds instead of
+    minutes. The observation normalization needs to be the same as in the sessions of the transitions, the saved
+    observations are already normalized if those sessions normalized them.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, model: SurrogateModel, reward: Reward,
+                 external_metrics_cls: Type[ExternalMetrics] = LustreExternalMetrics,
+                 sample_noise: bool = True, seed: int = None, **kwargs):
+        """
+        :param model: fitted surrogate model, its knobs and internal performance indicators are used
+        :param reward:
+        :param external_metrics_cls:
+        :param sample_noise: sample performance indicators from the predictive distribution instead of the mean
+        :param seed: seed of the sampling
+        :param kwargs:
+        """
+        self.knob_values = np.array([knob.default for knob in model.knobs], dtype=np.float64)
+        controller = SurrogateDFSController(model.knobs, self.knob_values)
+        rng = np.random.RandomState(seed) if sample_noise else None
+        collector = SurrogateDFSCollector(model, self.knob_values, external_metrics_cls, rng)
+        # nothing is applied to a real cluster, so the debug mode doesn't skip configurations
+        kwargs["debug"] = False
+        super().__init__(model.internal_pis, external_metrics_cls, model.knobs, controller, collector, reward,
+                         observation_time=0, **kwargs)
+        self.delay_after_initialization = 0
+
+    def _initialization(self):
+        self.controller.reset_params(self.knobs)
+
+    def get_metrics(self, observation_time=None, start_time=None, end_time=None) -> (np.array, ExternalMetrics):
+        internal_metrics, external_metrics = self.collector.get_pis()
+        internal_metrics = np.clip(internal_metrics, self._observation_spec.minimum, self._observation_spec.maximum)
+        return internal_metrics.astype(np.float32), external_metrics
@@ -0,0 +1,121 @@
+import logging
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
+from magpie.environment.surrogate.gaussian_process import GaussianProcessRegressor
+from magpie.types.knob import Knob
+from magpie.types.performance_indicator import FloatPerformanceIndicator
+from magpie.utils.transition_store import TransitionStore, MID_STEP
+
+logger = logging.getLogger(__name__)
+
+
+def transitions_to_samples(transitions: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    pair the configuration of each transition with the state observed after it.
+    The state after a transition is the observation of the next record of the same session, so the last record of
+    an episode is used only if it is followed by a step of the same episode.
+    :param transitions: columns loaded by TransitionStore.load
+    :return: configurations, states after the configurations and external metrics of the configurations
+    """
+    configurations = transitions["configuration"]
+    metrics = transitions["metrics"]
+    has_next = (transitions["session"][1:] == transitions["session"][:-1]) & \
+               (transitions["step_type"][1:] == MID_STEP)
+    index = np.flatnonzero(has_next)
+    states = transitions["observation"][index + 1]
+    configurations = configurations[index]
+    metrics = metrics[index]
+    valid = ~(np.isnan(configurations).any(axis=1) | np.isnan(states).any(axis=1) | np.isnan(metrics).any(axis=1))
+    return configurations[valid], states[valid], metrics[valid]
+
+
+class SurrogateModel:
+    """
+    regression model of Lustre, it predicts the internal performance indicators and the external metrics observed
+    after a configuration is applied. Knob values are scaled to [0, 1] by the knob range.
+    """
+
+    def __init__(self, knobs: List[Knob], internal_pis: List[FloatPerformanceIndicator], metric_names: List[str]):
+        self.knobs = knobs
+        self.internal_pis = internal_pis
+        self.metric_names = metric_names
+        self._knob_min = np.array([knob.min for knob in knobs], dtype=np.float64)
+        self._knob_range = np.array([knob.max - knob.min for knob in knobs], dtype=np.float64)
+        self._knob_range[self._knob_range == 0] = 1
+        self.state_model = GaussianProcessRegressor()
+        self.metrics_model = GaussianProcessRegressor()
+        self.num_samples = 0
+
+    def encode(self, configurations: np.ndarray) -> np.ndarray:
+        """
+        scale knob values to [0, 1]
+        :param configurations: knob values, shape (configurations, knobs)
+        :return:
+        """
+        return (np.asarray(configurations, dtype=np.float64) - self._knob_min) / self._knob_range
+
+    def fit(self, configurations: np.ndarray, states: np.ndarray, metrics: np.ndarray) -> "SurrogateModel":
+        x = self.encode(configurations)
+        self.state_model.fit(x, states)
+        self.metrics_model.fit(x, metrics)
+        self.num_samples = len(x)
+        logger.info(f"fitted surrogate model on {self.num_samples} samples, state length scale "
+                    f"{self.state_model.length_scale}, metrics length scale {self.metrics_model.length_scale}")
+        return self
+
+    def predict(self, configurations: np.ndarray, rng: np.random.RandomState = None) -> Tuple[
+            np.ndarray, np.ndarray]:
+        """
+        predict states and metrics of configurations
+        :param configurations: knob values, shape (configurations, knobs)
+        :param rng: sample from the predictive distribution including the measurement noise if it is set,
+        otherwise return the mean
+        :return: states of shape (configurations, internal pis), metrics of shape (configurations, metric names)
+        """
+        x = self.encode(np.atleast_2d(configurations))
+        if rng is None:
+            return self.state_model.predict(x), self.metrics_model.predict(x)
+        state_mean, state_std = self.state_model.predict(x, return_std=True, include_noise=True)
+        metrics_mean, metrics_std = self.metrics_model.predict(x, return_std=True, include_noise=True)
+        states = state_mean + state_std * rng.standard_normal(state_mean.shape)
+        # throughput and iops are not negative
+        metrics = np.maximum(metrics_mean + metrics_std * rng.standard_normal(metrics_mean.shape), 0)
+        return states, metrics
+
+    def predict_metrics(self, configuration: np.ndarray, rng: np.random.RandomState = None) -> Dict[str, float]:
+        _, metrics = self.predict(configuration, rng)
+        return dict(zip(self.metric_names, metrics[0].tolist()))
+
+
+def load_surrogate_model(directory: str, knobs: List[Knob], internal_pis: List[FloatPerformanceIndicator],
+                         max_samples: int = 1000) -> Optional[SurrogateModel]:
+    """
+    fit a surrogate model on transitions saved by Lustre environments.
+    The knobs and internal performance indicators of the model are the recorded ones, in the recorded order.
+    :param directory: folder of the transition store
+    :param knobs: available knobs, the recorded knobs are selected from them
+    :param internal_pis: available internal performance indicators, the recorded ones are selected from them
+    :param max_samples: the most recent samples are used, the fitting time grows cubically with it
+    :return: None if the store is empty
+    """
+    transitions = TransitionStore.load(directory)
+    if transitions is None:
+        return None
+    meta = TransitionStore.load_meta(directory)
+    knobs_by_name = {f"{knob.scope}.{knob.name}": knob for knob in knobs}
+    pis_by_name = {pi.name: pi for pi in internal_pis}
+    unknown = [name for name in meta["knob_names"] if name not in knobs_by_name] + \
+              [name for name in meta["observation_names"] if name not in pis_by_name]
+    if len(unknown) > 0:
+        raise ValueError(f"knobs or performance indicators of the transition store {directory} are unknown: {unknown}")
+    configurations, states, metrics = transitions_to_samples(transitions)
+    if len(configurations) == 0:
+        return None
+    if len(configurations) > max_samples:
+        logger.info(f"use the most recent {max_samples} of {len(configurations)} samples")
+        configurations, states, metrics = configurations[-max_samples:], states[-max_samples:], metrics[-max_samples:]
+    model = SurrogateModel([knobs_by_name[name] for name in meta["knob_names"]],
+                           [pis_by_name[name] for name in meta["observation_names"]], meta["metric_names"])
+    return model.fit(configurations, states, metrics)
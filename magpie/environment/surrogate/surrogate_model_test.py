@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.environment.lustre.lustre_performance_indicators import LustrePerformanceIndicators as LPI
+from magpie.environment.surrogate.surrogate_model import transitions_to_samples, SurrogateModel
+from magpie.utils.transition_store import FIRST_STEP, MID_STEP
+
+
+class TestSurrogateModel(TestCase):
+    def test_transitions_to_samples(self):
+        transitions = {
+            "session": np.array([0, 0, 0, 1, 1]),
+            "step_type": np.array([FIRST_STEP, MID_STEP, FIRST_STEP, FIRST_STEP, MID_STEP]),
+            "observation": np.arange(5, dtype=np.float32)[:, None],
+            "configuration": np.arange(10, 15, dtype=np.float64)[:, None],
+            "metrics": np.arange(20, 25, dtype=np.float64)[:, None],
+        }
+        configurations, states, metrics = transitions_to_samples(transitions)
+        # the states after records 0 and 3 are observed, record 1 is followed by a reset and 2 by another session
+        np.testing.assert_array_equal(configurations[:, 0], [10, 13])
+        np.testing.assert_array_equal(states[:, 0], [1, 4])
+        np.testing.assert_array_equal(metrics[:, 0], [20, 23])
+
+    def test_predict(self):
+        knobs = [LustreKnobs.STRIPE_COUNT.knob, LustreKnobs.STRIPE_SIZE.knob]
+        model = SurrogateModel(knobs, [LPI.CUR_DIRTY_BYTES.value], ["throughput", "iops"])
+        rng = np.random.RandomState(0)
+        configurations = np.stack([rng.randint(knob.min, knob.max + 1, 30) for knob in knobs], axis=1)
+        throughput = configurations[:, 0] * 10.0
+        model.fit(configurations, configurations[:, :1] / 2, np.stack([throughput, throughput / 10], axis=1))
+        states, metrics = model.predict(configurations[:3])
+        np.testing.assert_allclose(metrics[:, 0], throughput[:3], atol=0.05 * np.ptp(throughput))
+        sampled = model.predict_metrics(configurations[0], np.random.RandomState(1))
+        self.assertEqual(set(sampled.keys()), {"throughput", "iops"})
+        self.assertGreaterEqual(sampled["iops"], 0)
@@ -15,9 +15,9 @@ class ToyDFSController(DistributedDFSController):
 
     def _set_scope_params(self, scoped_parameters: ScopedTuneParameters, **kwargs):
         for tune_parameter in scoped_parameters.parameters:
-            if tune_parameter.name is ToyKnobs.KNOB1.value:
+            if tune_parameter.name == ToyKnobs.KNOB1.value:
                 self.toy_state[0] = tune_parameter.value
-            elif tune_parameter.name is ToyKnobs.KNOB2.value:
+            elif tune_parameter.name == ToyKnobs.KNOB2.value:
                 self.toy_state[1] = tune_parameter.value
             else:
                 raise NotImplementedError
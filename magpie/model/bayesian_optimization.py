@@ -0,0 +1,133 @@
+import logging
+import math
+from typing import List
+
+import numpy as np
+
+from magpie.environment.surrogate.gaussian_process import GaussianProcessRegressor
+from magpie.types.dfs_configuration import DFSConfiguration
+from magpie.types.knob import Knob
+
+logger = logging.getLogger(__name__)
+
+_erf = np.vectorize(math.erf, otypes=[np.float64])
+
+
+def expected_improvement(mean: np.ndarray, std: np.ndarray, best: float, xi: float = 0.01) -> np.ndarray:
+    """
+    expected improvement over the best score of a maximization problem
+    :param mean: predicted mean of the candidates
+    :param std: predicted standard deviation of the candidates
+    :param best: best observed score
+    :param xi: minimum improvement, it trades exploitation for exploration
+    :return:
+    """
+    improvement = mean - best - xi
+    std = np.maximum(std, 1e-12)
+    z = improvement / std
+    cdf = 0.5 * (1 + _erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return improvement * cdf + std * pdf
+
+
+class BayesianOptimizer:
+    """
+    Bayesian optimization of integer knobs with a Gaussian process and expected improvement, the search space is the
+    range of each knob. Batches are suggested with the constant liar strategy: each suggestion is added with the mean
+    observed score before the next one is selected, so a batch can be evaluated in parallel.
+    """
+
+    def __init__(self, knobs: List[Knob], num_initial_points: int = 4, num_candidates: int = 4096,
+                 xi: float = 0.01, seed: int = None):
+        """
+        :param knobs:
+        :param num_initial_points: number of random configurations suggested before the model is used,
+        the default configuration is suggested first
+        :param num_candidates: number of random candidates to maximize the acquisition function, all configurations
+        are candidates if the space is not larger
+        :param xi: minimum improvement of the expected improvement, relative to the standard deviation of the scores
+        :param seed:
+        """
+        self.knobs = knobs
+        self.num_initial_points = num_initial_points
+        self.num_candidates = num_candidates
+        self.xi = xi
+        self.rng = np.random.RandomState(seed)
+        self._min = np.array([knob.min for knob in knobs], dtype=np.int64)
+        self._max = np.array([knob.max for knob in knobs], dtype=np.int64)
+        self._range = np.maximum(self._max - self._min, 1).astype(np.float64)
+        self.configurations = np.empty((0, len(knobs)), dtype=np.int64)
+        self.scores = np.empty(0, dtype=np.float64)
+
+    def encode(self, configurations: np.ndarray) -> np.ndarray:
+        return (configurations - self._min) / self._range
+
+    def _space_size(self) -> float:
+        return float(np.prod((self._max - self._min + 1).astype(np.float64)))
+
+    def _candidates(self) -> np.ndarray:
+        if self._space_size() <= self.num_candidates:
+            grids = np.meshgrid(*[np.arange(low, high + 1) for low, high in zip(self._min, self._max)], indexing="ij")
+            return np.stack([grid.ravel() for grid in grids], axis=1)
+        return self.rng.randint(self._min, self._max + 1, size=(self.num_candidates, len(self.knobs)))
+
+    @staticmethod
+    def _exclude(candidates: np.ndarray, configurations: np.ndarray) -> np.ndarray:
+        if len(configurations) == 0:
+            return candidates
+        known = (candidates[:, None, :] == configurations[None, :, :]).all(axis=2).any(axis=1)
+        return candidates[~known]
+
+    def suggest(self, batch_size: int = 1) -> np.ndarray:
+        """
+        suggest configurations to evaluate
+        :param batch_size: number of configurations evaluated in parallel
+        :return: knob values, shape (batch_size, knobs)
+        """
+        suggestions = []
+        configurations = self.configurations
+        scores = self.scores
+        gp = None
+        while len(suggestions) < batch_size:
+            candidates = self._exclude(self._candidates(), configurations)
+            if len(candidates) == 0:
+                # the space is exhausted, evaluate known configurations again
+                candidates = self._candidates()
+            if len(configurations) < self.num_initial_points or len(np.unique(scores)) < 2:
+                if len(configurations) == 0:
+                    suggestion = np.array([knob.default for knob in self.knobs], dtype=np.int64)
+                else:
+                    suggestion = candidates[self.rng.randint(len(candidates))]
+            else:
+                x = self.encode(configurations)
+                if gp is None:
+                    gp = GaussianProcessRegressor().fit(x, scores)
+                else:
+                    # liars are added with the hyperparameters selected on the real observations
+                    gp = GaussianProcessRegressor(length_scale=gp.length_scale, noise=gp.noise).fit(x, scores)
+                mean, std = gp.predict(self.encode(candidates), return_std=True)
+                acquisition = expected_improvement(mean[:, 0], std[:, 0], scores.max(), self.xi * scores.std())
+                suggestion = candidates[np.argmax(acquisition)]
+            suggestions.append(suggestion)
+            configurations = np.vstack([configurations, suggestion[None, :]])
+            scores = np.append(scores, self.scores.mean() if len(self.scores) > 0 else 0.0)
+        return np.array(suggestions, dtype=np.int64)
+
+    def observe(self, configurations: np.ndarray, scores: np.ndarray):
+        """
+        add evaluated configurations
+        :param configurations: knob values, shape (configurations, knobs)
+        :param scores: scores to maximize
+        :return:
+        """
+        self.configurations = np.vstack([self.configurations, np.asarray(configurations, dtype=np.int64)])
+        self.scores = np.append(self.scores, np.asarray(scores, dtype=np.float64))
+
+    def to_configuration(self, values: np.ndarray) -> DFSConfiguration:
+        return DFSConfiguration.from_parameters({knob: int(value) for knob, value in zip(self.knobs, values)})
+
+    def best(self) -> np.ndarray:
+        """
+        :return: knob values of the best observed configuration
+        """
+        return self.configurations[np.argmax(self.scores)]
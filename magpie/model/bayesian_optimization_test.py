@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.model.bayesian_optimization import BayesianOptimizer, expected_improvement
+
+
+class TestBayesianOptimizer(TestCase):
+    def test_expected_improvement(self):
+        ei = expected_improvement(np.array([1.0, 2.0, 2.0]), np.array([1.0, 1.0, 0.0]), 1.5, xi=0)
+        self.assertLess(ei[0], ei[1])
+        self.assertAlmostEqual(ei[2], 0.5)
+
+    def test_suggest_batch(self):
+        knobs = [LustreKnobs.STRIPE_COUNT.knob, LustreKnobs.STRIPE_SIZE.knob]
+        optimizer = BayesianOptimizer(knobs, num_initial_points=3, seed=0)
+        first = optimizer.suggest(3)
+        self.assertEqual(first.shape, (3, 2))
+        np.testing.assert_array_equal(first[0], [knob.default for knob in knobs])
+        self.assertEqual(len({tuple(values) for values in first}), 3)
+        for values in first:
+            self.assertTrue(all(knob.min <= value <= knob.max for knob, value in zip(knobs, values)))
+
+    def test_find_maximum(self):
+        knobs = [LustreKnobs.STRIPE_COUNT.knob, LustreKnobs.STRIPE_SIZE.knob]
+
+        def score(values):
+            return -(values[:, 0] - 7) ** 2 - ((values[:, 1] - 600) / 100) ** 2
+
+        optimizer = BayesianOptimizer(knobs, num_initial_points=4, seed=1)
+        for _ in range(8):
+            suggestions = optimizer.suggest(2)
+            optimizer.observe(suggestions, score(suggestions))
+        self.assertGreater(optimizer.scores.max(), -4)
+        configuration = optimizer.to_configuration(optimizer.best())
+        self.assertEqual(set(configuration.get_parameters().keys()), set(knobs))
@@ -1,6 +1,5 @@
 import functools
-from collections import defaultdict
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 
 import numpy as np
 import tensorflow as tf
@@ -19,6 +18,7 @@ from tf_agents.utils import common
 from magpie.model.dfs_model import DFSModel, DFSModelSettings
 from magpie.types.dfs_configuration import TuneParameter
 from magpie.types.knob import Knob
+from magpie.types.knob_codec import KnobCodec
 
 
 class DDPGSettings(DFSModelSettings):
@@ -44,6 +44,8 @@ class DDPGSettings(DFSModelSettings):
 class DDPG(DFSModel):
 
     def __init__(self, environment: TFPyEnvironment, dfs_model_settings: DDPGSettings):
+        # codecs are built once for each knob list, see generate_knobs
+        self._codecs: Dict[Tuple[Knob, ...], KnobCodec] = {}
         super().__init__(environment, dfs_model_settings)
 
     def create_agent(self, environment: TFPyEnvironment, ddpg_settings: DDPGSettings) -> tf_agent.TFAgent:
@@ -87,17 +89,12 @@ class DDPG(DFSModel):
         :param action:
         :return: {knob_scope, [Knob, Knob_value]}
         """
-        new_config = defaultdict(list)
-        for knob, action_value in zip(knobs, action):
-            assert 0 <= action_value <= 1, "action value is between 0 and 1"
-            if knob.type is np.int:
-                new_value = knob.min + (knob.max - knob.min) * action_value
-                new_value = int(new_value + 0.5)
-            else:
-                raise NotImplementedError(f"knob type {knob.type} is not implemented.")
-            tune_parameter = TuneParameter(knob, new_value)
-            new_config[knob.scope].append(tune_parameter)
-        return new_config
+        key = tuple(knobs)
+        codec = self._codecs.get(key)
+        if codec is None:
+            codec = self._codecs[key] = KnobCodec(knobs, round_half_up=True)
+        return {scoped_parameters.scope: scoped_parameters.parameters for scoped_parameters in
+                codec.scoped_parameters(codec.decode(action)[0])}
 
     def create_actor_network(self, fc_layer_units, action_spec):
         """Create an actor network for DDPG."""
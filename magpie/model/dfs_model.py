@@ -7,6 +7,7 @@ from tensorflow import Variable
 from tf_agents.agents import tf_agent
 from tf_agents.environments import TFPyEnvironment
 from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.trajectories import trajectory, time_step as ts
 from tf_agents.typing import types
 
 from magpie.types.dfs_configuration import TuneParameter
@@ -60,5 +61,44 @@ class DFSModel:
             num_steps=num_steps).prefetch(prefetch_size)
         return iter(dataset)
 
+    def fill_replay_buffer(self, transitions: Dict[str, np.ndarray]) -> int:
+        """
+        add stored transitions to the replay buffer, e.g., loaded by TransitionStore.load.
+        Sessions are distributed over the batch of the replay buffer, each batch entry is cut to the shortest one.
+        :param transitions: columns step_type, observation, action, reward and session
+        :return: number of added steps in each batch entry
+        """
+        step_type = transitions["step_type"].astype(np.int32)
+        session = transitions["session"]
+        # the last step of a session and the step before a reset end an episode
+        episode_end = np.ones_like(step_type, dtype=bool)
+        episode_end[:-1] = (step_type[1:] == ts.StepType.FIRST) | (session[1:] != session[:-1])
+        next_step_type = np.where(episode_end, ts.StepType.LAST, ts.StepType.MID).astype(np.int32)
+        discount = np.where(next_step_type == ts.StepType.LAST, 0, 1).astype(np.float32)
+        # assign sessions to batch entries, the longest sessions first
+        batch_size = self.replay_buffer.batch_size
+        sessions, session_lengths = np.unique(session, return_counts=True)
+        entries = [[] for _ in range(batch_size)]
+        entry_lengths = np.zeros(batch_size, dtype=np.int64)
+        for session_no in np.argsort(-session_lengths, kind="stable"):
+            entry = int(np.argmin(entry_lengths))
+            entries[entry].append(np.flatnonzero(session == sessions[session_no]))
+            entry_lengths[entry] += session_lengths[session_no]
+        num_steps = int(entry_lengths.min())
+        indices = np.stack([np.concatenate(entry)[:num_steps] for entry in entries]) if num_steps > 0 else None
+        spec = self.tf_agent.collect_data_spec
+        for i in range(num_steps):
+            index = indices[:, i]
+            experience = trajectory.Trajectory(
+                step_type=tf.constant(step_type[index], dtype=spec.step_type.dtype),
+                observation=tf.constant(transitions["observation"][index], dtype=spec.observation.dtype),
+                action=tf.constant(transitions["action"][index], dtype=spec.action.dtype),
+                policy_info=(),
+                next_step_type=tf.constant(next_step_type[index], dtype=spec.next_step_type.dtype),
+                reward=tf.constant(transitions["reward"][index], dtype=spec.reward.dtype),
+                discount=tf.constant(discount[index], dtype=spec.discount.dtype))
+            self.replay_buffer.add_batch(experience)
+        return num_steps
+
     def train(self, experience):
         return self.tf_agent.train(experience)
@@ -0,0 +1,98 @@
+import logging
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+import typer
+
+from magpie.model.bayesian_optimization import BayesianOptimizer
+from magpie.types.collector_type import CollectorType
+from magpie.types.dfs_configuration import ConfigurationScorePair
+from magpie.types.distributed_file_system import DFS
+from magpie.types.reward_type import RewardType
+from magpie.types.rl_model import RLModel
+from magpie.utils import magpie_logging
+from magpie.utils.commons import APP_ROOT
+from magpie.utils.tuner_utils import create_env, get_environments, get_good_configurations, evaluate_configuration, \
+    save_configuration_score_pairs
+
+
+def main(
+        experiment_name: str = typer.Option(..., help="experiment name"),
+        dfs: DFS = typer.Option(DFS.LUSTRE.value, help="distributed file system type"),
+        reward_type: RewardType = typer.Option(RewardType.REWARD_2A.value,
+                                               help="reward type, its metric is the score to maximize"),
+        num_iterations: int = typer.Option(..., help="Number of batches of configurations to evaluate"),
+        batch_size: int = typer.Option(None, help="Configurations suggested in each batch, "
+                                                  "the number of parallel environments by default"),
+        num_initial_points: int = typer.Option(4, help="Number of random configurations before the model is used"),
+        enable_observation_normalizer: bool = typer.Option(False, help="Normalize observation"),
+        observation_time: int = typer.Option(15, help="Observation time of each configuration"),
+        evaluation_time: int = typer.Option(None,
+                                            help="Evaluation time for each top configurations in the final phase"),
+        debug: bool = typer.Option(False, help="Running in debug mode"),
+        periodic_workload: bool = typer.Option(True, help="run the workload for each configuration"),
+        double_optimization: bool = typer.Option(False, help="optimize double performance indicator"),
+        collector: CollectorType = typer.Option(CollectorType.INFLUXDB.value, help="performance indicator collector"),
+        num_parallel_envs: int = typer.Option(1, help="Number of environments evaluating configurations in parallel"),
+        seed: int = typer.Option(None, help="seed of the random candidates"),
+        history_path: str = typer.Option(None, help="SQLite file of the history of evaluated configurations"),
+):
+    current_time = time.strftime("%Y%m%d-%H%M%S")
+    train_log_dir = f"{APP_ROOT}/log/train/{experiment_name}_{current_time}"
+    is_pro_env = "wally" in socket.gethostname()
+    magpie_logging.init(train_log_dir, is_pro_env)
+    logger = logging.getLogger(__name__)
+    internal_pis, knobs, py_environment, _ = create_env(debug, dfs, enable_observation_normalizer, observation_time,
+                                                        reward_type, None, RLModel.BO,
+                                                        dd_workload=periodic_workload,
+                                                        double_optimization=double_optimization,
+                                                        collector_type=collector, num_parallel_envs=num_parallel_envs,
+                                                        history_path=history_path)
+    environments = get_environments(py_environment)
+    batch_size = batch_size or len(environments)
+    reward_model = environments[0].reward_model
+    get_score = getattr(reward_model, "get_scalarization_value", reward_model.get_metric_a)
+    # the workload length defines the observation in the periodic workload mode
+    step_observation_time = None if periodic_workload else observation_time
+    optimizer = BayesianOptimizer(knobs, num_initial_points=num_initial_points, seed=seed)
+    logger.info(f"Bayesian optimization of {[knob.name for knob in knobs]} with {len(environments)} environments, "
+                f"batch size {batch_size}")
+    executor = ThreadPoolExecutor(max_workers=len(environments), thread_name_prefix="bo-env")
+    list(executor.map(lambda environment: environment.reset(), environments))
+
+    def evaluate_on(environment, configurations) -> List[ConfigurationScorePair]:
+        results = []
+        for configuration in configurations:
+            result = environment.evaluate_configuration(configuration, step_observation_time)
+            # the evaluation is already in the configuration history
+            environment.update_best_configuration(configuration, result.score, record=False)
+            results.append(result)
+        return results
+
+    for iteration_no in range(1, num_iterations + 1):
+        start = time.time()
+        suggestions = optimizer.suggest(batch_size)
+        configurations = [optimizer.to_configuration(values) for values in suggestions]
+        # configurations of an environment are evaluated one after another, environments run in parallel
+        assignments = [configurations[env_no::len(environments)] for env_no in range(len(environments))]
+        futures = [executor.submit(evaluate_on, environment, assigned) for environment, assigned in
+                   zip(environments, assignments) if len(assigned) > 0]
+        results = {id(result.configuration): result for future in futures for result in future.result()}
+        scores = [get_score(results[id(configuration)].score) for configuration in configurations]
+        optimizer.observe(suggestions, scores)
+        best = optimizer.best()
+        logger.info(f"[Iteration: {iteration_no}] scores: {np.round(scores, 2).tolist()} of {suggestions.tolist()}, "
+                    f"best score {optimizer.scores.max():.2f} of {best.tolist()}, {time.time() - start:.2f}s")
+
+    good_configurations = get_good_configurations(py_environment)
+    save_configuration_score_pairs(train_log_dir, good_configurations, "good_configurations")
+    evaluate_configuration(train_log_dir, good_configurations, py_environment,
+                           None if periodic_workload else evaluation_time)
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    typer.run(main)
@@ -8,13 +8,14 @@ from tf_agents.utils import common
 
 from magpie.config.config import FioSettings
 from magpie.environment.controller import logger
+from magpie.types.collector_type import CollectorType
 from magpie.types.distributed_file_system import DFS
 from magpie.types.reward_type import RewardType
 from magpie.types.rl_model import RLModel
 from magpie.types.workload import Workload
 from magpie.utils import magpie_logging
 from magpie.utils.fio_utils import FioUtils
-from magpie.utils.tuner_utils import create_model, create_env
+from magpie.utils.tuner_utils import create_model, create_env, get_environments, get_good_configurations
 
 
 class Evaluation:
@@ -25,11 +26,13 @@ class Evaluation:
 
     def __init__(self, tf_env, policy: tf_policy.TFPolicy, num_eval_iterations, fio_settings: FioSettings):
         self.tf_env = tf_env
-        self.py_env = self.tf_env.pyenv.envs[0]
-        good_configurations = self.py_env.good_configurations
+        # all environments step together, each one is evaluated against its own initial metrics
+        self.py_envs = get_environments(self.tf_env.pyenv)
+        good_configurations = [py_env.good_configurations for py_env in self.py_envs]
         self.init_time_step = tf_env.reset()
-        self.py_env.good_configurations = good_configurations
-        self.init_external_metrics = self.tf_env.get_info().item().get_all_metrics()
+        for py_env, env_good_configurations in zip(self.py_envs, good_configurations):
+            py_env.good_configurations = env_good_configurations
+        self.init_external_metrics = [py_env.get_info().get_all_metrics() for py_env in self.py_envs]
         self.policy = policy
         self.num_eval_iterations = num_eval_iterations
         self.fio_settings = fio_settings
@@ -38,23 +41,24 @@ class Evaluation:
 
     def test(self):
         time_step = self.init_time_step
-        good_configurations = self.py_env.good_configurations
+        good_configurations = get_good_configurations(self.tf_env.pyenv)
         logger.info(f"good configurations:{good_configurations}")
         for iter_no in range(self.num_eval_iterations):
             action_step = self.policy.action(time_step)
             time_step = self.tf_env.step(action_step.action)
-            external_metrics = self.tf_env.get_info()
-
-            performance_improvement = ""
-            for k, v in external_metrics.item().get_all_metrics().items():
-                init_v = self.init_external_metrics[k]
-                improve_pct = v / init_v * 100 if init_v != 0 else 0
-                performance_improvement += f"{k}={improve_pct:.2f}%"
-            logger.info(
-                f"eval iteration[{iter_no}], performance improvement: {performance_improvement}%, raw data:{external_metrics}")
-            good_configurations = self.py_env.good_configurations
+            for env_no, (py_env, init_external_metrics) in enumerate(zip(self.py_envs, self.init_external_metrics)):
+                external_metrics = py_env.get_info()
+
+                performance_improvement = ""
+                for k, v in external_metrics.get_all_metrics().items():
+                    init_v = init_external_metrics[k]
+                    improve_pct = v / init_v * 100 if init_v != 0 else 0
+                    performance_improvement += f"{k}={improve_pct:.2f}%"
+                logger.info(
+                    f"eval iteration[{iter_no}] env[{env_no}], performance improvement: {performance_improvement}%, raw data:{external_metrics}")
+            good_configurations = get_good_configurations(self.tf_env.pyenv)
             logger.info(f"good configurations:{good_configurations}")
-        good_configurations = self.py_env.good_configurations
+        good_configurations = get_good_configurations(self.tf_env.pyenv)
         logger.info(f"good configuration {good_configurations}")
 
 
@@ -74,11 +78,13 @@ def main(reward_type: RewardType = typer.Option(..., help="reward function type"
          # workload: Workload = typer.Option(..., help="workload"),
          dfs: DFS = typer.Option(DFS.LUSTRE.value, help="distributed file system type"),
          enable_observation_normalizer: bool = typer.Option(False, help="Normalize observation"),
-         dd_workload: bool = typer.Option(False, help="flag to use DD workload")
+         dd_workload: bool = typer.Option(False, help="flag to use DD workload"),
+         collector: CollectorType = typer.Option(CollectorType.INFLUXDB.value, help="performance indicator collector")
          ):
 
     workload = Workload.FINAL_RW if not dd_workload else None
-    _, _, _, env = create_env(debug, dfs, enable_observation_normalizer, observation_time, reward_type, workload, rl_model, dd_workload=dd_workload)
+    _, _, _, env = create_env(debug, dfs, enable_observation_normalizer, observation_time, reward_type, workload, rl_model, dd_workload=dd_workload,
+                              collector_type=collector)
     global_step = tf.compat.v1.train.get_or_create_global_step()
     tf.summary.experimental.set_step(global_step)
     model, model_settings = create_model(global_step, rl_model, env)
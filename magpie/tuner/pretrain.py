@@ -0,0 +1,79 @@
+import logging
+import socket
+import time
+
+import tensorflow as tf
+import typer
+from tf_agents.utils import common
+
+from magpie.types.distributed_file_system import DFS
+from magpie.types.reward_type import RewardType
+from magpie.types.rl_model import RLModel
+from magpie.utils import magpie_logging
+from magpie.utils.commons import APP_ROOT
+from magpie.utils.transition_store import TransitionStore
+from magpie.utils.tuner_utils import create_model, create_env
+
+
+def main(
+        transition_store_dir: str = typer.Option(..., help="Folder of transitions saved by train.py"),
+        experiment_name: str = typer.Option(..., help="experiment name, train.py restores the checkpoint of the "
+                                                      "same experiment"),
+        dfs: DFS = typer.Option(DFS.LUSTRE.value, help="distributed file system type"),
+        model: RLModel = typer.Option(RLModel.DDPG.value, help="RL model"),
+        reward_type: RewardType = typer.Option(RewardType.REWARD_2A.value, help="reward type "),
+        enable_observation_normalizer: bool = typer.Option(False, help="Normalize observation, it needs to be the "
+                                                                       "same as in the sessions of the transitions"),
+        num_parallel_envs: int = typer.Option(1, help="Number of parallel environments of the following training"),
+        num_train_steps: int = typer.Option(1000, help="Number of training iterations"),
+        sample_batch_size: int = typer.Option(64, help="Number of trajectories sampled in each training iteration"),
+        log_interval: int = typer.Option(100, help="Interval of loss logging"),
+):
+    current_time = time.strftime("%Y%m%d-%H%M%S")
+    pretrain_log_dir = f"{APP_ROOT}/log/pretrain/{experiment_name}_{current_time}"
+    checkpoint_dir = f"{APP_ROOT}/checkpoint/{experiment_name}"
+    is_pro_env = "wally" in socket.gethostname()
+    magpie_logging.init(pretrain_log_dir, is_pro_env)
+    logger = logging.getLogger(__name__)
+    transitions = TransitionStore.load(transition_store_dir)
+    if transitions is None:
+        raise typer.BadParameter(f"no transitions in {transition_store_dir}")
+    global_step = tf.compat.v1.train.get_or_create_global_step()
+    tf.summary.experimental.set_step(global_step)
+    # the environment provides specs only, it's neither reset nor stepped
+    internal_pis, knobs, _, tf_env = create_env(True, dfs, enable_observation_normalizer, 0, reward_type, None,
+                                                model, num_parallel_envs=num_parallel_envs)
+    meta = TransitionStore.load_meta(transition_store_dir)
+    if meta["observation_names"] != [pi.name for pi in internal_pis] or \
+            meta["knob_names"] != [f"{knob.scope}.{knob.name}" for knob in knobs]:
+        raise typer.BadParameter(f"transitions don't match the environment, stored: {meta}")
+    model, model_settings = create_model(global_step, model, tf_env)
+    train_checkpointer = common.Checkpointer(
+        ckpt_dir=checkpoint_dir,
+        max_to_keep=10,
+        agent=model.tf_agent,
+        policy=model.tf_agent.policy,
+        replay_buffer=model.replay_buffer,
+        global_step=global_step
+    )
+    train_checkpointer.initialize_or_restore()
+    num_steps = model.fill_replay_buffer(transitions)
+    logger.info(f"filled replay buffer with {num_steps} steps in each of {tf_env.batch_size} batch entries, "
+                f"{len(transitions['reward'])} transitions are loaded")
+    if num_steps < 2:
+        raise typer.BadParameter("at least 2 consecutive steps are required to train")
+    dataset_iterator = model.get_dataset_iterator(3, sample_batch_size, 2, 3)
+    train = common.function(model.train)
+    start = time.time()
+    for iteration_no in range(1, num_train_steps + 1):
+        experience, _ = next(dataset_iterator)
+        training_loss = train(experience)
+        if iteration_no % log_interval == 0:
+            logger.info(f"[Iteration: {iteration_no}] training_loss: {training_loss.loss:.2f} "
+                        f"{iteration_no / (time.time() - start):.1f} iterations/s")
+    train_checkpointer.save(global_step)
+    logger.info(f"saved pretrained model to {checkpoint_dir}")
+
+
+if __name__ == '__main__':
+    typer.run(main)
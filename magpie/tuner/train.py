@@ -16,13 +16,15 @@ from tf_agents.utils import common
 
 from magpie.config.config import FioSettings, LustreKnobsSettings
 from magpie.tuner.eval import Evaluation
+from magpie.types.collector_type import CollectorType
 from magpie.types.dfs_configuration import ConfigurationScorePair
 from magpie.types.distributed_file_system import DFS
 from magpie.types.reward_type import RewardType
 from magpie.types.rl_model import RLModel
 from magpie.utils import magpie_logging, commons, metrics_utils
 from magpie.utils.commons import APP_ROOT
-from magpie.utils.tuner_utils import save_configuration_score_pairs, create_model, evaluate_configuration, create_env
+from magpie.utils.tuner_utils import save_configuration_score_pairs, create_model, evaluate_configuration, create_env, \
+    get_good_configurations, set_summary_writer
 
 
 def main(
@@ -47,6 +49,15 @@ def main(
         eval_step: int = typer.Option(10, help="Evaluate the mode every eval_step"),
         periodic_workload: bool = typer.Option(True, help="tuning between each run of the workload"),
         double_optimization: bool = typer.Option(False, help="optimize double performance indicator"),
+        collector: CollectorType = typer.Option(CollectorType.INFLUXDB.value, help="performance indicator collector"),
+        num_parallel_envs: int = typer.Option(1, help="Number of environments stepping in parallel on disjoint client groups"),
+        transition_store_dir: str = typer.Option(None, help="Folder to save transitions for offline pretraining"),
+        metrics_cache: bool = typer.Option(False, help="Reuse metrics of revisited configurations instead of running the workload again"),
+        early_stopping: bool = typer.Option(False, help="Stop workload runs which can't reach the best throughput"),
+        adaptive_window: bool = typer.Option(False, help="End observation windows once the throughput is stable, "
+                                                         "observation_time is the reference of its bounds"),
+        history_path: str = typer.Option(None, help="SQLite file of the history of evaluated configurations, "
+                                                    "it's kept in memory only by default"),
         experiment_name: str = typer.Option(..., help="experiment name")
 ):
     # workload = Workload.FINAL_RW
@@ -70,7 +81,13 @@ def main(
     internal_pis, knobs, py_environment, tf_env = create_env(debug, dfs,
                                                              enable_observation_normalizer,
                                                              observation_time, reward_type, workload, model,
-                                                             dd_workload=periodic_workload, double_optimization=double_optimization)
+                                                             dd_workload=periodic_workload, double_optimization=double_optimization,
+                                                             collector_type=collector, num_parallel_envs=num_parallel_envs,
+                                                             transition_store_dir=transition_store_dir,
+                                                             metrics_cache=metrics_cache,
+                                                             early_stopping=early_stopping,
+                                                             adaptive_window=adaptive_window,
+                                                             history_path=history_path)
 
     # Build models
     model, model_settings = create_model(global_step, model, tf_env)
@@ -107,6 +124,7 @@ def main(
     # eval_summary_writer = tf.compat.v2.summary.create_file_writer(
     #     eval_log_dir, flush_millis=summaries_flush_secs * 1000)
     train_summary_writer.set_as_default()
+    set_summary_writer(py_environment, train_summary_writer, global_step)
     initial_collect_driver = dynamic_step_driver.DynamicStepDriver(
         tf_env,
         policy=model.tf_agent.collect_policy,
@@ -157,7 +175,7 @@ def main(
         # evaluation
         if eval_step is not None and iteration_no % eval_step == 0:
             logger.info("---Evaluation Start---")
-            good_configurations: List[ConfigurationScorePair] = py_environment.good_configurations
+            good_configurations: List[ConfigurationScorePair] = get_good_configurations(py_environment)
             evaluate_configuration(train_log_dir, good_configurations, py_environment, evaluation_time)
             logger.info("---Evaluation End---")
 
@@ -171,7 +189,7 @@ def main(
                 f"Stop training as the agent exceeds return sum toleration, current return sum: {sum_of_return}")
             break
         if periodic_workload and global_step.numpy() % 20 == 0:
-            logger.info(f"Best configuration so far: {pformat(py_environment.good_configurations)}")
+            logger.info(f"Best configuration so far: {pformat(get_good_configurations(py_environment))}")
 
     # evaluation
     logger.info("Start evaluation")
@@ -180,7 +198,7 @@ def main(
     Evaluation(tf_env, model.tf_agent.policy, num_eval_iterations, fio_settings).test()
 
     # evaluate and select best configuration among best_configurations and the last configuration recommend by the model
-    good_configurations: List[ConfigurationScorePair] = py_environment.good_configurations
+    good_configurations: List[ConfigurationScorePair] = get_good_configurations(py_environment)
     save_configuration_score_pairs(train_log_dir, good_configurations, "good_configurations")
     if periodic_workload:
         evaluation_time = None
@@ -0,0 +1,55 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+
+@dataclass
+class NodeApplyResult:
+    """
+    result of applying the parameters of one scope on one node
+    """
+    node: str
+    scope: str
+    cmd: str
+    output: Optional[str] = None
+    # error message, None if the parameters are applied successfully
+    error: Optional[str] = None
+    # elapsed time in second
+    elapsed: float = 0
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def __str__(self):
+        status = "ok" if self.succeeded else f"error={self.error}"
+        return f"node={self.node},scope={self.scope},{status},elapsed={self.elapsed:.3f}s"
+
+
+@dataclass
+class ApplyResult:
+    """
+    result of applying a DFS configuration on all nodes
+    """
+    node_results: List[NodeApplyResult] = field(default_factory=list)
+
+    @property
+    def failures(self) -> List[NodeApplyResult]:
+        return [result for result in self.node_results if not result.succeeded]
+
+    @property
+    def succeeded(self) -> bool:
+        return len(self.failures) == 0
+
+    def failed_scopes(self) -> Set[str]:
+        """
+        scopes which failed on at least one node
+        :return:
+        """
+        return {result.scope for result in self.failures}
+
+    def extend(self, other: "ApplyResult"):
+        self.node_results.extend(other.node_results)
+
+    def __str__(self):
+        return f"{len(self.node_results) - len(self.failures)}/{len(self.node_results)} succeeded, " \
+               f"failures=[{','.join([str(failure) for failure in self.failures])}]"
@@ -0,0 +1,13 @@
+from magpie.types.str_enum import StrEnum
+
+
+class CleanStrategy(StrEnum):
+    """
+    how the files of the previous workload run are removed
+    """
+    # one rm -rf on the workload node
+    SERIAL = "serial"
+    # parallel unlinks spread across the clients
+    PARALLEL = "parallel"
+    # move the files out of the tuning folder and remove them in the background
+    SWAP = "swap"
@@ -0,0 +1,11 @@
+from magpie.types.str_enum import StrEnum
+
+
+class CollectorType(StrEnum):
+    """
+    performance indicator collectors
+    """
+    # query the window from InfluxDB after it closes
+    INFLUXDB = "influxdb"
+    # aggregate samples streamed by Telegraf during the window
+    STREAMING = "streaming"
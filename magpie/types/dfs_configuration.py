@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List, Union
+from typing import List, Union, Dict, Optional, Iterable, Tuple
 
 from magpie.types.external_metrics import ExternalMetrics
 from magpie.types.knob import Knob
@@ -10,6 +10,8 @@ class TuneParameter:
     """
     tuning parameter value pair
     """
+    __slots__ = ("name", "value")
+
     name: Knob
     value: Union[int, float]
 
@@ -19,6 +21,7 @@ class TuneParameter:
 
 @dataclass
 class ScopedTuneParameters:
+    __slots__ = ("scope", "parameters")
     scope: str
     parameters: List[TuneParameter]
 
@@ -31,6 +34,8 @@ class ScopedTuneParameters:
 
 @dataclass
 class DFSConfiguration:
+    # configurations and their parameters are created in each step, they don't allocate a __dict__
+    __slots__ = ("configuration",)
     configuration: List[ScopedTuneParameters]
 
     def __str__(self):
@@ -42,6 +47,61 @@ class DFSConfiguration:
     def __iter__(self):
         return self.configuration.__iter__()
 
+    def __len__(self):
+        return sum([len(scoped_parameters.parameters) for scoped_parameters in self.configuration])
+
+    def get_parameters(self) -> Dict[Knob, Union[int, float]]:
+        return {param.name: param.value for scoped_parameters in self.configuration for param in
+                scoped_parameters.parameters}
+
+    def key(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        hashable key of the knob values, (knob id, integer value) ordered by knob id
+        """
+        return tuple(sorted((knob.id, int(value)) for knob, value in self.get_parameters().items()))
+
+    def difference(self, other: Optional["DFSConfiguration"],
+                   atomic_scopes: Iterable[str] = ()) -> "DFSConfiguration":
+        """
+        get parameters which are missing or have a different value in other configuration
+        :param other: e.g., the last applied configuration, all parameters are returned if it is None
+        :param atomic_scopes: scopes whose parameters can be only applied together, they are returned completely
+        if any parameter of the scope changes
+        :return: changed parameters, scopes without changes are omitted
+        """
+        other_parameters = other.get_parameters() if other is not None else {}
+        result = []
+        for scoped_parameters in self.configuration:
+            changed = [param for param in scoped_parameters.parameters if
+                       param.name not in other_parameters or other_parameters[param.name] != param.value]
+            if len(changed) > 0 and scoped_parameters.scope in atomic_scopes:
+                changed = scoped_parameters.parameters
+            if len(changed) > 0:
+                result.append(ScopedTuneParameters(scoped_parameters.scope, changed))
+        return DFSConfiguration(result)
+
+    def update(self, other: "DFSConfiguration") -> "DFSConfiguration":
+        """
+        create a new configuration with parameters of this configuration overwritten by other configuration
+        :param other:
+        :return:
+        """
+        parameters = self.get_parameters()
+        parameters.update(other.get_parameters())
+        return DFSConfiguration.from_parameters(parameters)
+
+    @staticmethod
+    def from_parameters(parameters: Dict[Knob, Union[int, float]]) -> "DFSConfiguration":
+        """
+        create a configuration from knob values, parameters are grouped by the knob scope
+        :param parameters:
+        :return:
+        """
+        scoped = {}
+        for knob, value in parameters.items():
+            scoped.setdefault(knob.scope, []).append(TuneParameter(knob, value))
+        return DFSConfiguration([ScopedTuneParameters(scope, params) for scope, params in scoped.items()])
+
 
 @dataclass
 class ConfigurationScorePair:
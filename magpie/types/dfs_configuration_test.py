@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.types.dfs_configuration import TuneParameter, ScopedTuneParameters, DFSConfiguration
+
+
+class TestDFSConfiguration(TestCase):
+    def setUp(self) -> None:
+        self.previous = DFSConfiguration([
+            ScopedTuneParameters("osc", [TuneParameter(LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, 8),
+                                         TuneParameter(LustreKnobs.MAX_DIRTY_MB.knob, 10)]),
+            ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, 1),
+                                            TuneParameter(LustreKnobs.STRIPE_SIZE.knob, 16)]),
+        ])
+
+    def test_difference(self):
+        current = DFSConfiguration([
+            ScopedTuneParameters("osc", [TuneParameter(LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, 16),
+                                         TuneParameter(LustreKnobs.MAX_DIRTY_MB.knob, 10)]),
+            ScopedTuneParameters("stripe", [TuneParameter(LustreKnobs.STRIPE_COUNT.knob, 2),
+                                            TuneParameter(LustreKnobs.STRIPE_SIZE.knob, 16)]),
+        ])
+        difference = current.difference(self.previous, atomic_scopes={"stripe"})
+        self.assertEqual(len(difference), 3)
+        self.assertEqual([scoped.scope for scoped in difference], ["osc", "stripe"])
+        self.assertEqual(difference.configuration[0].parameters,
+                         [TuneParameter(LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, 16)])
+        self.assertEqual(len(self.previous.difference(self.previous)), 0)
+        self.assertEqual(len(current.difference(None)), 4)
+
+    def test_update(self):
+        changed = DFSConfiguration([ScopedTuneParameters("osc", [TuneParameter(LustreKnobs.MAX_DIRTY_MB.knob, 20)])])
+        parameters = self.previous.update(changed).get_parameters()
+        self.assertEqual(len(parameters), 4)
+        self.assertEqual(parameters[LustreKnobs.MAX_DIRTY_MB.knob], 20)
+        self.assertEqual(parameters[LustreKnobs.MAX_RPCS_IN_FLIGHT.knob], 8)
@@ -9,3 +9,5 @@ class DFS(StrEnum):
     CEPH = "ceph"
     LUSTRE = "lustre"
     TOY = "toy"
+    # simulated by a model fitted on saved Lustre transitions
+    SURROGATE = "surrogate"
@@ -0,0 +1,13 @@
+from magpie.types.str_enum import StrEnum
+
+
+class FluxQueryMode(StrEnum):
+    """
+    how the InfluxDB collector queries performance indicators
+    """
+    # the query file with three scans joined by InfluxDB
+    JOINED = "joined"
+    # the three scans as independent queries sent concurrently, results are joined by the collector
+    SPLIT = "split"
+    # one scan of all fields downsampled per series, aggregated by the collector
+    SINGLE_SCAN = "single_scan"
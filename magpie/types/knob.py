@@ -1,7 +1,8 @@
-from typing import TypeVar, Generic
+import threading
+from typing import TypeVar, Generic, List, Dict, Tuple, Optional
 
 import numpy as np
-from pydantic import root_validator
+from pydantic import root_validator, PrivateAttr
 from pydantic.generics import GenericModel
 
 T = TypeVar('T')
@@ -9,7 +10,7 @@ T = TypeVar('T')
 
 class Knob(GenericModel, Generic[T]):
     """
-    DFS knob spec
+    DFS knob spec, it's validated when it's created and immutable afterwards
     """
     name: str
     alias: str = None
@@ -19,13 +20,28 @@ class Knob(GenericModel, Generic[T]):
     default: T
     min: T
     max: T
+    # cached hash and registry id, they are not fields of the model
+    _hash: int = PrivateAttr()
+    _id: Optional[int] = PrivateAttr(default=None)
+
+    def __init__(self, **data) -> None:
+        super().__init__(**data)
+        self._hash = hash((self.name, self.scope))
 
     def __hash__(self):
-        scope = self.scope or ""
-        return hash(self.name + scope)
+        return self._hash
 
     def __eq__(self, other):
-        return (self.name, self.scope) == (other.name, other.scope)
+        return self is other or (self.name, self.scope) == (other.name, other.scope)
+
+    @property
+    def id(self) -> int:
+        """
+        id of the knob in the knob registry, knobs with the same scope and name have the same id
+        """
+        if self._id is None:
+            self._id = KNOB_REGISTRY.id(self)
+        return self._id
 
     def __sstr__(self):
         return self.name
@@ -42,6 +58,7 @@ class Knob(GenericModel, Generic[T]):
 
     class Config:
         arbitrary_types_allowed = True
+        allow_mutation = False
 
     @root_validator
     def check_numerical_range_validity(cls, values):
@@ -60,3 +77,39 @@ class IntKnob(Knob[np.int]):
 
     def __init__(self, **data) -> None:
         super().__init__(**data, type=np.int)
+
+
+class KnobRegistry:
+    """
+    interns knobs by scope and name and assigns small consecutive ids to them
+    """
+
+    def __init__(self):
+        self._knobs: List[Knob] = []
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def id(self, knob: Knob) -> int:
+        key = (knob.scope, knob.name)
+        knob_id = self._ids.get(key)
+        if knob_id is None:
+            with self._lock:
+                knob_id = self._ids.setdefault(key, len(self._knobs))
+                if knob_id == len(self._knobs):
+                    self._knobs.append(knob)
+        return knob_id
+
+    def intern(self, knob: Knob) -> Knob:
+        """
+        :return: the first registered knob with the same scope and name
+        """
+        return self._knobs[self.id(knob)]
+
+    def __getitem__(self, knob_id: int) -> Knob:
+        return self._knobs[knob_id]
+
+    def __len__(self):
+        return len(self._knobs)
+
+
+KNOB_REGISTRY = KnobRegistry()
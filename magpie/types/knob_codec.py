@@ -0,0 +1,149 @@
+from typing import List, Dict, Union, Tuple, Optional, Iterable
+
+import numpy as np
+
+from magpie.types.dfs_configuration import DFSConfiguration, ScopedTuneParameters, TuneParameter
+from magpie.types.knob import Knob, KNOB_REGISTRY
+
+
+class KnobCodec:
+    """
+    precompiled mapping between actions in [0, 1] and integer knob values, built once from the knob list.
+    A batch of actions is decoded in one NumPy operation.
+    """
+
+    def __init__(self, knobs: List[Knob], round_half_up: bool = False):
+        """
+        :param knobs:
+        :param round_half_up: round decoded values to the nearest integer instead of truncating them
+        """
+        for knob in knobs:
+            if knob.type is not np.int and knob.type is not np.float:
+                raise NotImplementedError(f"knob type {knob.type} is not implemented.")
+        self.knobs = [KNOB_REGISTRY.intern(knob) for knob in knobs]
+        self.knob_ids = np.array([knob.id for knob in self.knobs], dtype=np.int32)
+        # position of each knob in the order of the knob ids
+        self.id_order = np.argsort(self.knob_ids, kind="stable")
+        self.knob_key = tuple(self.knob_ids.tolist())
+        self.round_half_up = round_half_up
+        self.min = np.array([knob.min for knob in knobs], dtype=np.float64)
+        self.max = np.array([knob.max for knob in knobs], dtype=np.float64)
+        self.scale = self.max - self.min
+        # knob values are stored in the smallest integer type which holds the range of all knobs
+        self.dtype = np.int32 if np.all(np.abs(np.concatenate([self.min, self.max, [0]])) < 2 ** 31) else np.int64
+        # knob indices of each scope, in the order of the first knob of the scope
+        scope_groups: Dict[str, List[int]] = {}
+        for i, knob in enumerate(knobs):
+            scope_groups.setdefault(knob.scope, []).append(i)
+        self.scope_groups = {scope: np.array(indices) for scope, indices in scope_groups.items()}
+
+    def __len__(self):
+        return len(self.knobs)
+
+    def decode(self, actions: np.ndarray) -> np.ndarray:
+        """
+        map actions to knob values
+        :param actions: shape (knobs,) or (batch, knobs), values between 0 and 1
+        :return: integer knob values of shape (batch, knobs)
+        """
+        actions = np.atleast_2d(np.asarray(actions, dtype=np.float64))
+        assert np.all((0 <= actions) & (actions <= 1)), \
+            f"invalid action {actions}, action value needs to be between 0 and 1"
+        values = self.min + self.scale * actions
+        if self.round_half_up:
+            values = values + 0.5
+        # truncated like int()
+        return np.trunc(values).astype(self.dtype)
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """
+        map knob values to actions, the inverse of decode for values within the knob range
+        :param values: shape (knobs,) or (batch, knobs)
+        :return: actions of shape (batch, knobs)
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        scale = np.where(self.scale == 0, 1, self.scale)
+        return np.clip((values - self.min) / scale, 0, 1).astype(np.float32)
+
+    def scoped_parameters(self, values: np.ndarray) -> List[ScopedTuneParameters]:
+        return [ScopedTuneParameters(scope, [TuneParameter(self.knobs[i], int(values[i])) for i in indices])
+                for scope, indices in self.scope_groups.items()]
+
+    def to_configuration(self, values: np.ndarray) -> "EncodedDFSConfiguration":
+        """
+        :param values: knob values of one configuration
+        :return: configuration whose scoped parameters are created on first access
+        """
+        return EncodedDFSConfiguration(self, values)
+
+    def decode_configurations(self, actions: np.ndarray) -> List["EncodedDFSConfiguration"]:
+        return [self.to_configuration(values) for values in self.decode(actions)]
+
+
+class EncodedDFSConfiguration(DFSConfiguration):
+    """
+    configuration backed by the knob values of a codec, the scoped parameters are only created when the
+    configuration is applied or logged. It's hashed and compared by the value array.
+    """
+    __slots__ = ("codec", "values", "_configuration", "_hash")
+
+    def __init__(self, codec: KnobCodec, values: np.ndarray):
+        """
+        :param codec:
+        :param values: knob values in the order of the codec knobs, they are copied
+        """
+        self.codec = codec
+        # the copy is frozen, the array of the caller stays writeable
+        self.values = np.array(values, dtype=codec.dtype)
+        self.values.flags.writeable = False
+        self._configuration = None
+        self._hash = None
+
+    def __reduce__(self):
+        # the configuration property hides the slot of the base class, copies are created from the values
+        return EncodedDFSConfiguration, (self.codec, self.values)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self.codec.knob_key, self.values.tobytes()))
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, EncodedDFSConfiguration) and other.codec.knob_key == self.codec.knob_key:
+            return np.array_equal(self.values, other.values)
+        if isinstance(other, DFSConfiguration):
+            return self.configuration == other.configuration
+        return NotImplemented
+
+    def key(self) -> Tuple[Tuple[int, int], ...]:
+        order = self.codec.id_order
+        return tuple(zip(self.codec.knob_ids[order].tolist(), self.values[order].tolist()))
+
+    def difference(self, other: Optional[DFSConfiguration],
+                   atomic_scopes: Iterable[str] = ()) -> DFSConfiguration:
+        """
+        see DFSConfiguration.difference, the values of a configuration of the same knobs are compared as arrays and
+        only the changed parameters are created
+        """
+        if not isinstance(other, EncodedDFSConfiguration) or other.codec.knob_key != self.codec.knob_key:
+            return super().difference(other, atomic_scopes)
+        changed = self.values != other.values
+        result = []
+        for scope, indices in self.codec.scope_groups.items():
+            changed_indices = indices if scope in atomic_scopes else indices[changed[indices]]
+            if np.any(changed[indices]):
+                result.append(ScopedTuneParameters(scope, [TuneParameter(self.codec.knobs[i], int(self.values[i]))
+                                                           for i in changed_indices]))
+        return DFSConfiguration(result)
+
+    @property
+    def configuration(self) -> List[ScopedTuneParameters]:
+        if self._configuration is None:
+            self._configuration = self.codec.scoped_parameters(self.values)
+        return self._configuration
+
+    def __len__(self):
+        return len(self.values)
+
+    def get_parameters(self) -> Dict[Knob, Union[int, float]]:
+        return dict(zip(self.codec.knobs, self.values.tolist()))
@@ -0,0 +1,86 @@
+import copy
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.environment.lustre.lustre_knobs import LustreKnobs
+from magpie.types.dfs_configuration import DFSConfiguration, ScopedTuneParameters, TuneParameter
+from magpie.types.knob_codec import KnobCodec
+
+
+class TestKnobCodec(TestCase):
+    def setUp(self) -> None:
+        self.knobs = [LustreKnobs.MAX_RPCS_IN_FLIGHT.knob, LustreKnobs.STRIPE_COUNT.knob,
+                      LustreKnobs.MAX_DIRTY_MB.knob, LustreKnobs.STRIPE_SIZE.knob]
+        self.codec = KnobCodec(self.knobs)
+
+    def test_decode_batch(self):
+        actions = np.array([[0, 0, 0, 0], [1, 1, 1, 1], [0.5, 0.55, 0.3, 0.999]])
+        values = self.codec.decode(actions)
+        self.assertEqual(values.shape, (3, 4))
+        for action, value in zip(actions, values):
+            expected = [int(knob.min + (knob.max - knob.min) * a) for knob, a in zip(self.knobs, action)]
+            np.testing.assert_array_equal(value, expected)
+        with self.assertRaises(AssertionError):
+            self.codec.decode(np.array([1.1, 0, 0, 0]))
+
+    def test_encode(self):
+        values = self.codec.decode(np.array([[0, 1, 0.5, 0.25]]))
+        rounding = KnobCodec(self.knobs, round_half_up=True)
+        np.testing.assert_array_equal(rounding.decode(self.codec.encode(values)), values)
+
+    def test_lazy_configuration(self):
+        configuration = self.codec.to_configuration(np.array([8, 2, 10, 16]))
+        self.assertIsNone(configuration._configuration)
+        self.assertEqual(len(configuration), 4)
+        self.assertEqual(configuration.get_parameters()[LustreKnobs.STRIPE_COUNT.knob], 2)
+        self.assertIsNone(configuration._configuration)
+        self.assertEqual([scoped.scope for scoped in configuration], [self.knobs[0].scope, "stripe"])
+        expected = DFSConfiguration([
+            ScopedTuneParameters(self.knobs[0].scope, [TuneParameter(self.knobs[0], 8),
+                                                        TuneParameter(self.knobs[2], 10)]),
+            ScopedTuneParameters("stripe", [TuneParameter(self.knobs[1], 2), TuneParameter(self.knobs[3], 16)])])
+        self.assertEqual(len(configuration.difference(expected)), 0)
+        self.assertEqual(configuration.configuration, expected.configuration)
+
+    def test_hash_and_key(self):
+        values = np.array([8, 2, 10, 16])
+        configuration = self.codec.to_configuration(values)
+        same = KnobCodec(list(self.knobs)).to_configuration(values.copy())
+        self.assertEqual(configuration, same)
+        self.assertEqual(hash(configuration), hash(same))
+        self.assertEqual(len({configuration, same}), 1)
+        self.assertNotEqual(configuration, self.codec.to_configuration(np.array([8, 2, 10, 32])))
+        plain = DFSConfiguration(list(configuration.configuration))
+        self.assertEqual(configuration, plain)
+        self.assertEqual(configuration.key(), plain.key())
+        self.assertEqual([knob.id for knob in self.codec.knobs], self.codec.knob_ids.tolist())
+
+    def test_slots(self):
+        configuration = self.codec.to_configuration(np.array([8, 2, 10, 16]))
+        self.assertFalse(hasattr(configuration, "__dict__"))
+        self.assertFalse(hasattr(configuration.configuration[0], "__dict__"))
+        self.assertFalse(hasattr(configuration.configuration[0].parameters[0], "__dict__"))
+        copied = copy.deepcopy(configuration)
+        self.assertEqual(copied, configuration)
+        self.assertEqual(copied.configuration, configuration.configuration)
+
+    def test_values_are_copied(self):
+        values = self.codec.decode(np.array([0, 1, 0.5, 0.25]))[0]
+        configuration = self.codec.to_configuration(values)
+        self.assertTrue(values.flags.writeable)
+        values[0] += 1
+        self.assertNotEqual(configuration.values[0], values[0])
+        with self.assertRaises(ValueError):
+            configuration.values[0] = 0
+
+    def test_difference(self):
+        applied = self.codec.to_configuration(np.array([8, 2, 10, 16]))
+        configuration = self.codec.to_configuration(np.array([16, 2, 10, 32]))
+        plain = DFSConfiguration(list(applied.configuration))
+        for atomic_scopes in [(), ("stripe",)]:
+            self.assertEqual(configuration.difference(applied, atomic_scopes).configuration,
+                             configuration.difference(plain, atomic_scopes).configuration)
+        self.assertEqual(configuration.difference(applied, ("stripe",)).get_parameters(),
+                         {self.knobs[0]: 16, self.knobs[1]: 2, self.knobs[3]: 32})
+        self.assertEqual(len(applied.difference(applied)), 0)
@@ -7,3 +7,5 @@ class RLModel(StrEnum):
     """
     PPO = "ppo"
     DDPG = "ddpg"
+    # Bayesian optimization, it evaluates configurations directly instead of learning a policy
+    BO = "bo"
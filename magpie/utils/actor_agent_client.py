@@ -0,0 +1,125 @@
+import logging
+import threading
+from typing import Dict, Optional, Union, Tuple, List, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from magpie.config.config import ActorAgentSettings
+
+logger = logging.getLogger(__name__)
+
+
+class ActorAgentClient:
+    """
+    client of the actor agents, it keeps a pool of keep-alive connections to each node
+    """
+
+    def __init__(self, settings: ActorAgentSettings):
+        self.port = settings.agent_port
+        self.timeout = (settings.agent_connect_timeout, settings.agent_read_timeout)
+        # read errors are not retried, the command may already run on the node, e.g., lfs setstripe or rm -rf
+        self.retry = Retry(total=settings.agent_max_retries, read=0, backoff_factor=settings.agent_backoff_factor,
+                           status_forcelist=(502, 503, 504), allowed_methods=frozenset(["GET", "POST"]),
+                           raise_on_status=False)
+        self.pool_maxsize = settings.agent_pool_maxsize
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _session(self, node: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(node)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=self.retry)
+                session.mount("http://", adapter)
+                self._sessions[node] = session
+            return session
+
+    def _timeout(self, timeout: Optional[float]) -> Union[float, Tuple[float, float]]:
+        if timeout is None:
+            return self.timeout
+        return self.timeout[0], timeout
+
+    def max_request_time(self, timeout: Optional[float] = None) -> float:
+        """
+        worst case duration of a request including retries and their backoff
+        :param timeout: read timeout in second, use the configured timeout if None
+        :return: in second
+        """
+        connect_timeout, read_timeout = self._timeout(timeout)
+        backoff_max = getattr(Retry, "DEFAULT_BACKOFF_MAX", 120)
+        backoff = sum(min(self.retry.backoff_factor * 2 ** retry_no, backoff_max)
+                      for retry_no in range(self.retry.total))
+        return (self.retry.total + 1) * (connect_timeout + read_timeout) + backoff
+
+    def url(self, node: str, endpoint: str) -> str:
+        return f"http://{node}:{self.port}/{endpoint}"
+
+    def execute(self, node: str, cmd: str, timeout: Optional[float] = None, raise_error=False) -> str:
+        """
+        execute command by the actor agent running on the node
+        :param node: hostname of the node
+        :param cmd: shell command
+        :param timeout: read timeout in second, use the configured timeout if None
+        :param raise_error: raise RuntimeError if the execution fails
+        :return: output of the command
+        """
+        res = self._session(node).get(self.url(node, "execute"), params={"cmd": cmd}, timeout=self._timeout(timeout))
+        if res.status_code != 200 or "error" in res.text:
+            logger.error(f"Cmd execution error,node:{node}, cmd:{cmd}, result:{res.text}")
+            if raise_error:
+                raise RuntimeError(f"Cmd execution error on node {node}, status={res.status_code}, result:{res.text}")
+        return res.text
+
+    def batch_set_params(self, node: str, operations: List[Tuple[str, Any]], parallel=False,
+                         timeout: Optional[float] = None, raise_error=False) -> List[Dict[str, Any]]:
+        """
+        apply lctl set_param operations on the node in one request
+        :param node: hostname of the node
+        :param operations: list of (parameter, value), e.g., [("osc.*.max_dirty_mb", 10)]
+        :param parallel: apply the operations in parallel on the node
+        :param timeout: read timeout in second, use the configured timeout if None
+        :param raise_error: raise RuntimeError if any operation fails
+        :return: status of each operation, {"param", "value", "status", "output", "elapsed"}
+        """
+        body = {"operations": [{"param": param, "value": value} for param, value in operations],
+                "parallel": parallel}
+        res = self._session(node).post(self.url(node, "batch"), json=body, timeout=self._timeout(timeout))
+        if res.status_code != 200:
+            logger.error(f"Batch execution error,node:{node}, operations:{operations}, result:{res.text}")
+            if raise_error:
+                raise RuntimeError(f"Batch execution error on node {node}, status={res.status_code}, result:{res.text}")
+            return [{"param": param, "value": value, "status": "error", "output": res.text, "elapsed": 0}
+                    for param, value in operations]
+        results = res.json()["results"]
+        failures = [result for result in results if result["status"] != "ok"]
+        if len(failures) > 0:
+            logger.error(f"Batch execution error,node:{node}, failures:{failures}")
+            if raise_error:
+                raise RuntimeError(f"Batch execution error on node {node}, failures:{failures}")
+        return results
+
+    def get_params(self, node: str, names: List[str], timeout: Optional[float] = None) -> Dict[str, Dict[str, str]]:
+        """
+        read current values of lctl parameters on the node
+        :param node: hostname of the node
+        :param names: lctl parameter names, e.g., ["osc.*.max_dirty_mb"]
+        :param timeout: read timeout in second, use the configured timeout if None
+        :return: {name: {instance parameter name: value}}, parameters which can't be read are omitted
+        """
+        res = self._session(node).get(self.url(node, "params"), params={"name": names},
+                                      timeout=self._timeout(timeout))
+        if res.status_code != 200:
+            raise RuntimeError(f"Failed to read parameters on node {node}, status={res.status_code}, result:{res.text}")
+        body = res.json()
+        if len(body["errors"]) > 0:
+            logger.warning(f"Failed to read parameters on node {node}, errors:{body['errors']}")
+        return body["params"]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
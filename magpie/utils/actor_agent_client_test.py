@@ -0,0 +1,38 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import requests
+
+from magpie.config.config import ActorAgentSettings
+from magpie.utils.actor_agent_client import ActorAgentClient
+
+
+class TestActorAgentClient(TestCase):
+    def setUp(self) -> None:
+        self.client = ActorAgentClient(ActorAgentSettings(agent_connect_timeout=1, agent_read_timeout=5))
+
+    def test_session_per_node(self):
+        session = self.client._session("wally033")
+        self.assertIs(session, self.client._session("wally033"))
+        self.assertIsNot(session, self.client._session("wally034"))
+        self.client.close()
+        self.assertIsNot(session, self.client._session("wally033"))
+
+    def test_timeout(self):
+        self.assertEqual(self.client._timeout(None), (1, 5))
+        self.assertEqual(self.client._timeout(2), (1, 2))
+
+    def test_max_request_time(self):
+        # 4 attempts of 1 + 2 seconds and backoff of 0.2 + 0.4 + 0.8 seconds
+        self.assertAlmostEqual(self.client.max_request_time(2), 13.4)
+
+    def test_no_read_retries(self):
+        self.assertEqual(self.client.retry.read, 0)
+
+    def test_execute(self):
+        response = Mock(status_code=200, text="osc.lustre-OST0000.max_rpcs_in_flight=8")
+        with patch.object(requests.Session, "get", return_value=response) as get:
+            output = self.client.execute("wally033", "sudo lctl get_param osc.*.max_rpcs_in_flight", timeout=2)
+        self.assertEqual(output, response.text)
+        get.assert_called_once_with("http://wally033:5000/execute",
+                                    params={"cmd": "sudo lctl get_param osc.*.max_rpcs_in_flight"}, timeout=(1, 2))
@@ -1,18 +1,29 @@
 import logging
 import subprocess
 
-import requests
+from magpie.config.config import ActorAgentSettings
+from magpie.utils.actor_agent_client import ActorAgentClient
 
 logger = logging.getLogger(__name__)
+# connections to a host are multiplexed over one master connection which stays open for 10 minutes after its last use
+SSH_OPTIONS = "-o ControlMaster=auto -o ControlPath=/tmp/magpie-ssh-%C -o ControlPersist=600"
+# client shared by exec_cmd_by_rest, created on first use
+_default_agent_client = None
 
 
-def exec_cmd_by_rest(node, cmd):
-    url = f"http://{node}:5000/execute"
-    data = {"cmd": cmd}
-    res = requests.get(url, params=data)
-    if res.status_code != 200 or "error" in res.text:
-        logger.error(f"Cmd execution error,node:{node}, cmd:{cmd}, result:{res.text}")
-    return res.text
+def exec_cmd_by_rest(node, cmd, timeout=None, raise_error=False):
+    """
+    execute command by the actor agent running on the node
+    :param node: hostname of the node
+    :param cmd: shell command
+    :param timeout: request timeout in second, use the configured timeout if None
+    :param raise_error: raise RuntimeError if the execution fails
+    :return: output of the command
+    """
+    global _default_agent_client
+    if _default_agent_client is None:
+        _default_agent_client = ActorAgentClient(ActorAgentSettings())
+    return _default_agent_client.execute(node, cmd, timeout=timeout, raise_error=raise_error)
 
 
 def exec_cmd(cmd, get_all_result=False, raise_error=True):
@@ -45,5 +56,20 @@ def exec_remote_cmd(ssh_user, hostname, cmd):
     :param cmd:
     :return:
     """
-    cmd = f"ssh {ssh_user}@{hostname} \"{cmd}\""
+    cmd = f"ssh {SSH_OPTIONS} {ssh_user}@{hostname} \"{cmd}\""
     return exec_cmd(cmd)
+
+
+def popen_remote_cmd(ssh_user, hostname, cmd, stdout=None):
+    """
+    start remote command without waiting for it
+    :param ssh_user: ssh user
+    :param hostname:
+    :param cmd:
+    :param stdout: file receiving standard output and error, discarded if None
+    :return: process of the ssh client, terminating it doesn't stop the remote command
+    """
+    cmd = f"ssh {SSH_OPTIONS} {ssh_user}@{hostname} \"{cmd}\""
+    logger.debug(f"start command \"{cmd}\"")
+    return subprocess.Popen(["/bin/bash", "-c", cmd], stdout=stdout or subprocess.DEVNULL, stderr=subprocess.STDOUT,
+                            text=True)
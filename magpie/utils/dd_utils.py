@@ -1,30 +1,120 @@
 import logging
 import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from magpie.config.config import WorkloadSettings, STRIPE_TUNING_FOLDER, FioSettings
+from magpie.types.clean_strategy import CleanStrategy
 from magpie.types.workload import Workload
-from magpie.utils.cmd_utils import exec_remote_cmd
+from magpie.utils.cmd_utils import exec_remote_cmd, popen_remote_cmd
 from magpie.utils.fio_utils import FioUtils
+from magpie.utils.readiness import wait_until_stable
 
 
 class DDUtils:
     """
     DD workload utils
     """
-    def __init__(self, dd_settings: WorkloadSettings):
+    # folder of filebench workloads on the clients
+    WORKLOAD_FOLDER = "/home/houkun.zhu/app/fb_workload"
+    # e.g., 62.021: IO Summary: 402356 ops 6705.222 ops/s 609/1220 rd/wr 164.0mb/s 1.5ms/op
+    IO_SUMMARY_PATTERN = re.compile(r"IO Summary:\s+\d+ ops,?\s+([\d.]+) ops/s.*?([\d.]+)mb/s")
+
+    def __init__(self, dd_settings: WorkloadSettings, hosts: List[str] = None,
+                 tuning_folder: str = STRIPE_TUNING_FOLDER):
+        """
+        :param dd_settings:
+        :param hosts: clients running the workload, the hosts in mpi_host.txt are used if it is None
+        :param tuning_folder: folder where the workload runs, workload files refer to STRIPE_TUNING_FOLDER and it is
+        replaced with this folder
+        """
 
         self.logger = logging.Logger(__name__)
         self.ssh_user = dd_settings.ssh_user
-        self.ssh_node = dd_settings.ssh_node
+        self.hosts = hosts
+        # the workload is launched from the first host of the group
+        self.ssh_node = hosts[0] if hosts else dd_settings.ssh_node
+        self.tuning_folder = tuning_folder
+        self.clean_strategy = dd_settings.clean_strategy
+        self.clean_parallelism = dd_settings.clean_parallelism
         settings = FioSettings()
         self.fio_utils = FioUtils(settings)
         self.type = "filebench"
         self.logger.info(f"DDUtils is runing on type {self.type}")
+        # workload started by start_workload_async
+        self._process: Optional[subprocess.Popen] = None
+        self._output = None
+        self._workload_file = None
 
     def clean(self):
-        cmd = f"sudo rm -rf {STRIPE_TUNING_FOLDER}/*"
+        """
+        remove the files of the previous workload run with the clean strategy
+        :return:
+        """
+        if self.clean_strategy is CleanStrategy.PARALLEL:
+            self._clean_parallel()
+        elif self.clean_strategy is CleanStrategy.SWAP:
+            self._clean_swap()
+        # remaining files, e.g., the fileset roots after the parallel removal
+        cmd = f"sudo rm -rf {self.tuning_folder}/*"
         exec_remote_cmd(self.ssh_user, self.ssh_node, cmd)
 
+    def _clean_parallel(self):
+        """
+        each client removes a share of the directories of the filesets, e.g., bigfileset/00000001,
+        with concurrent rm processes
+        """
+        hosts = self.hosts or [self.ssh_node]
+        folder = self.tuning_folder.rstrip('/')
+
+        def remove_share(host_no, host):
+            # GNU sed first~step selects every len(hosts)-th line starting from host_no + 1
+            cmd = f"cd {folder} && find . -mindepth 2 -maxdepth 2 | sort | sed -n '{host_no + 1}~{len(hosts)}p' | " \
+                  f"xargs -r -P {self.clean_parallelism} -n 16 sudo rm -rf"
+            exec_remote_cmd(self.ssh_user, host, cmd)
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            list(executor.map(remove_share, range(len(hosts)), hosts))
+        self.logger.info(f"removed filesets on {len(hosts)} clients in {time.time() - start:.1f}s")
+
+    def _clean_swap(self):
+        """
+        move the files to a trash folder of the same file system and remove it in the background.
+        Renaming only changes metadata, and the tuning folder keeps its stripe layout.
+        """
+        folder = self.tuning_folder.rstrip('/')
+        trash = f"{os.path.dirname(folder)}/.magpie_trash_{os.path.basename(folder)}_{time.time_ns()}"
+        cmd = f"sudo mkdir -p {trash} && (sudo find {folder} -mindepth 1 -maxdepth 1 -exec mv -t {trash} {{}} + ; " \
+              f"nohup sudo rm -rf {trash} < /dev/null > /dev/null 2>&1 &)"
+        exec_remote_cmd(self.ssh_user, self.ssh_node, cmd)
+
+    def used_space(self) -> int:
+        """
+        :return: used space of the file system of the tuning folder in KB, reported by lfs df
+        """
+        output = exec_remote_cmd(self.ssh_user, self.ssh_node, f"lfs df {self.tuning_folder}")
+        for line in output.splitlines():
+            if line.startswith("filesystem_summary:"):
+                return int(line.split()[2])
+        raise RuntimeError(f"no filesystem summary in lfs df output: {output}")
+
+    def wait_space_reclaimed(self, timeout: float, tolerance_kb: int = 10240) -> bool:
+        """
+        wait until OSTs have released the objects of removed files, i.e., the used space stops decreasing
+        :param timeout: deadline in second
+        :param tolerance_kb: maximum change of the used space between two polls
+        :return: False if the deadline passed
+        """
+        if self.clean_strategy is CleanStrategy.SWAP:
+            # the space is reclaimed in the background while the workload runs
+            return True
+        return wait_until_stable(self.used_space, timeout, tolerance_kb, description="OST space is reclaimed")
+
     def start_workload(self, block_size="1M", count=500, eval=False):
         # start fio environment and kill existing fio process
         # executed in detach mode by adding option -d
@@ -32,16 +122,108 @@ class DDUtils:
         if self.type == "fio":
             self.fio_utils.start_workload(workload=Workload.SEQUENTIAL_1M_50PCT_WRITE_5_JOBS, detach=False)
         elif self.type == "filebench":
-            workload_name = os.environ['WORKLOAD_NAME']
-            if workload_name is None or workload_name == "":
-                raise AttributeError("WORKLOAD_NAME env variable is not set")
-            self.logger.info(f"Using workload {workload_name}.")
-            # workload_name = "videoserver.f"
-            if eval:
-                workload_name = f"eval_{workload_name}"
-            cmd = f"mpirun -hostfile /home/houkun.zhu/app/fb_workload/mpi_host.txt sudo /usr/local/bin/filebench -f /home/houkun.zhu/app/fb_workload/{workload_name}"
+            cmd = self._filebench_command(self._workload_name(eval))
             self.logger.info(f"start workload {cmd}")
             result = exec_remote_cmd(self.ssh_user, self.ssh_node, cmd)
             self.logger.info(result)
         else:
             raise NotImplementedError
+
+    def _workload_name(self, eval: bool) -> str:
+        workload_name = os.environ['WORKLOAD_NAME']
+        if workload_name is None or workload_name == "":
+            raise AttributeError("WORKLOAD_NAME env variable is not set")
+        self.logger.info(f"Using workload {workload_name}.")
+        if eval:
+            workload_name = f"eval_{workload_name}"
+        return workload_name
+
+    def start_workload_async(self, eval=False):
+        """
+        start the filebench workload without waiting for it, see is_workload_running, wait_workload and stop_workload
+        :param eval:
+        :return:
+        """
+        if self.type != "filebench":
+            raise NotImplementedError(f"{self.type} workload can't be started asynchronously")
+        if self.is_workload_running():
+            raise RuntimeError("the previous workload is still running")
+        workload_name = self._workload_name(eval)
+        self._workload_file = self._workload_path(workload_name)
+        cmd = self._filebench_command(workload_name)
+        self.logger.info(f"start workload asynchronously {cmd}")
+        self._output = tempfile.TemporaryFile(mode="w+")
+        self._process = popen_remote_cmd(self.ssh_user, self.ssh_node, cmd, stdout=self._output)
+
+    def is_workload_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def wait_workload(self, timeout: float = None) -> Optional[str]:
+        """
+        wait until the workload started by start_workload_async finishes
+        :param timeout: in second, wait without limit if it is None
+        :return: output of the workload, None if it is still running after the timeout
+        """
+        if self._process is None:
+            return None
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return None
+        self._output.seek(0)
+        output = self._output.read()
+        self._output.close()
+        if self._process.returncode != 0:
+            self.logger.warning(f"workload exited with {self._process.returncode}")
+        self._process = None
+        self.logger.info(output)
+        return output
+
+    def stop_workload(self):
+        """
+        kill the filebench processes of the workload started by start_workload_async on all hosts
+        :return:
+        """
+        if self._workload_file is None:
+            return
+        # the pattern only matches the filebench processes of this workload file, e.g., not those of other groups,
+        # the bracket keeps it from matching the shell running pkill
+        kill = f"sudo pkill -f '[f]ilebench -f {self._workload_file}' || true"
+        if self.hosts is None and self.tuning_folder == STRIPE_TUNING_FOLDER:
+            cmd = f"mpirun -hostfile {self.WORKLOAD_FOLDER}/mpi_host.txt sh -c \\\"{kill}\\\""
+            exec_remote_cmd(self.ssh_user, self.ssh_node, cmd)
+        else:
+            for host in self.hosts or [self.ssh_node]:
+                exec_remote_cmd(self.ssh_user, host, kill)
+        self.logger.info(f"stopped workload {self._workload_file}")
+        self.wait_workload()
+
+    @classmethod
+    def parse_io_summary(cls, output: str) -> Optional[Tuple[float, float]]:
+        """
+        parse the IO summary of filebench runs, the summaries of all hosts of an mpirun are summed up
+        :param output: output of the workload
+        :return: throughput in MB/s and operations per second, None if there is no summary
+        """
+        summaries = cls.IO_SUMMARY_PATTERN.findall(output or "")
+        if len(summaries) == 0:
+            return None
+        return sum(float(mb) for _, mb in summaries), sum(float(ops) for ops, _ in summaries)
+
+    def _workload_path(self, workload_name: str) -> str:
+        """
+        workload file executed by filebench
+        """
+        if self.hosts is None and self.tuning_folder == STRIPE_TUNING_FOLDER:
+            return f"{self.WORKLOAD_FOLDER}/{workload_name}"
+        return f"/tmp/magpie_{os.path.basename(self.tuning_folder.rstrip('/'))}_{workload_name}"
+
+    def _filebench_command(self, workload_name: str) -> str:
+        workload_file = f"{self.WORKLOAD_FOLDER}/{workload_name}"
+        if self.hosts is None and self.tuning_folder == STRIPE_TUNING_FOLDER:
+            return f"mpirun -hostfile {self.WORKLOAD_FOLDER}/mpi_host.txt sudo /usr/local/bin/filebench -f {workload_file}"
+        hosts = ",".join(self.hosts) if self.hosts else self.ssh_node
+        # each host rewrites its own copy of the workload to run in the tuning folder
+        group_file = self._workload_path(workload_name)
+        sed = f"sed s#{STRIPE_TUNING_FOLDER}#{self.tuning_folder.rstrip('/')}/# {workload_file} > {group_file}"
+        return f"mpirun -host {hosts} sh -c '{sed} && sudo /usr/local/bin/filebench -f {group_file}'"
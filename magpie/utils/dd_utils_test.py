@@ -11,3 +11,10 @@ class TestDDUtils(TestCase):
 
     def test_start_workload(self):
         print(DDUtils(WorkloadSettings()).start_workload(count=200))
+
+    def test_parse_io_summary(self):
+        output = "12.001: Running...\n" \
+                 "62.021: IO Summary: 402356 ops 6705.222 ops/s 609/1220 rd/wr 164.0mb/s 1.5ms/op\n" \
+                 "62.104: IO Summary: 302356 ops, 5000.5 ops/s, (1000/2000 r/w), 100.5mb/s, 2.1ms/op\n"
+        self.assertEqual(DDUtils.parse_io_summary(output), (264.5, 11705.722))
+        self.assertIsNone(DDUtils.parse_io_summary("Failed to create filesets"))
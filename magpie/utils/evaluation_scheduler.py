@@ -0,0 +1,140 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Callable, Tuple, Dict
+
+import numpy as np
+
+from magpie.types.dfs_configuration import DFSConfiguration, ConfigurationScorePair
+from magpie.types.external_metrics import ExternalMetrics
+from magpie.utils.stats_utils import RunningStats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CandidateEvaluation:
+    """
+    repeated measurements of a candidate configuration
+    """
+    configuration: DFSConfiguration
+    # score of each measurement, the metric the candidates are ranked by
+    scores: RunningStats = field(default_factory=RunningStats)
+    measurements: List[ExternalMetrics] = field(default_factory=list)
+    half_width: float = float("inf")
+
+    @property
+    def mean(self) -> float:
+        return float(self.scores.mean) if self.scores.count > 0 else float("-inf")
+
+    @property
+    def lower_bound(self) -> float:
+        return self.mean - self.half_width
+
+    @property
+    def upper_bound(self) -> float:
+        return self.mean + self.half_width
+
+    def add(self, metrics: ExternalMetrics, score: float):
+        self.measurements.append(metrics)
+        self.scores.add(score)
+
+    def to_pair(self) -> ConfigurationScorePair:
+        """
+        :return: the configuration with the mean of each external metric over the measurements
+        """
+        if len(self.measurements) == 0:
+            return ConfigurationScorePair(self.configuration, None)
+        metrics = [measurement.get_all_metrics() for measurement in self.measurements]
+        means = {name: float(np.mean([m[name] for m in metrics])) for name in metrics[0]}
+        return ConfigurationScorePair(self.configuration, type(self.measurements[0])(**means))
+
+    def __str__(self):
+        return f"mean={self.mean:.2f} ±{self.half_width:.2f} of {self.scores.count} runs, " \
+               f"configuration={self.configuration.__repr__()}"
+
+
+class EvaluationScheduler:
+    """
+    evaluate candidate configurations concurrently on environments with disjoint client groups and stripe folders.
+    Each candidate is measured repeats times, the repeats of a candidate run on different environments if there are
+    enough, so differences between client groups are averaged out. The candidates are ranked by the lower bound of
+    the confidence interval of their mean score, then by the mean.
+    """
+
+    def __init__(self, environments: list, get_score: Callable[[ExternalMetrics], float], repeats: int = 1,
+                 confidence: float = 0.95, observation_time: int = None):
+        """
+        :param environments: DFS environments evaluating in parallel
+        :param get_score: score of the external metrics to maximize, e.g., the throughput
+        :param repeats: measurements of each candidate
+        :param confidence: confidence level of the intervals
+        :param observation_time: observation time of each measurement, None with the periodic workload
+        """
+        if repeats < 1:
+            raise ValueError(f"repeats needs to be at least 1, got {repeats}")
+        self.environments = environments
+        self.get_score = get_score
+        self.repeats = repeats
+        self.confidence = confidence
+        self.observation_time = observation_time
+
+    @staticmethod
+    def rank(evaluations: List[CandidateEvaluation], confidence: float = 0.95) -> List[CandidateEvaluation]:
+        """
+        rank candidates by the lower bound of the confidence interval of their mean score, then by the mean
+        :param evaluations:
+        :param confidence:
+        :return: evaluations ordered from the best candidate
+        """
+        for evaluation in evaluations:
+            evaluation.half_width = float(evaluation.scores.confidence_half_width(confidence))
+        return sorted(evaluations, key=lambda e: (e.lower_bound, e.mean), reverse=True)
+
+    def schedule(self, num_candidates: int) -> List[List[Tuple[int, int]]]:
+        """
+        assign measurements to environments, every repeat of all candidates is assigned before the next repeat
+        :param num_candidates:
+        :return: (candidate index, repeat) of each measurement of each environment in run order
+        """
+        num_environments = len(self.environments)
+        assignments: List[List[Tuple[int, int]]] = [[] for _ in range(num_environments)]
+        for repeat in range(self.repeats):
+            for candidate in range(num_candidates):
+                assignments[(candidate + repeat) % num_environments].append((candidate, repeat))
+        return assignments
+
+    def _run(self, environment, configurations: List[DFSConfiguration],
+             tasks: List[Tuple[int, int]]) -> List[Tuple[int, ExternalMetrics]]:
+        results = []
+        for candidate, repeat in tasks:
+            result = environment.evaluate_configuration(configurations[candidate], self.observation_time)
+            logger.info(f"evaluation {repeat + 1}/{self.repeats} of candidate {candidate}: {result.score}")
+            results.append((candidate, result.score))
+        return results
+
+    def evaluate(self, configurations: List[DFSConfiguration]) -> List[CandidateEvaluation]:
+        """
+        :param configurations: candidates
+        :return: evaluations ordered from the best candidate
+        """
+        evaluations = [CandidateEvaluation(configuration) for configuration in configurations]
+        if len(configurations) == 0:
+            return evaluations
+        start = time.time()
+        assignments = self.schedule(len(configurations))
+        with ThreadPoolExecutor(max_workers=len(self.environments), thread_name_prefix="evaluation") as executor:
+            futures = [executor.submit(self._run, environment, configurations, tasks)
+                       for environment, tasks in zip(self.environments, assignments) if len(tasks) > 0]
+            results: Dict[int, List[ExternalMetrics]] = {}
+            for future in futures:
+                for candidate, metrics in future.result():
+                    results.setdefault(candidate, []).append(metrics)
+        for candidate, evaluation in enumerate(evaluations):
+            for metrics in results.get(candidate, []):
+                evaluation.add(metrics, self.get_score(metrics))
+        ranked = self.rank(evaluations, self.confidence)
+        logger.info(f"evaluated {len(configurations)} candidates {self.repeats} times on {len(self.environments)} "
+                    f"environments in {time.time() - start:.2f}s")
+        return ranked
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from magpie.types.dfs_configuration import ConfigurationScorePair
+from magpie.types.external_metrics import LustreExternalMetrics
+from magpie.utils.evaluation_scheduler import EvaluationScheduler
+
+
+class FakeEnvironment:
+    def __init__(self, offset, throughputs):
+        self.offset = offset
+        self.throughputs = throughputs
+        self.evaluated = []
+
+    def evaluate_configuration(self, configuration, observation_time=None):
+        self.evaluated.append(configuration)
+        return ConfigurationScorePair(configuration, LustreExternalMetrics(self.throughputs[configuration] +
+                                                                           self.offset, 1))
+
+
+class TestEvaluationScheduler(TestCase):
+    def test_schedule(self):
+        scheduler = EvaluationScheduler([None, None], LustreExternalMetrics.get_throughput, repeats=2)
+        self.assertEqual(scheduler.schedule(3), [[(0, 0), (2, 0), (1, 1)], [(1, 0), (0, 1), (2, 1)]])
+
+    def test_evaluate(self):
+        throughputs = {"a": 100, "b": 300, "c": 200}
+        environments = [FakeEnvironment(0, throughputs), FakeEnvironment(10, throughputs)]
+        scheduler = EvaluationScheduler(environments, LustreExternalMetrics.get_throughput, repeats=2)
+        evaluations = scheduler.evaluate(["a", "b", "c"])
+        self.assertEqual([evaluation.configuration for evaluation in evaluations], ["b", "c", "a"])
+        self.assertEqual(evaluations[0].mean, 305)
+        self.assertLess(evaluations[0].lower_bound, 305)
+        self.assertEqual(evaluations[0].to_pair().score.throughput, 305)
+        # the repeats of a candidate run on both environments
+        self.assertEqual(sorted(environments[0].evaluated + environments[1].evaluated), ["a", "a", "b", "b", "c", "c"])
+        self.assertEqual(sorted(environments[0].evaluated), ["a", "b", "c"])
+
+    def test_single_measurement(self):
+        environments = [FakeEnvironment(0, {"a": 100, "b": 300})]
+        evaluations = EvaluationScheduler(environments, LustreExternalMetrics.get_throughput).evaluate(["a", "b"])
+        self.assertEqual([evaluation.configuration for evaluation in evaluations], ["b", "a"])
+        with self.assertRaises(ValueError):
+            EvaluationScheduler(environments, LustreExternalMetrics.get_throughput, repeats=0)
@@ -1,7 +1,7 @@
 import logging
 
 from magpie.config.config import FioSettings
-from magpie.utils.cmd_utils import exec_remote_cmd, exec_cmd
+from magpie.utils.cmd_utils import exec_remote_cmd, exec_cmd, SSH_OPTIONS
 
 logger = logging.Logger(__name__)
 
@@ -34,7 +34,7 @@ class FioUtils:
         with open(local_generated_file, "w") as f:
             f.write(generated_fio_conf)
         # copy generated file to remote
-        exec_cmd(f"scp {local_generated_file} {self.ssh_user}@{self.ssh_node}:{remote_generated_file_path}")
+        exec_cmd(f"scp {SSH_OPTIONS} {local_generated_file} {self.ssh_user}@{self.ssh_node}:{remote_generated_file_path}")
 
     def start_workload(self, workload=None, output=None, detach=True):
         # start fio environment and kill existing fio process
@@ -48,3 +48,10 @@ class FioUtils:
             fio_exec_cmd += f" -o {output}"
         logger.info(f"start workload {fio_exec_cmd}")
         exec_remote_cmd(self.ssh_user, self.ssh_node, fio_exec_cmd)
+
+    def is_running(self) -> bool:
+        """
+        :return: True if fio processes are running on the workload node
+        """
+        result = exec_remote_cmd(self.ssh_user, self.ssh_node, "pgrep -x fio > /dev/null && echo running || true")
+        return result == "running"
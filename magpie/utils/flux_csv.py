@@ -0,0 +1,67 @@
+import datetime
+from typing import Iterable, List, Dict, Iterator, Optional
+
+import numpy as np
+
+
+def _check_error(header: List[str], row: List[str]):
+    if "error" in header and "reference" in header:
+        raise RuntimeError(f"flux query failed: {row[header.index('error')]}")
+
+
+def fill_columns(rows: Iterable[List[str]], column_index: Dict[str, int], out: np.ndarray) -> np.ndarray:
+    """
+    write values of Flux CSV rows into an array, tables are separated by an empty row and start with a header,
+    annotation rows (starting with #) are skipped. Empty values are not written.
+    :param rows: csv rows, e.g., from QueryApi.query_csv
+    :param column_index: {column name: index in out}
+    :param out: preallocated array
+    :return: out
+    """
+    header = None
+    mapping = None
+    for row in rows:
+        if len(row) == 0 or row[0].startswith("#"):
+            header = None
+            continue
+        if header is None:
+            header = row
+            mapping = [(i, column_index[name]) for i, name in enumerate(row) if name in column_index]
+            continue
+        _check_error(header, row)
+        for i, j in mapping:
+            if row[i] != "":
+                out[j] = float(row[i])
+    return out
+
+
+def iter_columns(rows: Iterable[List[str]], columns: List[str]) -> Iterator[List[Optional[str]]]:
+    """
+    iterate over values of the columns in Flux CSV rows
+    :param rows: csv rows, e.g., from QueryApi.query_csv
+    :param columns: column names
+    :return: values of the columns of each row, None if the table doesn't have the column
+    """
+    header = None
+    indices = None
+    for row in rows:
+        if len(row) == 0 or row[0].startswith("#"):
+            header = None
+            continue
+        if header is None:
+            header = row
+            indices = [row.index(column) if column in row else None for column in columns]
+            continue
+        _check_error(header, row)
+        yield [row[i] if i is not None else None for i in indices]
+
+
+def parse_rfc3339(value: str) -> float:
+    """
+    parse RFC3339 UTC timestamps of Flux, fromisoformat doesn't accept nanoseconds
+    :param value: e.g., 2021-08-30T10:00:01.123456789Z
+    :return: timestamp in second
+    """
+    seconds, _, fraction = value.rstrip("Z").partition(".")
+    timestamp = datetime.datetime.fromisoformat(seconds).replace(tzinfo=datetime.timezone.utc).timestamp()
+    return timestamp + (float("0." + fraction) if fraction else 0.0)
@@ -0,0 +1,45 @@
+import csv
+import io
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.utils.flux_csv import fill_columns, iter_columns, parse_rfc3339
+
+JOINED_CSV = """,result,table,_stop,cache_hit_ratio,read_bytes,write_bytes
+,_result,0,2021-08-30T10:00:15Z,0.5,,20.5
+
+"""
+SPLIT_CSV = """,result,table,_time,_value,_field
+,_result,0,2021-08-30T10:00:01Z,1,cur_dirty_bytes
+,_result,0,2021-08-30T10:00:02Z,3,cur_dirty_bytes
+
+,result,table,_time,_value,_field,cpu
+,_result,1,2021-08-30T10:00:01Z,90,usage_idle,cpu-total
+"""
+
+
+def _rows(text):
+    return csv.reader(io.StringIO(text))
+
+
+class TestFluxCsv(TestCase):
+    def test_fill_columns(self):
+        out = np.full(3, np.nan, dtype=np.float32)
+        fill_columns(_rows(JOINED_CSV), {"cache_hit_ratio": 0, "read_bytes": 1, "write_bytes": 2}, out)
+        self.assertEqual(out[0], 0.5)
+        self.assertTrue(np.isnan(out[1]))
+        self.assertEqual(out[2], 20.5)
+
+    def test_iter_columns(self):
+        rows = list(iter_columns(_rows(SPLIT_CSV), ["table", "_field", "_value", "cpu"]))
+        self.assertEqual(rows, [["0", "cur_dirty_bytes", "1", None], ["0", "cur_dirty_bytes", "3", None],
+                                ["1", "usage_idle", "90", "cpu-total"]])
+
+    def test_error(self):
+        with self.assertRaises(RuntimeError):
+            fill_columns(_rows(",error,reference\n,type error,\n"), {}, np.zeros(1))
+
+    def test_parse_rfc3339(self):
+        self.assertEqual(parse_rfc3339("1970-01-01T00:00:01Z"), 1)
+        self.assertAlmostEqual(parse_rfc3339("1970-01-01T00:00:01.123456789Z"), 1.123456789)
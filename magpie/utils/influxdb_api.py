@@ -1,10 +1,9 @@
 import datetime
 import logging
 import socket
-from typing import Union, Dict
+from typing import Union, Dict, List, Iterator
 
-from devtools import pformat
-from influxdb_client import InfluxDBClient
+from influxdb_client import InfluxDBClient, Dialect
 from influxdb_client.client.write_api import ASYNCHRONOUS
 
 from magpie.config.config import InfluxdbSettings
@@ -16,19 +15,23 @@ class InfluxDBAPI:
         self.magpie_bucket = influxdb_setting.magpie_bucket
         self.influx_client = InfluxDBClient(influxdb_setting.url, influxdb_setting.token, org=influxdb_setting.org)
         self.async_write_api = self.influx_client.write_api(write_options=ASYNCHRONOUS)
+        self.query_api = self.influx_client.query_api()
+        self.csv_dialect = Dialect(header=True, annotations=[], date_time_format="RFC3339")
         self.executor_hostname = socket.gethostname()
 
     def __del__(self):
         self.influx_client.close()
 
-    def query_data_frame(self, query, start_time: Union[datetime.timedelta], end_time: Union[datetime.timedelta]):
-        query_api = self.influx_client.query_api()
+    def query_csv(self, query, start_time: Union[datetime.timedelta], end_time: Union[datetime.timedelta]) -> \
+            Iterator[List[str]]:
+        """
+        query without annotations, each table of the result starts with a header row
+        :return: csv rows
+        """
         params = {"_start": start_time,
                   "_end": end_time
                   }
-        data_frame = query_api.query_data_frame(query, params=params)
-        self.logger.debug(f"query result: {pformat(data_frame)}")
-        return data_frame
+        return self.query_api.query_csv(query, params=params, dialect=self.csv_dialect)
 
     def async_write(self, data: Dict):
         record = {"measurement": "action", "tags": {"controller": self.executor_hostname},
@@ -0,0 +1,38 @@
+import re
+import time
+from typing import Dict, Tuple, Optional
+
+# split on commas and spaces which are not escaped by a backslash
+_UNESCAPED_SPACE = re.compile(r"(?<!\\) ")
+_UNESCAPED_COMMA = re.compile(r"(?<!\\),")
+
+
+def parse_line(line: str) -> Optional[Tuple[str, str, Dict[str, float], float]]:
+    """
+    parse one line of InfluxDB line protocol, string and boolean fields are dropped
+    :param line: e.g., lustre,host=wally033,osd_id=OST0000 cur_dirty_bytes=10i,cur_grant_bytes=20i 1630000000000000000
+    :return: measurement, series key (measurement with tags), numeric fields and timestamp in second,
+    None for empty lines and comments
+    """
+    line = line.strip()
+    if len(line) == 0 or line.startswith("#"):
+        return None
+    # string field values may contain spaces, they are quoted
+    if '"' in line:
+        line = re.sub(r'"(?:[^"\\]|\\.)*"', '""', line)
+    parts = _UNESCAPED_SPACE.split(line)
+    if len(parts) < 2:
+        raise ValueError(f"invalid line protocol: {line}")
+    series_key, field_set = parts[0], parts[1]
+    timestamp = int(parts[2]) / 1e9 if len(parts) > 2 else time.time()
+    measurement = _UNESCAPED_COMMA.split(series_key, 1)[0]
+    fields = {}
+    for field in _UNESCAPED_COMMA.split(field_set):
+        name, _, value = field.partition("=")
+        if value.endswith("i") or value.endswith("u"):
+            value = value[:-1]
+        try:
+            fields[name] = float(value)
+        except ValueError:
+            continue
+    return measurement, series_key, fields, timestamp
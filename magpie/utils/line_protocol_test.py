@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from magpie.utils.line_protocol import parse_line
+
+
+class TestLineProtocol(TestCase):
+    def test_parse_line(self):
+        measurement, series_key, fields, timestamp = parse_line(
+            'lustre,host=wally033,osd_id=OST0000 cur_dirty_bytes=10i,cache_hit_ratio=0.5,state="a b" 1630000000000000000')
+        self.assertEqual(measurement, "lustre")
+        self.assertEqual(series_key, "lustre,host=wally033,osd_id=OST0000")
+        self.assertEqual(fields, {"cur_dirty_bytes": 10, "cache_hit_ratio": 0.5})
+        self.assertEqual(timestamp, 1630000000)
+
+    def test_parse_escaped_tag(self):
+        measurement, series_key, _, _ = parse_line(r"cpu,host=my\ host usage_idle=1 1000000000")
+        self.assertEqual(measurement, "cpu")
+        self.assertEqual(series_key, r"cpu,host=my\ host")
+
+    def test_parse_empty(self):
+        self.assertIsNone(parse_line(""))
+        self.assertIsNone(parse_line("# comment"))
@@ -0,0 +1,53 @@
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+def wait_until(predicate: Callable[[], bool], timeout: float, interval: float = 1.0,
+               description: str = "condition") -> bool:
+    """
+    poll the predicate until it's true or the deadline passes, exceptions of the predicate count as not ready
+    :param predicate:
+    :param timeout: deadline in second
+    :param interval: polling interval in second
+    :param description: logged description of the condition
+    :return: True if the predicate became true before the deadline
+    """
+    start = time.time()
+    deadline = start + timeout
+    while True:
+        try:
+            if predicate():
+                logger.info(f"{description} after {time.time() - start:.1f}s")
+                return True
+        except Exception as e:
+            logger.debug(f"{description} probe failed: {e}")
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logger.warning(f"{description} timed out after {timeout}s")
+            return False
+        time.sleep(min(interval, remaining))
+
+
+def wait_until_stable(read_value: Callable[[], float], timeout: float, tolerance: float, interval: float = 1.0,
+                      description: str = "value is stable") -> bool:
+    """
+    poll the value until it changes at most by tolerance between two polls
+    :param read_value:
+    :param timeout: deadline in second
+    :param tolerance: maximum change between two polls
+    :param interval: polling interval in second
+    :param description: logged description of the condition
+    :return: True if the value became stable before the deadline
+    """
+    previous = [None]
+
+    def is_stable():
+        value = read_value()
+        stable = previous[0] is not None and abs(value - previous[0]) <= tolerance
+        previous[0] = value
+        return stable
+
+    return wait_until(is_stable, timeout, interval, description)
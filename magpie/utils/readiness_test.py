@@ -0,0 +1,26 @@
+import time
+from unittest import TestCase
+
+from magpie.utils.readiness import wait_until, wait_until_stable
+
+
+class TestReadiness(TestCase):
+    def test_wait_until(self):
+        start = time.time()
+        self.assertTrue(wait_until(lambda: time.time() - start > 0.05, timeout=1, interval=0.01))
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_timeout(self):
+        start = time.time()
+        self.assertFalse(wait_until(lambda: False, timeout=0.05, interval=0.01))
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+    def test_exception_is_not_ready(self):
+        def probe():
+            raise RuntimeError("not reachable")
+
+        self.assertFalse(wait_until(probe, timeout=0.02, interval=0.01))
+
+    def test_wait_until_stable(self):
+        values = iter([100, 50, 20, 19, 19])
+        self.assertTrue(wait_until_stable(lambda: next(values), timeout=1, tolerance=1, interval=0.01))
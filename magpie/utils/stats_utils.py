@@ -0,0 +1,99 @@
+import math
+from statistics import NormalDist
+from typing import Union
+
+import numpy as np
+
+
+def t_quantile(p: float, dof: int) -> float:
+    """
+    quantile of Student's t distribution, exact for 1 and 2 degrees of freedom,
+    otherwise the Cornish-Fisher expansion around the normal quantile
+    :param p: probability
+    :param dof: degrees of freedom
+    :return:
+    """
+    if dof == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if dof == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    return z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2) + \
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3) + \
+        (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * dof ** 4)
+
+
+class RunningStats:
+    """
+    running mean and variance of scalars or arrays (Welford's algorithm)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self._m2 = None
+
+    def add(self, value: Union[float, np.ndarray]):
+        value = np.asarray(value, dtype=np.float64)
+        self.count += 1
+        if self.mean is None:
+            self.mean = value.copy()
+            self._m2 = np.zeros_like(value)
+            return
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self._m2 = self._m2 + delta * (value - self.mean)
+
+    @property
+    def variance(self) -> Union[float, np.ndarray]:
+        """
+        sample variance, 0 if there are less than 2 values
+        """
+        if self.count < 2:
+            return np.zeros_like(self.mean) if self.mean is not None else 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> Union[float, np.ndarray]:
+        return np.sqrt(self.variance)
+
+    def confidence_half_width(self, confidence: float = 0.95) -> Union[float, np.ndarray]:
+        """
+        half width of the two-sided confidence interval of the mean, infinite if there are less than 2 values
+        """
+        if self.count < 2:
+            return np.full_like(self.mean, np.inf) if self.mean is not None else float("inf")
+        return t_quantile((1 + confidence) / 2, self.count - 1) * self.std / np.sqrt(self.count)
+
+
+class ConfidenceBoundStopper:
+    """
+    stop a measurement once the upper confidence bound of the mean sample is below a threshold,
+    i.e., the measured value can't reach the threshold any more
+    """
+
+    def __init__(self, threshold: float, z: float = 1.96, min_samples: int = 3):
+        """
+        :param threshold: value the mean needs to be able to reach
+        :param z: width of the confidence bound in standard errors
+        :param min_samples: number of samples before stopping is considered
+        """
+        self.threshold = threshold
+        self.z = z
+        self.min_samples = max(min_samples, 2)
+        self.stats = RunningStats()
+
+    @property
+    def upper_bound(self) -> float:
+        if self.stats.count < 2:
+            return float("inf")
+        return float(self.stats.mean + self.z * self.stats.std / np.sqrt(self.stats.count))
+
+    def add(self, value: float) -> bool:
+        """
+        add a sample
+        :param value:
+        :return: True if the measurement should stop
+        """
+        self.stats.add(value)
+        return self.stats.count >= self.min_samples and self.upper_bound < self.threshold
@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.utils.stats_utils import RunningStats, ConfidenceBoundStopper, t_quantile
+
+
+class TestRunningStats(TestCase):
+    def test_scalar(self):
+        values = [1.0, 2.0, 4.0, 8.0]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        self.assertEqual(stats.count, 4)
+        self.assertAlmostEqual(stats.mean, np.mean(values))
+        self.assertAlmostEqual(stats.variance, np.var(values, ddof=1))
+
+    def test_array(self):
+        values = np.array([[1, 10], [3, 30], [5, 20]], dtype=np.float64)
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        np.testing.assert_allclose(stats.mean, values.mean(axis=0))
+        np.testing.assert_allclose(stats.std, values.std(axis=0, ddof=1))
+
+    def test_confidence_half_width(self):
+        stats = RunningStats()
+        self.assertEqual(stats.confidence_half_width(), float("inf"))
+        for value in [10.0, 12.0, 11.0, 13.0]:
+            stats.add(value)
+        # t(0.975, 3) = 3.182
+        self.assertAlmostEqual(stats.confidence_half_width(0.95), 3.182 * np.std([10, 12, 11, 13], ddof=1) / 2,
+                               places=2)
+
+    def test_t_quantile(self):
+        # quantiles of scipy.stats.t.ppf
+        self.assertAlmostEqual(t_quantile(0.975, 1), 12.706, places=3)
+        self.assertAlmostEqual(t_quantile(0.975, 2), 4.303, places=3)
+        self.assertAlmostEqual(t_quantile(0.975, 5), 2.571, places=2)
+        self.assertAlmostEqual(t_quantile(0.95, 30), 1.697, places=3)
+
+    def test_single_value(self):
+        stats = RunningStats()
+        stats.add(np.array([1.0, 2.0]))
+        np.testing.assert_array_equal(stats.variance, [0, 0])
+
+
+class TestConfidenceBoundStopper(TestCase):
+    def test_stop_below_threshold(self):
+        stopper = ConfidenceBoundStopper(100, min_samples=3)
+        self.assertFalse(stopper.add(10))
+        self.assertFalse(stopper.add(12))
+        self.assertTrue(stopper.add(11))
+
+    def test_continue_if_noisy(self):
+        stopper = ConfidenceBoundStopper(100, min_samples=3)
+        for value in [10, 190, 20]:
+            self.assertFalse(stopper.add(value))
+        self.assertGreater(stopper.upper_bound, 100)
@@ -0,0 +1,140 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# step types of records, same values as tf_agents.trajectories.time_step.StepType
+FIRST_STEP = 0
+MID_STEP = 1
+
+
+class TransitionStore:
+    """
+    append-only on-disk store of environment transitions, records are saved column by column in NumPy shards.
+    Each tuning session writes its own shards, the shard being filled is rewritten after each append, so at most
+    the record being written is lost if the process dies.
+
+    Columns of a record:
+        timestamp: time of the step
+        step_type: FIRST_STEP for the first step after a reset, otherwise MID_STEP
+        observation: state before the action
+        action: action of the agent
+        configuration: knob values applied for the action
+        reward: reward of the action
+        metrics: external metrics observed after the action
+    """
+    META_FILE = "meta.json"
+    COLUMNS = ["timestamp", "step_type", "observation", "action", "configuration", "reward", "metrics"]
+
+    def __init__(self, directory: str, observation_names: List[str], knob_names: List[str], session: str = None,
+                 shard_size: int = 256):
+        """
+        :param directory: store folder, it's created if it doesn't exist
+        :param observation_names: names of the internal performance indicators in the observation
+        :param knob_names: names of the knobs in the action
+        :param session: prefix of the shards of this session, sessions are loaded in the order of their names
+        :param shard_size: number of records in a shard
+        """
+        self.directory = directory
+        self.session = session or time.strftime("%Y%m%d-%H%M%S")
+        self.shard_size = shard_size
+        self.meta = {"observation_names": list(observation_names), "knob_names": list(knob_names),
+                     "metric_names": None}
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                stored_meta = json.load(f)
+            for key in ["observation_names", "knob_names"]:
+                if stored_meta[key] != self.meta[key]:
+                    raise ValueError(f"{key} {self.meta[key]} doesn't match the store {directory}: {stored_meta[key]}")
+            self.meta["metric_names"] = stored_meta.get("metric_names")
+        self._records: Dict[str, list] = {column: [] for column in self.COLUMNS}
+        self._shard_no = 0
+        self._lock = threading.Lock()
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.directory, self.META_FILE)
+        tmp_path = f"{meta_path}.{self.session}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def append(self, observation: np.ndarray, action: np.ndarray, configuration: List[float], reward: float,
+               metrics: Dict[str, float], first: bool = False):
+        """
+        append a transition
+        :param observation: state before the action
+        :param action:
+        :param configuration: knob values applied for the action, in the same order as knob names
+        :param reward:
+        :param metrics: external metrics, e.g., {"throughput": 1.0, "iops": 2.0}
+        :param first: if it's the first step after a reset
+        :return:
+        """
+        with self._lock:
+            if self.meta["metric_names"] is None:
+                self.meta["metric_names"] = list(metrics.keys())
+                self._write_meta()
+            self._records["timestamp"].append(time.time())
+            self._records["step_type"].append(FIRST_STEP if first else MID_STEP)
+            self._records["observation"].append(np.asarray(observation, dtype=np.float32))
+            self._records["action"].append(np.asarray(action, dtype=np.float32))
+            self._records["configuration"].append(np.asarray(configuration, dtype=np.float64))
+            self._records["reward"].append(reward)
+            self._records["metrics"].append([metrics.get(name, np.nan) for name in self.meta["metric_names"]])
+            self._write_shard()
+            if len(self._records["timestamp"]) >= self.shard_size:
+                self._records = {column: [] for column in self.COLUMNS}
+                self._shard_no += 1
+
+    def _write_shard(self):
+        columns = {
+            "timestamp": np.array(self._records["timestamp"], dtype=np.float64),
+            "step_type": np.array(self._records["step_type"], dtype=np.int8),
+            "observation": np.stack(self._records["observation"]),
+            "action": np.stack(self._records["action"]),
+            "configuration": np.stack(self._records["configuration"]),
+            "reward": np.array(self._records["reward"], dtype=np.float32),
+            "metrics": np.array(self._records["metrics"], dtype=np.float64),
+        }
+        shard_path = os.path.join(self.directory, f"{self.session}_{self._shard_no:05d}.npz")
+        # np.savez appends .npz to names without the suffix
+        tmp_path = f"{shard_path}.tmp.npz"
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, shard_path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        load all records of the store
+        :param directory:
+        :return: columns of all records ordered by session and shard, "session" holds the session index of each
+        record, None if the store is empty
+        """
+        shard_paths = sorted(path for path in glob.glob(os.path.join(directory, "*.npz")) if ".tmp" not in path)
+        if len(shard_paths) == 0:
+            return None
+        columns = {column: [] for column in cls.COLUMNS + ["session"]}
+        sessions = {}
+        for shard_path in shard_paths:
+            session = os.path.basename(shard_path).rsplit("_", 1)[0]
+            session_no = sessions.setdefault(session, len(sessions))
+            with np.load(shard_path) as shard:
+                for column in cls.COLUMNS:
+                    columns[column].append(shard[column])
+                columns["session"].append(np.full(len(shard["timestamp"]), session_no, dtype=np.int32))
+        logger.info(f"loaded {len(shard_paths)} shards of {len(sessions)} sessions from {directory}")
+        return {column: np.concatenate(values) for column, values in columns.items()}
+
+    @classmethod
+    def load_meta(cls, directory: str) -> Dict:
+        with open(os.path.join(directory, cls.META_FILE), "r") as f:
+            return json.load(f)
@@ -0,0 +1,36 @@
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from magpie.utils.transition_store import TransitionStore, FIRST_STEP, MID_STEP
+
+
+class TestTransitionStore(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+
+    def _append(self, store, steps, first_step=0):
+        for i in range(steps):
+            store.append(np.array([i, i], dtype=np.float32), np.array([0.5]), [i], float(i),
+                         {"throughput": i * 10.0, "iops": 1.0}, first=i == first_step)
+
+    def test_load_sessions_and_shards(self):
+        self._append(TransitionStore(self.directory, ["pi1", "pi2"], ["osc.knob"], session="a", shard_size=2), 5)
+        self._append(TransitionStore(self.directory, ["pi1", "pi2"], ["osc.knob"], session="b"), 2)
+        transitions = TransitionStore.load(self.directory)
+        self.assertEqual(len(transitions["reward"]), 7)
+        np.testing.assert_array_equal(transitions["session"], [0, 0, 0, 0, 0, 1, 1])
+        np.testing.assert_array_equal(transitions["step_type"], [FIRST_STEP] + [MID_STEP] * 4 + [FIRST_STEP, MID_STEP])
+        np.testing.assert_array_equal(transitions["reward"][:5], np.arange(5))
+        self.assertEqual(transitions["observation"].shape, (7, 2))
+        np.testing.assert_array_equal(transitions["metrics"][4], [40, 1])
+        self.assertEqual(TransitionStore.load_meta(self.directory)["metric_names"], ["throughput", "iops"])
+
+    def test_mismatched_store(self):
+        self._append(TransitionStore(self.directory, ["pi1"], ["osc.knob"]), 1)
+        with self.assertRaises(ValueError):
+            TransitionStore(self.directory, ["pi1"], ["osc.other_knob"])
+
+    def test_empty_store(self):
+        self.assertIsNone(TransitionStore.load(self.directory))
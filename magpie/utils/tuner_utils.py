@@ -1,25 +1,41 @@
+import heapq
 import logging
+import os
+import time
 from typing import List
 
 from devtools import pformat
-from tf_agents.environments import TFPyEnvironment, ActionClipWrapper
+from tf_agents.environments import TFPyEnvironment, ActionClipWrapper, BatchedPyEnvironment
 
-from magpie.config.config import LustreSettings, LustrePIsSettings, LustreKnobsSettings, FioSettings, InfluxdbSettings
-from magpie.environment.collector import InfluxDBCollector
+from magpie.config.config import LustreSettings, LustrePIsSettings, LustreKnobsSettings, FioSettings, InfluxdbSettings, \
+    StreamingCollectorSettings, STRIPE_TUNING_FOLDER, WorkloadSettings, MetricsCacheSettings, SurrogateSettings, \
+    EarlyStoppingSettings, AdaptiveWindowSettings, EvaluationSettings
+from magpie.environment.adaptive_window import AdaptiveWindow
+from magpie.environment.collector import InfluxDBCollector, StreamingCollector
+from magpie.environment.configuration_history import ConfigurationHistory
+from magpie.environment.dfs_environment import DFSEnvironment
+from magpie.environment.metrics_cache import ConfigurationMetricsCache
 from magpie.environment.lustre.lustre_controller import LustreController
 from magpie.environment.lustre.lustre_env import LustreEnvironment
-from magpie.environment.reward import SingleTuning2ProportionMetricsReward, SingleTuning3ProportionMetricsReward, \
+from magpie.environment.lustre.stripe_sandbox import StripeSandboxPool
+from magpie.environment.reward import Reward, SingleTuning2ProportionMetricsReward, SingleTuning3ProportionMetricsReward, \
     SingleTuning2ProportionMetricsRewardWithMovingAvg, DoubleTuning2ProportionMetricsReward
+from magpie.environment.surrogate.surrogate_env import SurrogateEnvironment
+from magpie.environment.surrogate.surrogate_model import load_surrogate_model
 from magpie.environment.toy.toy_env import ToyEnvironment
 from magpie.environment.toy.toy_knobs import ToyKnobs
 from magpie.environment.toy.toy_performance_indicators import ToyPerformanceIndicators as TPI
 from magpie.model.ddpg import DDPGSettings, DDPG
 from magpie.model.dfs_model import DFSModel, DFSModelSettings
-from magpie.model.ppo import PPOSettings, PPO
+from magpie.types.collector_type import CollectorType
 from magpie.types.dfs_configuration import ConfigurationScorePair
 from magpie.types.distributed_file_system import DFS
 from magpie.types.external_metrics import LustreExternalMetrics, ToyExternalMetrics
+from magpie.types.flux_query_mode import FluxQueryMode
 from magpie.types.rl_model import RLModel
+from magpie.utils.dd_utils import DDUtils
+from magpie.utils.evaluation_scheduler import EvaluationScheduler
+from magpie.utils.transition_store import TransitionStore
 
 logger = logging.getLogger(__name__)
 
@@ -35,15 +51,51 @@ def create_model(global_step, model: RLModel, tf_env: TFPyEnvironment) -> (DFSMo
         model_settings = DDPGSettings(global_step=global_step)
         model = DDPG(tf_env, model_settings)
     elif model is RLModel.PPO:
+        # imported on demand, magpie.model.ppo is not part of the repository
+        from magpie.model.ppo import PPOSettings, PPO
         model_settings = PPOSettings(global_step=global_step)
         model = PPO(tf_env, model_settings)
+    elif model is RLModel.BO:
+        raise ValueError("Bayesian optimization doesn't train a model, run magpie/tuner/bo_tune.py instead")
     else:
         raise NotImplementedError
     return model, model_settings
 
 
+def create_lustre_reward_model(reward_type, double_optimization=False) -> Reward:
+    if double_optimization:
+        if reward_type.num_args_return == 2:
+            return DoubleTuning2ProportionMetricsReward(LustreExternalMetrics.get_throughput, reward_type,
+                                                        LustreExternalMetrics.get_iops)
+        raise NotImplementedError
+    if reward_type.num_args_return == 1:
+        return SingleTuning2ProportionMetricsRewardWithMovingAvg(LustreExternalMetrics.get_throughput,
+                                                                 tolerance_ratio=0.02)
+    elif reward_type.num_args_return == 2:
+        return SingleTuning2ProportionMetricsReward(LustreExternalMetrics.get_throughput, reward_type)
+    elif reward_type.num_args_return == 3:
+        return SingleTuning3ProportionMetricsReward(LustreExternalMetrics.get_throughput, reward_type)
+    raise NotImplementedError
+
+
 def create_env(debug, dfs, enable_observation_normalizer, observation_time, reward_type,
-               workload, model: RLModel, dd_workload=False, double_optimization=False):
+               workload, model: RLModel, dd_workload=False, double_optimization=False,
+               collector_type: CollectorType = CollectorType.INFLUXDB, num_parallel_envs: int = 1,
+               transition_store_dir: str = None, metrics_cache: bool = False, early_stopping: bool = False,
+               adaptive_window: bool = False, history_path: str = None):
+    """
+    create environments
+    :param num_parallel_envs: number of Lustre environments stepping in parallel, each one uses a disjoint group of
+    clients and its own stripe folder. Only client and stripe knobs are tuned if it is more than 1.
+    Surrogate environments share the model and step in parallel as well.
+    :param transition_store_dir: Lustre environments save their transitions to this folder if it is set
+    :param metrics_cache: reuse metrics of revisited configurations, see MetricsCacheSettings
+    :param early_stopping: stop filebench runs which can't reach the best throughput, see EarlyStoppingSettings
+    :param adaptive_window: end observation windows once the throughput is stable, see AdaptiveWindowSettings
+    :param history_path: SQLite file of the configuration history shared by the environments, the history is kept in
+    memory only if it is None
+    :return: internal pis, knobs, py environment (batched if num_parallel_envs > 1), tf environment
+    """
     if dfs is DFS.LUSTRE:
         lustre_settings = LustreSettings()
         lustre_pis_settings = LustrePIsSettings()
@@ -55,30 +107,103 @@ def create_env(debug, dfs, enable_observation_normalizer, observation_time, rewa
             fio_settings = None
         internal_pis = lustre_pis_settings.file_system + lustre_pis_settings.cpu + lustre_pis_settings.ram
         knobs = lustre_knobs_settings.get_all_knobs()
-        if double_optimization:
-            if reward_type.num_args_return == 2:
-                reward_model = DoubleTuning2ProportionMetricsReward(LustreExternalMetrics.get_throughput, reward_type, LustreExternalMetrics.get_iops)
-            else:
-                raise NotImplementedError
-        else:
-            if reward_type.num_args_return == 1:
-                reward_model = SingleTuning2ProportionMetricsRewardWithMovingAvg(LustreExternalMetrics.get_throughput, tolerance_ratio=0.02)
-            elif reward_type.num_args_return == 2:
-                reward_model = SingleTuning2ProportionMetricsReward(LustreExternalMetrics.get_throughput, reward_type)
-            elif reward_type.num_args_return == 3:
-                reward_model = SingleTuning3ProportionMetricsReward(LustreExternalMetrics.get_throughput, reward_type)
-            else:
-                raise NotImplementedError
-        controller = LustreController(lustre_settings)
+        client_groups = lustre_settings.get_client_groups(num_parallel_envs)
+        if num_parallel_envs > 1:
+            # server side knobs are shared by all client groups
+            shared_knobs = [knob for knob in knobs if not ("osc" in knob.scope or knob.scope == "stripe")]
+            if len(shared_knobs) > 0:
+                logger.warning(f"knobs shared by parallel environments are not tuned: {shared_knobs}")
+            knobs = [knob for knob in knobs if knob not in shared_knobs]
+            if collector_type is CollectorType.STREAMING:
+                raise NotImplementedError("streaming collector doesn't support parallel environments")
+            if workload is not None:
+                raise NotImplementedError("fio workload doesn't support parallel environments")
+
         influxdb_settings = InfluxdbSettings()
         logger.info(f"lustre settings: {pformat(lustre_settings)}\n")
         logger.info(f"influxdb settings: {pformat(influxdb_settings)}\n")
         logger.info(f"fio settings: {pformat(fio_settings)}\n")
-        collector = InfluxDBCollector(influxdb_settings, internal_pis)
-        py_environment = LustreEnvironment(internal_pis, knobs, controller, collector, reward=reward_model,
-                                           observation_time=observation_time, fio_settings=fio_settings,
-                                           influxdb_settings=influxdb_settings,
-                                           debug=debug,dd_workload=dd_workload)
+        environments = []
+        session = time.strftime("%Y%m%d-%H%M%S")
+        metrics_cache_settings = MetricsCacheSettings() if metrics_cache else None
+        early_stopping_settings = None
+        if early_stopping:
+            if dd_workload:
+                early_stopping_settings = EarlyStoppingSettings()
+                logger.info(f"early stopping settings: {pformat(early_stopping_settings)}\n")
+            else:
+                logger.warning("early stopping is only supported with the periodic workload")
+        adaptive_window_settings = None
+        if adaptive_window:
+            if dd_workload:
+                logger.warning("the observation window is defined by the periodic workload, it's not adaptive")
+            else:
+                adaptive_window_settings = AdaptiveWindowSettings()
+                logger.info(f"adaptive window settings: {pformat(adaptive_window_settings)}\n")
+        workload_name = str(workload) if workload is not None else os.environ.get("WORKLOAD_NAME")
+        for group_no, client_group in enumerate(client_groups):
+            if num_parallel_envs > 1:
+                logger.info(f"environment {group_no}: clients {client_group}")
+                env_lustre_settings = lustre_settings.copy(update={"osc_nodes": client_group})
+                tuning_folder = os.path.join(STRIPE_TUNING_FOLDER, f"group{group_no}")
+                # the joined query can't be filtered by host
+                query_mode = lustre_pis_settings.query_mode
+                if query_mode is FluxQueryMode.JOINED:
+                    query_mode = FluxQueryMode.SPLIT
+                collector = InfluxDBCollector(influxdb_settings, internal_pis, query_mode, hosts=client_group)
+                dd_util = DDUtils(WorkloadSettings(), hosts=client_group, tuning_folder=tuning_folder) \
+                    if dd_workload else None
+            else:
+                env_lustre_settings = lustre_settings
+                tuning_folder = STRIPE_TUNING_FOLDER
+                if collector_type is CollectorType.STREAMING:
+                    streaming_settings = StreamingCollectorSettings()
+                    logger.info(f"streaming collector settings: {pformat(streaming_settings)}\n")
+                    collector = StreamingCollector(streaming_settings, internal_pis)
+                else:
+                    collector = InfluxDBCollector(influxdb_settings, internal_pis)
+                dd_util = None
+            if adaptive_window_settings is not None:
+                collector.set_adaptive_window(AdaptiveWindow(adaptive_window_settings),
+                                              LustreExternalMetrics.get_throughput)
+            controller = LustreController(env_lustre_settings, stripe_folder=tuning_folder)
+            transition_store = None
+            if transition_store_dir is not None:
+                transition_store = TransitionStore(transition_store_dir, [pi.name for pi in internal_pis],
+                                                   [f"{knob.scope}.{knob.name}" for knob in knobs],
+                                                   session=f"{session}-env{group_no}")
+            environments.append(LustreEnvironment(internal_pis, knobs, controller, collector,
+                                                  reward=create_lustre_reward_model(reward_type, double_optimization),
+                                                  observation_time=observation_time, fio_settings=fio_settings,
+                                                  influxdb_settings=influxdb_settings,
+                                                  debug=debug, dd_workload=dd_workload, dd_util=dd_util,
+                                                  transition_store=transition_store,
+                                                  metrics_cache=create_metrics_cache(metrics_cache_settings),
+                                                  workload_name=workload_name,
+                                                  early_stopping=early_stopping_settings))
+    elif dfs is DFS.SURROGATE:
+        surrogate_settings = SurrogateSettings()
+        logger.info(f"surrogate settings: {pformat(surrogate_settings)}\n")
+        if surrogate_settings.surrogate_transition_store_dir is None:
+            raise ValueError("surrogate_transition_store_dir is required by the surrogate environment")
+        lustre_pis_settings = LustrePIsSettings()
+        surrogate_model = load_surrogate_model(surrogate_settings.surrogate_transition_store_dir,
+                                               LustreKnobsSettings().get_all_knobs(),
+                                               lustre_pis_settings.file_system + lustre_pis_settings.cpu +
+                                               lustre_pis_settings.ram,
+                                               max_samples=surrogate_settings.surrogate_max_samples)
+        if surrogate_model is None:
+            raise ValueError(f"no transitions in {surrogate_settings.surrogate_transition_store_dir}")
+        internal_pis, knobs = surrogate_model.internal_pis, surrogate_model.knobs
+        seed = surrogate_settings.surrogate_seed
+        environments = [SurrogateEnvironment(surrogate_model, create_lustre_reward_model(reward_type,
+                                                                                         double_optimization),
+                                             sample_noise=surrogate_settings.surrogate_sample_noise,
+                                             seed=seed + env_no if seed is not None else None,
+                                             enable_observation_normalizer=enable_observation_normalizer,
+                                             metrics_cache=create_metrics_cache(
+                                                 MetricsCacheSettings() if metrics_cache else None))
+                        for env_no in range(num_parallel_envs)]
     elif dfs is DFS.TOY:
         internal_pis = [i.value for i in [TPI.PI1, TPI.PI2]]
         knobs = [k.value for k in list(ToyKnobs)]
@@ -90,34 +215,131 @@ def create_env(debug, dfs, enable_observation_normalizer, observation_time, rewa
                                                                 reward_type)
         else:
             raise NotImplementedError
-        py_environment = ToyEnvironment(internal_pis, knobs, reward_model,
-                                        enable_observation_normalizer=enable_observation_normalizer,
-                                        debug=debug)
+        environments = [ToyEnvironment(internal_pis, knobs, reward_model,
+                                       enable_observation_normalizer=enable_observation_normalizer,
+                                       debug=debug)]
 
     else:
         raise NotImplementedError
+    configuration_history = ConfigurationHistory(knobs, environments[0].external_metrics_cls, history_path)
+    for environment in environments:
+        environment.configuration_history = configuration_history
     if model is RLModel.PPO:
-        py_environment = ActionClipWrapper(py_environment)
+        environments = [ActionClipWrapper(environment) for environment in environments]
+    if len(environments) > 1:
+        py_environment = BatchedPyEnvironment(environments, multithreading=True)
+    else:
+        py_environment = environments[0]
     tf_env = TFPyEnvironment(py_environment)
     return internal_pis, knobs, py_environment, tf_env
 
 
+def create_metrics_cache(settings: MetricsCacheSettings) -> ConfigurationMetricsCache:
+    """
+    create the metrics cache of a Lustre environment, client groups have their own caches
+    :param settings: None if the cache is disabled
+    :return:
+    """
+    if settings is None:
+        return None
+    return ConfigurationMetricsCache(LustreExternalMetrics, max_entries=settings.metrics_cache_size,
+                                     min_samples=settings.metrics_cache_min_samples,
+                                     remeasure_interval=settings.metrics_cache_remeasure_interval,
+                                     blend=settings.metrics_cache_blend)
+
+
+def get_environments(py_environment) -> List[DFSEnvironment]:
+    """
+    get DFS environments of a created environment
+    :param py_environment: environment created by create_env
+    :return: one environment or the environments of the batched environment
+    """
+    if isinstance(py_environment, BatchedPyEnvironment):
+        return list(py_environment.envs)
+    return [py_environment]
+
+
+def set_summary_writer(py_environment, writer, step):
+    """
+    write the step summaries of all environments with the writer, the environments of a batched environment step in
+    threads without the default writer and step of the main thread
+    :param py_environment: environment created by create_env
+    :param writer: summary writer
+    :param step: step of the summaries, e.g., the global step variable
+    :return:
+    """
+    for environment in get_environments(py_environment):
+        environment.set_summary_writer(writer, step)
+
+
+def get_good_configurations(py_environment) -> List[ConfigurationScorePair]:
+    """
+    merge good configurations found by all environments
+    :param py_environment: environment created by create_env
+    :return: the best configurations, the number is limited by the best configuration size of an environment
+    """
+    environments = get_environments(py_environment)
+    if environments[0].configuration_history is not None:
+        # the history is shared by the environments
+        return environments[0].top_configurations(environments[0].best_configuration_size)
+    if len(environments) == 1:
+        return environments[0].good_configurations
+    configurations = [pair for environment in environments for pair in environment.good_configurations]
+    return heapq.nlargest(environments[0].best_configuration_size, configurations)
+
+
 def evaluate_configuration(train_log_dir, top_configuration_score_lst: List[ConfigurationScorePair], tf_env,
-                           evaluation_time):
+                           evaluation_time, settings: EvaluationSettings = None):
     """
-    evaluate configurations
+    evaluate configurations, they are spread over the environments if environments are batched
     :param evaluation_time:
     :param top_configuration_score_lst:
+    :param tf_env: environment created by create_env
+    :param settings: repeats and confidence of the evaluation, EvaluationSettings() if it is None
     :return:
     """
-    best_configuration_score = top_configuration_score_lst[0]
-    evaluated_top_configurations = []
-    for configuration_score in top_configuration_score_lst:
-        new_config_score = tf_env.evaluate_configuration(configuration_score.configuration, evaluation_time)
-        evaluated_top_configurations.append(new_config_score)
-        logger.info(
-            f"Best configuration under evaluation: {configuration_score}, new_score={new_config_score.score}")
-        if best_configuration_score < new_config_score:
-            best_configuration_score = new_config_score
-    logger.info(f"Recommend configuration: {best_configuration_score}")
+    settings = settings or EvaluationSettings()
+    environments = get_environments(tf_env)
+    configurations = [pair.configuration for pair in top_configuration_score_lst]
+    get_score = environments[0].reward_model.get_metric_a
+    pool = create_stripe_sandbox_pool(environments, settings)
+    if pool is not None:
+        evaluations = pool.evaluate(configurations, environments[0].apply_configuration, get_score,
+                                    repeats=settings.evaluation_repeats, confidence=settings.evaluation_confidence)
+    else:
+        scheduler = EvaluationScheduler(environments, get_score, repeats=settings.evaluation_repeats,
+                                        confidence=settings.evaluation_confidence, observation_time=evaluation_time)
+        evaluations = scheduler.evaluate(configurations)
+    history = environments[0].configuration_history
+    for rank, evaluation in enumerate(evaluations):
+        history_info = ""
+        if history is not None:
+            history_info = f", {history.count(evaluation.configuration, environments[0].workload_name)} " \
+                           f"evaluations in the history"
+        logger.info(f"Rank {rank + 1} under evaluation: {evaluation}{history_info}")
+    evaluated_top_configurations = [evaluation.to_pair() for evaluation in evaluations]
+    if len(evaluated_top_configurations) > 0:
+        logger.info(f"Recommend configuration: {evaluated_top_configurations[0]}")
     save_configuration_score_pairs(train_log_dir, evaluated_top_configurations, "evaluated_good_configurations")
+
+
+def create_stripe_sandbox_pool(environments: List[DFSEnvironment], settings: EvaluationSettings) -> StripeSandboxPool:
+    """
+    create the stripe sandboxes of the evaluation
+    :param environments: environments created by create_env
+    :param settings:
+    :return: None if the sandboxes are disabled or the environment doesn't support them
+    """
+    if settings.evaluation_stripe_sandboxes <= 0:
+        return None
+    environment = environments[0]
+    if len(environments) > 1 or not isinstance(environment, LustreEnvironment) or not environment.dd_workload or \
+            environment.dd_util.type != "filebench":
+        logger.warning("stripe sandboxes require a single Lustre environment with the periodic filebench workload")
+        return None
+    if not any(knob.scope == "stripe" for knob in environment.knobs):
+        logger.warning("stripe knobs are not tuned, the stripe sandboxes are not used")
+        return None
+    return StripeSandboxPool(environment.controller, WorkloadSettings(), settings.evaluation_stripe_sandboxes,
+                             root_folder=environment.dd_util.tuning_folder,
+                             hosts=environment.dd_util.hosts or environment.controller.lustre_settings.osc_nodes)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Export OSC statistics of a Lustre client in Influx line protocol, it replaces read_osc_stats.sh.
+Statistics are read from the parameter files directly instead of spawning lctl for each OSC.
+
+Run as telegraf execd input with signal = "STDIN": one batch of lines is written for each newline on STDIN.
+Run with --once to write one batch and exit, e.g., as telegraf exec input.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+# lctl looks up parameters in sysfs first, then procfs and debugfs
+PARAM_ROOTS = ["/sys/fs/lustre", "/proc/fs/lustre", "/sys/kernel/debug/lustre"]
+# rpc_stats lines and their fields
+RPC_STATS_FIELDS = {
+    "read RPCs in flight": "read_rpcs_in_flight",
+    "write RPCs in flight": "write_rpcs_in_flight",
+    "pending write pages": "pending_write_pages",
+    "pending read pages": "pending_read_pages",
+}
+GAUGE_PARAMS = ["cur_dirty_bytes", "cur_grant_bytes"]
+# OSCs are discovered again after this number of intervals, e.g., after remounting
+DISCOVERY_INTERVALS = 60
+
+
+def find_param_file(osc_name, param):
+    for root in PARAM_ROOTS:
+        path = os.path.join(root, "osc", osc_name, param)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def discover_oscs():
+    """
+    :return: [(osc name, osd id, {param: file})]
+    """
+    osc_names = set()
+    for root in PARAM_ROOTS:
+        osc_names.update(os.path.basename(path) for path in glob.glob(os.path.join(root, "osc", "*-osc-*")))
+    oscs = []
+    for osc_name in sorted(osc_names):
+        # e.g., lustre-OST0000-osc-ffff8800b8fd7000
+        osd_id = osc_name.split("-")[1]
+        files = {param: find_param_file(osc_name, param) for param in GAUGE_PARAMS + ["rpc_stats"]}
+        oscs.append((osc_name, osd_id, {param: path for param, path in files.items() if path is not None}))
+    return oscs
+
+
+def read_file(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def parse_rpc_stats(content):
+    """
+    parse the header of rpc_stats, e.g., "read RPCs in flight:  0"
+    :return: {field: value}
+    """
+    fields = {}
+    for line in content.splitlines():
+        label, sep, value = line.partition(":")
+        field = RPC_STATS_FIELDS.get(label.strip())
+        if sep and field is not None:
+            fields[field] = int(value.split()[0])
+        if len(fields) == len(RPC_STATS_FIELDS):
+            break
+    return fields
+
+
+def collect(oscs):
+    """
+    read statistics of all OSCs
+    :return: lines in line protocol, None if an OSC disappeared
+    """
+    timestamp = time.time_ns()
+    lines = []
+    for osc_name, osd_id, files in oscs:
+        fields = {}
+        try:
+            for param in GAUGE_PARAMS:
+                if param in files:
+                    fields[param] = int(read_file(files[param]).strip())
+            if "rpc_stats" in files:
+                fields.update(parse_rpc_stats(read_file(files["rpc_stats"])))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"failed to read statistics of {osc_name}: {e}", file=sys.stderr)
+            continue
+        if len(fields) > 0:
+            field_set = ",".join(f"{name}={value}i" for name, value in fields.items())
+            lines.append(f"lustre,osd_id={osd_id} {field_set} {timestamp}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lustre OSC statistics exporter")
+    parser.add_argument("--once", action="store_true", help="write one batch and exit")
+    args = parser.parse_args()
+    oscs = discover_oscs()
+    intervals = 0
+    while True:
+        if not args.once and sys.stdin.readline() == "":
+            # telegraf closed STDIN
+            break
+        intervals += 1
+        if intervals % DISCOVERY_INTERVALS == 0:
+            oscs = discover_oscs()
+        lines = collect(oscs)
+        if lines is None:
+            oscs = discover_oscs()
+            lines = collect(oscs) or []
+        if len(lines) > 0:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+        if args.once:
+            break
+
+
+if __name__ == "__main__":
+    main()